@@ -0,0 +1,114 @@
+"""Persistent on-disk cache of locked groups computed from a lockfile"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import suppress
+from pathlib import Path
+from typing import Any
+
+CACHE_ENV = "PDM_BUILD_LOCKED_CACHE"
+CACHE_MAX_ENTRIES = 128
+
+
+def _plugin_version() -> str:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("pdm-build-locked")
+    except PackageNotFoundError:  # pragma: no cover
+        return "unknown"
+
+
+def get_cache_dir() -> Path | None:
+    """Get the cache directory, the cache is only enabled if PDM_BUILD_LOCKED_CACHE is set
+
+    Returns:
+        Path of the cache directory or None if caching is disabled
+    """
+    if cache_dir := os.getenv(CACHE_ENV):
+        return Path(cache_dir)
+    return None
+
+
+def get_cache_key(lockfile_content: bytes, groups: list[str], options: dict[str, Any] | None = None) -> str:
+    """Compute the cache key for a lockfile and a group selection
+
+    Args:
+        lockfile_content: raw bytes of the lockfile
+        groups: the groups requested for locking
+        options: further JSON serializable options affecting the result
+
+    Returns:
+        hex digest identifying the cache entry
+    """
+    key_data = {
+        "lockfile": hashlib.sha256(lockfile_content).hexdigest(),
+        "groups": groups,
+        "options": options or {},
+        "version": _plugin_version(),
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load(cache_dir: Path, key: str) -> Any | None:
+    """Load a cache entry
+
+    Args:
+        cache_dir: the cache directory
+        key: the cache key
+
+    Returns:
+        The cached value or None on a cache miss
+    """
+    entry = cache_dir / f"{key}.json"
+    try:
+        with entry.open("r", encoding="utf-8") as f:
+            value = json.load(f)
+    except (OSError, ValueError):
+        return None
+    with suppress(OSError):
+        # mark entry as recently used for eviction
+        os.utime(entry)
+    return value
+
+
+def store(cache_dir: Path, key: str, value: Any) -> None:
+    """Atomically write a cache entry and evict the least recently used entries
+
+    Args:
+        cache_dir: the cache directory
+        key: the cache key
+        value: JSON serializable value to store
+    """
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=f".{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, cache_dir / f"{key}.json")
+        except BaseException:
+            with suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+    except OSError:
+        # the cache is an optimization only, never fail the build because of it
+        return
+    _evict(cache_dir)
+
+
+def _evict(cache_dir: Path, max_entries: int = CACHE_MAX_ENTRIES) -> None:
+    entries = []
+    for entry in cache_dir.glob("*.json"):
+        with suppress(OSError):
+            entries.append((entry.stat().st_mtime_ns, entry))
+    if len(entries) <= max_entries:
+        return
+    entries.sort()
+    for _, entry in entries[: len(entries) - max_entries]:
+        with suppress(OSError):
+            entry.unlink()
@@ -0,0 +1,134 @@
+"""Fingerprints of the source tree and the locked groups, to skip unchanged builds"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import subprocess
+from collections.abc import Iterator
+from contextlib import suppress
+from pathlib import Path
+from typing import Any
+
+from . import _cache
+from ._utils import normalize_name
+
+# directories never considered part of the source tree, e.g. installed packages and the pdm-backend build directory
+_SKIPPED_DIRS = frozenset({"__pycache__", "__pypackages__", "node_modules", ".pdm-build"})
+# local state of pdm, written when the interpreter of the project is selected
+_SKIPPED_FILES = frozenset({".pdm-python"})
+
+
+def _git_files(root: Path) -> list[str] | None:
+    """files tracked by git or untracked and not ignored, None if root is not in a git work tree"""
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            cwd=root,
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return sorted(set(result.stdout.decode("utf-8", "surrogateescape").split("\0")) - {""})
+
+
+def _walk_files(root: Path) -> Iterator[str]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith(".") and name not in _SKIPPED_DIRS)
+        for filename in sorted(filenames):
+            yield Path(dirpath, filename).relative_to(root).as_posix()
+
+
+def iter_source_files(root: Path, exclude: Path | None = None) -> Iterator[str]:
+    """Iterate the files of the source tree of a project
+
+    Uses the files known to git, including untracked files that aren't ignored, and falls back to walking
+    the project directory without hidden directories.
+
+    Args:
+        root: the project root
+        exclude: a directory to skip, e.g. the build destination
+
+    Yields:
+        paths relative to the project root, in a stable order
+    """
+    files = _git_files(root)
+    excluded = None
+    if exclude is not None:
+        with suppress(ValueError):
+            excluded = exclude.resolve().relative_to(root.resolve()).as_posix() + "/"
+    for file in files if files is not None else _walk_files(root):
+        if excluded is not None and file.startswith(excluded):
+            continue
+        *dirs, name = file.split("/")
+        if name in _SKIPPED_FILES or not _SKIPPED_DIRS.isdisjoint(dirs):
+            continue
+        yield file
+
+
+def compute_fingerprint(root: Path, data: dict[str, Any], exclude: Path | None = None) -> str:
+    """Compute the fingerprint of a build
+
+    Args:
+        root: the project root
+        data: JSON serializable inputs of the build besides the source tree, e.g. the locked groups
+        exclude: a directory to skip, e.g. the build destination
+
+    Returns:
+        hex digest changing with the content of any source file and with the data
+    """
+    digest = hashlib.sha256(json.dumps({**data, "version": _cache._plugin_version()}, sort_keys=True).encode("utf-8"))
+    for file in iter_source_files(root, exclude):
+        path = root / file
+        if not path.is_file():
+            # deleted, but still tracked
+            continue
+        digest.update(file.encode("utf-8", "surrogateescape") + b"\0")
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()
+
+
+def get_sidecar_path(dest: Path, name: str) -> Path:
+    """Get the path of the file recording the fingerprint of the artifacts of a project in the build destination
+
+    Args:
+        dest: the build destination
+        name: the project name
+
+    Returns:
+        path of the sidecar file
+    """
+    return dest / f".pdm-build-locked-{normalize_name(name)}.json"
+
+
+def is_up_to_date(sidecar: Path, fingerprint: str) -> bool:
+    """Check whether the artifacts recorded with a fingerprint still exist
+
+    Args:
+        sidecar: path of the sidecar file
+        fingerprint: the fingerprint of the current build
+
+    Returns:
+        True if the recorded fingerprint matches and all recorded artifacts exist
+    """
+    try:
+        recorded = json.loads(sidecar.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    if not isinstance(recorded, dict) or recorded.get("fingerprint") != fingerprint:
+        return False
+    artifacts = recorded.get("artifacts") or []
+    return bool(artifacts) and all(sidecar.parent.joinpath(artifact).is_file() for artifact in artifacts)
+
+
+def record(sidecar: Path, fingerprint: str, artifacts: list[str]) -> None:
+    """Record the fingerprint of a build along with its artifacts
+
+    Args:
+        sidecar: path of the sidecar file
+        fingerprint: the fingerprint of the build
+        artifacts: file names of the built artifacts, relative to the build destination
+    """
+    sidecar.write_text(json.dumps({"fingerprint": fingerprint, "artifacts": sorted(artifacts)}), encoding="utf-8")
@@ -0,0 +1,376 @@
+"""Field-selective reader for pdm.lock and PEP 751 pylock.toml files"""
+
+from __future__ import annotations
+
+import functools
+import re
+import sys
+from collections.abc import Iterable, Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib  # pragma: no cover
+
+# package keys needed to build requirement strings and to filter by group
+PACKAGE_KEYS = frozenset(
+    {
+        "name",
+        "version",
+        "groups",
+        "extras",
+        "marker",
+        "url",
+        "git",
+        "hg",
+        "svn",
+        "bzr",
+        "ref",
+        "revision",
+        "editable",
+        "path",
+        "subdirectory",
+    }
+)
+
+# package keys needed to resolve the dependency graph of lockfiles without the inherit_metadata strategy
+GRAPH_PACKAGE_KEYS = PACKAGE_KEYS | {"dependencies"}
+
+_KEY_VALUE = re.compile(r"([A-Za-z0-9_-]+)\s*=\s*(.*)")
+# the rest of a multi-line array: indented strings or flat inline tables on lines of their own,
+# and the closing bracket at the start of a line
+_ARRAY_BODY = re.compile(r"""(?:[ \t]+(?:"(?:[^"\\\n]|\\.)*"|\{[^{}\[\]\n]*\}),?[ \t]*\r?\n)*\][ \t]*(?=\r?\n|$)""")
+
+
+_GROUP_CLAUSE = re.compile(r"""(["'])(?P<group>[^"']+)\1\s+in\s+(?:extras|dependency_groups)""")
+_GROUP_VARIABLE = re.compile(r"\b(?:extras|dependency_groups)\b")
+
+
+class _UnexpectedContent(ValueError):
+    """The lockfile doesn't follow the layout written by pdm"""
+
+
+class LockedPackage:
+    """A lockfile package reduced to the fields of its requirement string
+
+    Names and markers are interned, as they repeat across packages and lockfiles,
+    and group membership is a bitmask over the groups of the lockfile.
+    """
+
+    __slots__ = ("fields", "groups", "marker")
+
+    def __init__(self, fields: tuple[tuple[str, Any], ...], marker: str | None, groups: int) -> None:
+        self.fields = fields
+        self.marker = marker
+        self.groups = groups
+
+    def to_dict(self) -> dict[str, Any]:
+        """Get the package as a pdm.lock package item
+
+        Returns:
+            the requirement fields and the marker
+        """
+        req_dict = dict(self.fields)
+        if self.marker is not None:
+            req_dict["marker"] = self.marker
+        return req_dict
+
+
+def compact_packages(packages: Iterable[dict[str, Any]], group_names: Sequence[str]) -> list[LockedPackage]:
+    """Convert lockfile package items to compact records
+
+    The packages are only read. Pass them with consume_packages to free the parsed items while converting.
+
+    Args:
+        packages: the package items of a lockfile
+        group_names: the groups of the lockfile, the n-th group is bit n of LockedPackage.groups
+
+    Returns:
+        the compact records, packages not belonging to any of the groups are dropped
+    """
+    bits = {group: 1 << index for index, group in enumerate(group_names)}
+    records = []
+    for package in packages:
+        groups = 0
+        for group in package.get("groups", ()):
+            groups |= bits.get(group, 0)
+        if not groups:
+            continue
+        fields = tuple(
+            (key, sys.intern(value) if key in ("name", "version") else value)
+            for key, value in package.items()
+            if key not in ("groups", "marker")
+        )
+        marker = sys.intern(marker) if (marker := package.get("marker")) else None
+        records.append(LockedPackage(fields, marker, groups))
+    return records
+
+
+def consume_packages(packages: list[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+    """Iterate over a list of package items while emptying it, so each item can be freed once it is processed
+
+    Args:
+        packages: the package items, the list is empty afterwards
+
+    Returns:
+        the package items, in order
+    """
+    packages.reverse()
+    while packages:
+        yield packages.pop()
+
+
+def _scan_packages(text: str, keys: frozenset[str] = PACKAGE_KEYS) -> str:
+    """Reduce a pdm.lock document to the given keys for each [[package]] table.
+
+    Skipped values, most notably the per-package ``files`` hash arrays, are never handed to the TOML parser.
+    """
+    return "\n".join(_iter_package_chunks(text, keys, sys.maxsize))
+
+
+def _iter_package_chunks(text: str, keys: frozenset[str], batch_size: int) -> Iterator[str]:
+    """Reduce a pdm.lock document like _scan_packages, in chunks of the tables before the first package
+    and of batch_size [[package]] tables each
+    """
+    kept: list[str] = []
+    in_package = False
+    packages = 0
+    pos, length = 0, len(text)
+    while pos < length:
+        end = text.find("\n", pos)
+        if end == -1:
+            end = length
+        line = text[pos:end]
+        pos = end + 1
+        stripped = line.strip()
+        if line.startswith("["):
+            in_package = stripped == "[[package]]"
+            if not in_package and (packages or stripped.startswith(("[package", "[[package"))):
+                # other tables after the packages can't be parsed in chunks
+                raise _UnexpectedContent(f"Unexpected table {stripped}")
+            if in_package:
+                if packages % batch_size == 0 and kept:
+                    yield "\n".join(kept)
+                    kept = []
+                packages += 1
+            kept.append(line)
+            continue
+        if not in_package or not stripped or stripped.startswith("#"):
+            kept.append(line)
+            continue
+
+        match = _KEY_VALUE.fullmatch(stripped)
+        if match is None:
+            raise _UnexpectedContent(f"Unexpected line {line!r}")
+        key, value = match.groups()
+        if value.startswith(('"""', "'''")):
+            raise _UnexpectedContent(f"Unexpected multi-line string for {key}")
+        multiline = value.startswith("[") and not value.rstrip().endswith("]")
+        if multiline and value.rstrip() != "[":
+            raise _UnexpectedContent(f"Unexpected array layout for {key}")
+
+        if multiline:
+            body = _ARRAY_BODY.match(text, pos)
+            if body is None:
+                raise _UnexpectedContent(f"Unexpected array layout for {key}")
+            if key in keys:
+                kept.append(text[pos - len(line) - 1 : body.end()])
+            pos = body.end() + 1
+        elif key in keys:
+            kept.append(line)
+
+    if kept:
+        yield "\n".join(kept)
+
+
+def load_lockfile(content: str, keys: frozenset[str] = PACKAGE_KEYS) -> dict[str, Any]:
+    """Parse the content of a pdm.lock file, keeping only the package keys needed for locking.
+
+    Falls back to parsing the complete document if it doesn't follow the layout written by pdm.
+
+    Args:
+        content: text of the lockfile
+        keys: the package keys to keep
+
+    Returns:
+        The parsed lockfile, with packages restricted to the given keys
+    """
+    try:
+        return tomllib.loads(_scan_packages(content, keys))
+    except (_UnexpectedContent, tomllib.TOMLDecodeError):
+        lockfile_content = tomllib.loads(content)
+
+    for package in lockfile_content.get("package", []):
+        for key in set(package) - keys:
+            del package[key]
+    return lockfile_content
+
+
+def load_locked_packages(content: str, batch_size: int = 1000) -> tuple[dict[str, Any], list[LockedPackage]]:
+    """Parse the metadata and the compact package records of a pdm.lock file
+
+    The packages are parsed and converted in batches, so only the parsed items of a single batch are alive at a time.
+    Falls back to load_lockfile if the document doesn't follow the layout written by pdm.
+
+    Args:
+        content: text of the lockfile
+        batch_size: number of packages parsed at once
+
+    Returns:
+        The lockfile metadata and the package records, with group bits referring to ``metadata.groups``
+    """
+    try:
+        chunks = _iter_package_chunks(content, PACKAGE_KEYS, batch_size)
+        first = tomllib.loads(next(chunks, ""))
+        metadata = first.get("metadata", {})
+        group_names = metadata.get("groups", [])
+        records = compact_packages(consume_packages(first.get("package", [])), group_names)
+        for chunk in chunks:
+            records += compact_packages(consume_packages(tomllib.loads(chunk).get("package", [])), group_names)
+    except (_UnexpectedContent, tomllib.TOMLDecodeError):
+        lockfile_content = load_lockfile(content)
+        metadata = lockfile_content.get("metadata", {})
+        records = compact_packages(consume_packages(lockfile_content.get("package", [])), metadata.get("groups", []))
+    return metadata, records
+
+
+def is_pylock(lockfile: Path) -> bool:
+    """Check whether a lockfile is a PEP 751 lockfile, named pylock.toml or pylock.<name>.toml
+
+    Args:
+        lockfile: path of the lockfile
+
+    Returns:
+        True for pylock files
+    """
+    return lockfile.name.startswith("pylock.") and lockfile.suffix == ".toml"
+
+
+def _split_marker(marker: str, separator: str) -> list[str]:
+    """Split a marker on a boolean operator, ignoring operators in strings and parentheses"""
+    parts: list[str] = []
+    depth, quote, start = 0, "", 0
+    token = f" {separator} "
+    i = 0
+    while i < len(marker):
+        char = marker[i]
+        if quote:
+            if char == quote:
+                quote = ""
+        elif char in "\"'":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0 and marker.startswith(token, i):
+            parts.append(marker[start:i].strip())
+            i += len(token)
+            start = i
+            continue
+        i += 1
+    parts.append(marker[start:].strip())
+    return parts
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_marker(marker: str) -> tuple[tuple[frozenset[str], str], ...]:
+    """Compile a pylock marker into its disjunctions of (required groups, remaining environment marker)
+
+    pdm writes pylock markers in disjunctive normal form, with group membership encoded as
+    ``"<group>" in dependency_groups`` or ``"<group>" in extras`` clauses.
+
+    Raises:
+        ValueError: if group membership is used in an unsupported way
+    """
+    disjunctions = []
+    for conjunction in _split_marker(marker, "or"):
+        groups: set[str] = set()
+        clauses: list[str] = []
+        for clause in _split_marker(conjunction, "and"):
+            if match := _GROUP_CLAUSE.fullmatch(clause):
+                groups.add(match.group("group"))
+            elif _GROUP_VARIABLE.search(clause):
+                raise ValueError(f"Unsupported group marker: {marker}")
+            else:
+                clauses.append(clause)
+        disjunctions.append((frozenset(groups), " and ".join(clauses)))
+    return tuple(disjunctions)
+
+
+@functools.lru_cache(maxsize=None)
+def _group_marker(marker: str, group: str) -> str | None:
+    """Get the environment marker of a pylock marker when installing a single group
+
+    Returns:
+        The remaining marker, an empty string if unconditional, None if the package is not part of the group
+    """
+    conditions: list[str] = []
+    for groups, condition in _compile_marker(marker):
+        if not groups <= {group}:
+            continue
+        if not condition:
+            return ""
+        if condition not in conditions:
+            conditions.append(condition)
+    return " or ".join(conditions) if conditions else None
+
+
+def _pylock_package_to_dict(package: dict[str, Any]) -> dict[str, Any]:
+    """Convert a pylock [[packages]] entry to the keys of a pdm.lock package"""
+    req_dict: dict[str, Any] = {key: package[key] for key in ("name", "version") if key in package}
+    source: dict[str, Any] = {}
+    if vcs := package.get("vcs"):
+        source = vcs
+        if "url" in vcs:
+            req_dict[vcs["type"]] = vcs["url"]
+        req_dict["revision"] = vcs.get("commit-id", vcs.get("requested-revision"))
+    elif archive := package.get("archive"):
+        source = archive
+        if "url" in archive:
+            req_dict["url"] = archive["url"]
+    elif directory := package.get("directory"):
+        source = directory
+        if directory.get("editable"):
+            req_dict["editable"] = True
+    if "path" in source and "url" not in source:
+        req_dict["path"] = source["path"]
+    if "subdirectory" in source:
+        req_dict["subdirectory"] = source["subdirectory"]
+    return req_dict
+
+
+def load_pylock(content: str) -> dict[str, Any]:
+    """Parse the content of a PEP 751 pylock.toml file into the structure of a pdm.lock file.
+
+    Group membership is read from the package markers. Each distinct marker is compiled once and
+    packages are recorded with the groups they belong to, alongside the marker remaining for each group.
+
+    Args:
+        content: text of the lockfile
+
+    Returns:
+        The lockfile with ``metadata.groups`` and ``package`` entries like in pdm.lock
+    """
+    pylock = tomllib.loads(content)
+    groups = list(dict.fromkeys(["default", *pylock.get("dependency-groups", []), *pylock.get("extras", [])]))
+    packages: list[dict[str, Any]] = []
+    for package in pylock.get("packages", []):
+        req_dict = _pylock_package_to_dict(package)
+        # group the groups by their remaining marker, so each requirement string is only formatted once
+        conditions: dict[str, list[str]] = {}
+        try:
+            for group in groups:
+                condition = _group_marker(marker, group) if (marker := package.get("marker")) else ""
+                if condition is not None:
+                    conditions.setdefault(condition, []).append(group)
+        except ValueError as e:
+            print(f"Skipping unsupported requirement: {e}")
+            continue
+        for condition, condition_groups in conditions.items():
+            packages.append({**req_dict, "groups": condition_groups, **({"marker": condition} if condition else {})})
+
+    # group membership is encoded in the markers, which is equivalent to the inherit_metadata strategy
+    return {"metadata": {"groups": groups, "strategy": ["inherit_metadata"]}, "package": packages}
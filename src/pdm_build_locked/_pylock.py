@@ -0,0 +1,310 @@
+"""Writer of PEP 751 pylock.toml sidecars with the locked groups of a wheel"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import Any
+
+from . import _lockfile
+from ._utils import find_lockfile, normalize_name
+
+# name of the sidecar in the .dist-info directory of the wheel
+PYLOCK_NAME = "pylock.toml"
+PYLOCK_ENV = "PDM_BUILD_LOCKED_PYLOCK"
+
+# package keys needed to write the pylock packages, in addition to the keys needed for locking
+PYLOCK_PACKAGE_KEYS = _lockfile.PACKAGE_KEYS | {"files", "requires_python"}
+
+_BARE_KEY = re.compile(r"[A-Za-z0-9_-]+")
+_VCS_KEYS = ("git", "hg", "svn", "bzr")
+# the group lists of a pylock.toml, written on a single line by pdm
+_GROUP_LIST = re.compile(r"(extras|dependency-groups|default-groups) = \[.*\]")
+
+
+class MissingFileURL(ValueError):
+    """A locked file has no URL to install it from"""
+
+
+def pylock_enabled(settings: Mapping[str, Any]) -> bool:
+    """Check whether a pylock.toml sidecar should be embedded in the wheel
+
+    Args:
+        settings: the build configuration, e.g. [tool.pdm.build]
+
+    Returns:
+        True if PDM_BUILD_LOCKED_PYLOCK is set or locked-pylock is configured
+    """
+    if os.getenv(PYLOCK_ENV, "false") != "false":
+        return True
+    return bool(settings.get("locked-pylock", False))
+
+
+def get_original_groups(locked_groups: Iterable[str]) -> list[str]:
+    """Get the original group names of locked groups, the inverse of get_locked_group_name
+
+    Args:
+        locked_groups: names of optional-dependencies groups, groups not created by locking are ignored
+
+    Returns:
+        the original group names
+    """
+    groups = []
+    for locked_group in locked_groups:
+        if locked_group == "locked":
+            groups.append("default")
+        elif locked_group.endswith("-locked"):
+            groups.append(locked_group[: -len("-locked")])
+    return groups
+
+
+def _toml_key(key: str) -> str:
+    return key if _BARE_KEY.fullmatch(key) else json.dumps(key)
+
+
+def _toml_value(value: Any) -> str:
+    """format a value as inline TOML, JSON strings are valid TOML basic strings"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{_toml_key(k)} = {_toml_value(v)}" for k, v in value.items()) + "}"
+    if isinstance(value, list):
+        return "[" + ", ".join(_toml_value(v) for v in value) + "]"
+    raise TypeError(f"Unsupported value: {value!r}")
+
+
+def _hashes(file: dict[str, str]) -> dict[str, str]:
+    algorithm, _, digest = file.get("hash", "").partition(":")
+    return {algorithm: digest} if digest else {}
+
+
+def _file_entry(file: dict[str, str]) -> dict[str, Any]:
+    entry: dict[str, Any] = {}
+    if "file" in file:
+        entry["name"] = file["file"]
+    if "url" in file:
+        entry.setdefault("name", file["url"].rsplit("/", 1)[-1])
+        entry["url"] = file["url"]
+    entry["hashes"] = _hashes(file)
+    return entry
+
+
+def _package_marker(package: dict[str, Any], groups: list[str]) -> str:
+    """marker of a package in disjunctive normal form, as expected by installers and _lockfile.load_pylock"""
+    marker = package.get("marker", "")
+    package_groups = [group for group in groups if group in package.get("groups", [])]
+    if "default" in package_groups:
+        return marker
+    if marker and " or " in marker:
+        marker = f"({marker})"
+    return " or ".join(
+        f"{marker} and {json.dumps(group)} in extras" if marker else f"{json.dumps(group)} in extras"
+        for group in package_groups
+    )
+
+
+def _package_to_pylock(package: dict[str, Any], groups: list[str]) -> dict[str, Any] | None:
+    """Convert a pdm.lock package to a pylock [[packages]] entry
+
+    Returns:
+        the entry, None if the package is not part of the groups or can't be installed from a lock
+
+    Raises:
+        MissingFileURL: if a file of the package has no URL
+    """
+    if not any(group in package.get("groups", []) for group in groups):
+        return None
+    if "extras" in package or "editable" in package or "path" in package:
+        # the extras of a package are separate pdm.lock entries for the same distribution, local paths are not portable
+        return None
+    entry: dict[str, Any] = {"name": normalize_name(package["name"])}
+    vcs = next((key for key in _VCS_KEYS if key in package), None)
+    if "version" in package and "url" not in package and vcs is None:
+        entry["version"] = package["version"]
+    if marker := _package_marker(package, groups):
+        entry["marker"] = marker
+    if "requires_python" in package:
+        entry["requires-python"] = package["requires_python"]
+
+    files = package.get("files", [])
+    subdirectory = {"subdirectory": package["subdirectory"]} if "subdirectory" in package else {}
+    if vcs is not None:
+        entry["vcs"] = {"type": vcs, "url": package[vcs]}
+        if "ref" in package:
+            entry["vcs"]["requested-revision"] = package["ref"]
+        entry["vcs"]["commit-id"] = package.get("revision", package.get("ref", ""))
+        entry["vcs"].update(subdirectory)
+    elif "url" in package:
+        entry["archive"] = {"url": package["url"], "hashes": _hashes(files[0]) if files else {}, **subdirectory}
+    else:
+        if any("url" not in file for file in files):
+            # pdm.lock only records the file names unless locked with static URLs, installers need a path or URL
+            raise MissingFileURL(
+                f"The locked files of {package['name']} have no URL, "
+                "lock with `pdm lock --static-urls` to embed a pylock.toml"
+            )
+        wheels = [_file_entry(file) for file in files if file.get("file", file.get("url", "")).endswith(".whl")]
+        sdists = [_file_entry(file) for file in files if not file.get("file", file.get("url", "")).endswith(".whl")]
+        if sdists:
+            entry["sdist"] = sdists[0]
+        if wheels:
+            entry["wheels"] = wheels
+    return entry
+
+
+def dump_pylock(lockfile_content: dict[str, Any], groups: list[str], requires_python: str = "") -> str:
+    """Write a PEP 751 lockfile with the packages of the given groups
+
+    Packages of the default group are unconditional, packages of other groups are guarded by
+    ``"<group>" in extras`` markers. The files and hashes are taken from the pdm.lock.
+
+    Args:
+        lockfile_content: a pdm.lock with the inherit_metadata strategy, parsed with PYLOCK_PACKAGE_KEYS
+        groups: the groups to include
+        requires_python: the requires-python of the project
+
+    Returns:
+        the content of the pylock.toml
+
+    Raises:
+        MissingFileURL: if the lockfile wasn't locked with static URLs
+    """
+    lines = ['lock-version = "1.0"']
+    if requires_python:
+        lines.append(f"requires-python = {_toml_value(requires_python)}")
+    lines.append(f"extras = {_toml_value([group for group in groups if group != 'default'])}")
+    lines += ["dependency-groups = []", "default-groups = []", 'created-by = "pdm-build-locked"']
+    for package in lockfile_content.get("package", []):
+        if (entry := _package_to_pylock(package, groups)) is None:
+            continue
+        lines += ["", "[[packages]]"]
+        for key, value in entry.items():
+            if key == "wheels":
+                lines.append("wheels = [")
+                lines += [f"    {_toml_value(wheel)}," for wheel in value]
+                lines.append("]")
+            else:
+                lines.append(f"{_toml_key(key)} = {_toml_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _in_groups(package: str, groups: list[str]) -> bool:
+    """check whether the [[packages]] table of a pylock.toml is installed with any of the groups"""
+    marker = _lockfile.tomllib.loads(package)["packages"][0].get("marker")
+    if not marker:
+        return True
+    try:
+        return any(_lockfile._group_marker(marker, group) is not None for group in groups)
+    except ValueError:
+        # like in the metadata of the wheel, packages with unsupported group markers are skipped
+        return False
+
+
+def filter_pylock(content: str, groups: list[str]) -> str:
+    """Reduce a PEP 751 lockfile to the packages of the given groups
+
+    The [[packages]] tables of the selected groups are kept as they are, along with their sub-tables,
+    and the ``extras``, ``dependency-groups`` and ``default-groups`` of the lockfile are restricted to the groups.
+
+    Args:
+        content: text of the pylock.toml
+        groups: the groups to include
+
+    Returns:
+        the content of the reduced pylock.toml
+    """
+    head: list[str] = []
+    packages: list[list[str]] = []
+    tables: list[str] = []
+    current = head
+    for line in content.splitlines(keepends=True):
+        if line.startswith("["):
+            header = line.strip()
+            if header == "[[packages]]":
+                current = []
+                packages.append(current)
+            elif not header.startswith(("[packages.", "[[packages.")):
+                current = tables
+        elif current is head and (match := _GROUP_LIST.fullmatch(line.rstrip())):
+            values = _lockfile.tomllib.loads(line)[match.group(1)]
+            line = f"{match.group(1)} = {_toml_value([value for value in values if value in groups])}\n"
+        current.append(line)
+    kept = [line for package in packages if _in_groups("".join(package), groups) for line in package]
+    return "".join(head + kept + tables)
+
+
+def load_locked_pylock(root: Path, groups: list[str], requires_python: str = "") -> str | None:
+    """Get the pylock.toml sidecar of a project
+
+    A pdm.lock is converted to a PEP 751 lockfile with the given groups,
+    a pylock.toml lockfile already is one and is reduced to the given groups.
+
+    Args:
+        root: The path to the project root
+        groups: the groups to include
+        requires_python: the requires-python of the project
+
+    Returns:
+        the content of the pylock.toml, None if the lockfile is missing or doesn't use the inherit_metadata strategy
+
+    Raises:
+        MissingFileURL: if the pdm.lock wasn't locked with static URLs
+    """
+    lockfile = find_lockfile(root)
+    if not lockfile.exists():
+        return None
+    content = lockfile.read_text(encoding="utf-8")
+    if _lockfile.is_pylock(lockfile):
+        return filter_pylock(content, groups)
+    lockfile_content = _lockfile.load_lockfile(content, PYLOCK_PACKAGE_KEYS)
+    if "inherit_metadata" not in lockfile_content.get("metadata", {}).get("strategy", []):
+        return None
+    return dump_pylock(lockfile_content, groups, requires_python)
+
+
+def embed_pylock(wheel: Path, content: str) -> bool:
+    """Add a pylock.toml sidecar to the .dist-info directory of a built wheel and record it in RECORD
+
+    Args:
+        wheel: path of the wheel
+        content: content of the pylock.toml
+
+    Returns:
+        False if the wheel already contains a pylock.toml sidecar
+    """
+    data = content.encode("utf-8")
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=").decode("ascii")
+    with zipfile.ZipFile(wheel) as source:
+        record_info = next(info for info in source.infolist() if info.filename.endswith(".dist-info/RECORD"))
+        pylock_name = f"{record_info.filename.rsplit('/', 1)[0]}/{PYLOCK_NAME}"
+        if pylock_name in source.namelist():
+            return False
+        # keep the timestamps of the wheel for reproducible builds
+        pylock_info = zipfile.ZipInfo(pylock_name, date_time=record_info.date_time)
+        pylock_info.compress_type = zipfile.ZIP_DEFLATED
+        pylock_info.external_attr = record_info.external_attr
+        record = source.read(record_info).decode("utf-8").rstrip("\n")
+        record += f"\n{pylock_name},sha256={digest},{len(data)}\n"
+        fd, temp_name = tempfile.mkstemp(suffix=".whl", dir=wheel.parent)
+        try:
+            with os.fdopen(fd, "wb") as temp, zipfile.ZipFile(temp, "w") as target:
+                for info in source.infolist():
+                    if info is not record_info:
+                        target.writestr(info, source.read(info))
+                target.writestr(pylock_info, data)
+                target.writestr(record_info, record)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+    shutil.move(temp_name, wheel)
+    return True
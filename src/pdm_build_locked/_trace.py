@@ -0,0 +1,144 @@
+"""Opt-in tracing of locked builds in the Chrome trace event format
+
+Set PDM_BUILD_LOCKED_TRACE to a file path to record the duration of each build phase, along with counters.
+The file can be opened in chrome://tracing or https://ui.perfetto.dev. Events of several processes, e.g.
+``pdm build --locked`` and the build backend subprocess, are appended to the same file.
+Set PDM_BUILD_LOCKED_TRACE_MEMORY to additionally record the peak memory of each phase with tracemalloc.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext, suppress
+from typing import Any, ContextManager
+
+TRACE_ENV = "PDM_BUILD_LOCKED_TRACE"
+TRACE_MEMORY_ENV = "PDM_BUILD_LOCKED_TRACE_MEMORY"
+
+_LOCK = threading.Lock()
+# peak memory of the open spans, tracemalloc only tracks a single peak which is reset for nested spans
+_PEAKS = threading.local()
+# number of open spans tracing memory, tracemalloc is stopped with the outermost one if they started it
+_MEMORY_SPANS = 0
+_STARTED_TRACEMALLOC = False
+
+
+def _now() -> float:
+    """timestamp in microseconds, as expected by the trace event format"""
+    return time.perf_counter_ns() / 1000
+
+
+def _emit(event: dict[str, Any]) -> None:
+    """append an event to the trace file, in the JSON array format which allows omitting the closing bracket"""
+    path = os.environ[TRACE_ENV]
+    event = {"pid": os.getpid(), "tid": threading.get_ident(), **event}
+    line = json.dumps(event) + ",\n"
+    # tracing must never fail the build
+    with _LOCK, suppress(OSError):
+        if not os.path.exists(path):
+            _create_trace_file(path)
+        with open(path, "a", encoding="utf-8") as f:
+            # an empty file created beforehand, e.g. by the user
+            f.write(("[\n" if f.tell() == 0 else "") + line)
+
+
+def _create_trace_file(path: str) -> None:
+    """create the trace file along with the opening bracket, only one of several processes racing to create it wins
+
+    The file is linked into place once written, so other processes never append to it before the bracket.
+    """
+    temporary = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write("[\n")
+    try:
+        os.link(temporary, path)
+    except FileExistsError:
+        pass
+    except OSError:
+        # the file system doesn't support hard links
+        with suppress(FileExistsError), open(path, "x", encoding="utf-8") as f:
+            f.write("[\n")
+    finally:
+        os.unlink(temporary)
+
+
+def enabled() -> bool:
+    """Check whether tracing is enabled
+
+    Returns:
+        True if PDM_BUILD_LOCKED_TRACE is set
+    """
+    return bool(os.getenv(TRACE_ENV))
+
+
+def span(name: str, **args: Any) -> ContextManager[dict[str, Any]]:
+    """Record the duration of a build phase
+
+    Args:
+        name: name of the phase
+        args: additional arguments shown with the span
+
+    Returns:
+        context manager yielding the arguments of the span, which can be extended within the span
+    """
+    if not enabled():
+        return nullcontext(args)
+    return _span(name, args)
+
+
+def _enter_memory_span() -> None:
+    global _MEMORY_SPANS, _STARTED_TRACEMALLOC
+    with _LOCK:
+        if _MEMORY_SPANS == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _STARTED_TRACEMALLOC = True
+        _MEMORY_SPANS += 1
+
+
+def _exit_memory_span() -> None:
+    global _MEMORY_SPANS, _STARTED_TRACEMALLOC
+    with _LOCK:
+        _MEMORY_SPANS -= 1
+        if _MEMORY_SPANS == 0 and _STARTED_TRACEMALLOC:
+            tracemalloc.stop()
+            _STARTED_TRACEMALLOC = False
+
+
+@contextmanager
+def _span(name: str, args: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    trace_memory = bool(os.getenv(TRACE_MEMORY_ENV))
+    if trace_memory:
+        _enter_memory_span()
+        peaks = _PEAKS.__dict__.setdefault("stack", [])
+        if peaks:
+            peaks[-1] = max(peaks[-1], tracemalloc.get_traced_memory()[1])
+        peaks.append(0)
+        tracemalloc.reset_peak()
+    start = _now()
+    try:
+        yield args
+    finally:
+        end = _now()
+        if trace_memory:
+            peak = max(peaks.pop(), tracemalloc.get_traced_memory()[1])
+            if peaks:
+                peaks[-1] = max(peaks[-1], peak)
+            args["peak_memory"] = peak
+            _exit_memory_span()
+        _emit({"name": name, "cat": "pdm-build-locked", "ph": "X", "ts": start, "dur": end - start, "args": args})
+
+
+def counter(name: str, **values: int) -> None:
+    """Record counters, e.g. the number of packages scanned
+
+    Args:
+        name: name of the counter series
+        values: the counter values
+    """
+    if enabled():
+        _emit({"name": name, "cat": "pdm-build-locked", "ph": "C", "ts": _now(), "args": values})
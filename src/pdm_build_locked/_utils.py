@@ -1,22 +1,76 @@
 from __future__ import annotations
 
+import functools
+import hashlib
+import json
 import os
-import sys
+import re
 import warnings
-from collections.abc import MutableMapping
+from collections.abc import Iterable, Iterator, Mapping, MutableMapping
 from pathlib import Path
-from typing import Any
+from typing import Any, FrozenSet, Optional, Tuple
 
-if sys.version_info >= (3, 11):
-    import tomllib
-else:
-    import tomli as tomllib  # pragma: no cover
+from . import _cache, _lockfile, _trace
+
+# locked groups computed by `pdm build --locked`, handed over to the build backend hooks
+LOCKED_GROUPS_ENV = "PDM_BUILD_LOCKED_GROUPS"
+
+# process-level memo of load_locked_groups, shared by all hook invocations in one build process
+_LOCKED_GROUPS_MEMO: dict[tuple[Any, ...], dict[str, list[str] | None] | None] = {}
+
+_MARKER_TOKEN = re.compile(r"""\s*(?:('[^']*'|"[^"]*")|(===|==|!=|<=|>=|~=|<|>)|([()])|([A-Za-z_][A-Za-z0-9_.]*))""")
+_PYTHON_SPECIFIER = re.compile(r"\s*(>=|>|<|~=|==)\s*([0-9]+(?:\.[0-9]+)*)(\.\*)?\s*")
+
+_REQUIREMENT_NAME = re.compile(r"\s*([A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)\s*(?:\[([^\]]*)\])?")
+
+# condition of a locked package in disjunctive normal form: alternative sets of markers that all have to hold
+Condition = FrozenSet[FrozenSet[str]]
+_ALWAYS: Condition = frozenset({frozenset()})
+
+# parsed marker: ("or" | "and", children) or ("clause", lhs, op, rhs) with lhs/rhs as ("var" | "str", value)
+MarkerNode = Tuple[Any, ...]
+# bounds of requires-python: inclusive lower and exclusive upper version
+PythonBounds = Tuple[Optional[Tuple[int, ...]], Optional[Tuple[int, ...]]]
+# environment implied by a wheel tag: the marker variables it determines, sorted, and the bounds of python versions
+WheelEnvironment = Tuple[Tuple[Tuple[str, str], ...], PythonBounds]
+
+_PYTHON_TAG = re.compile(r"(py|cp|pp)([0-9])([0-9]*)")
+# implementation_name and platform_python_implementation of the python tag prefixes
+_IMPLEMENTATIONS = {"cp": ("cpython", "CPython"), "pp": ("pypy", "PyPy")}
+# platform tag patterns with their sys_platform, platform_system and os_name
+_PLATFORM_TAGS = (
+    (re.compile(r"(?:manylinux[0-9]*|musllinux)(?:_[0-9]+_[0-9]+)?_.+|linux_.+"), ("linux", "Linux", "posix")),
+    (re.compile(r"macosx_[0-9]+_[0-9]+_.+"), ("darwin", "Darwin", "posix")),
+    (re.compile(r"win32|win_.+"), ("win32", "Windows", "nt")),
+)
+# platform_machine reports the machine of the OS, e.g. AMD64 for 32-bit python on 64-bit windows or x86_64 for i686
+# userlands on 64-bit kernels, it is only implied by tags of architectures no other one can install
+_PLATFORM_MACHINES = {re.compile(r"macosx_[0-9]+_[0-9]+_arm64"): "arm64"}
+
+
+# content hash of the pyproject.toml the lockfile was created for, in the [metadata] table of pdm.lock
+# or the [tool.pdm] table of pylock.toml
+_CONTENT_HASH = re.compile(r'^content_hash = "(?P<algo>[A-Za-z0-9_-]+):(?P<digest>[0-9a-f]+)"', re.MULTILINE)
+_PYLOCK_HASH = re.compile(r'^hashes = \{(?P<algo>[A-Za-z0-9_-]+) = "(?P<digest>[0-9a-f]+)"\}', re.MULTILINE)
+# the tables holding the content hash are written at the start of pdm.lock and at the end of pylock.toml
+_LOCKFILE_HASH_CHUNK = 65536
+
+# number of the largest requirements named per group in the metadata budget report
+_BUDGET_TOP_REQUIREMENTS = 3
 
 
 class UnsupportedRequirement(ValueError):
     """Requirement not complying with PEP 508"""
 
 
+class StaleLockfile(ValueError):
+    """The lockfile doesn't match pyproject.toml"""
+
+
+class MetadataBudgetExceeded(ValueError):
+    """The locked groups add more to the core metadata than the configured budget"""
+
+
 def requirement_dict_to_string(req_dict: dict[str, Any]) -> str:
     """Build a requirement string from a package item from pdm.lock
 
@@ -71,8 +125,1152 @@ def get_locked_group_name(group: str) -> str:
     return group_name
 
 
+def normalize_name(name: str) -> str:
+    """Normalize a project name according to PEP 503
+
+    Args:
+        name: the project name
+
+    Returns:
+        the normalized name
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _split_marker(requirement: str) -> tuple[str, str]:
+    """split a requirement string into the requirement and its marker, which is empty if there is none"""
+    # the marker of a URL requirement must be separated by whitespace, URLs may contain ';'
+    name, _, marker = requirement.partition(" ;" if " @ " in requirement else ";")
+    return name.rstrip(), marker.strip()
+
+
+def canonicalize_requirement(requirement: str) -> str:
+    """Format a requirement string canonically: normalized project name and ` ; ` before the marker
+
+    Args:
+        requirement: a PEP 508 requirement string
+
+    Returns:
+        the canonical requirement string
+    """
+    requirement = requirement.strip()
+    match = _REQUIREMENT_NAME.match(requirement)
+    if match is None:
+        return requirement
+    name, marker = _split_marker(normalize_name(match.group(1)) + requirement[match.end(1) :])
+    return f"{name} ; {marker}" if marker else name
+
+
+def canonicalize_locked_groups(locked_groups: Mapping[str, list[str]]) -> dict[str, list[str]]:
+    """Order locked groups and their requirements canonically
+
+    Identical locked dependencies then give byte-identical metadata, regardless of the lockfile format,
+    the resolution path and the iteration order of sets.
+
+    Args:
+        locked_groups: mapping of locked group name to requirements
+
+    Returns:
+        the groups sorted by name, each with its canonical requirements sorted and deduplicated
+    """
+    return {
+        group: sorted({canonicalize_requirement(requirement) for requirement in requirements})
+        for group, requirements in sorted(locked_groups.items())
+    }
+
+
+def compact_locked_groups(name: str, optional_dependencies: dict[str, list[str]]) -> dict[str, list[str]]:
+    """Delta-encode the optional locked groups against the `locked` group
+
+    Each `<group>-locked` group only keeps the requirements not already pinned in `locked`
+    and refers to `<name>[locked]` for the others, which installs the same packages.
+
+    Args:
+        name: the project name
+        optional_dependencies: mapping of group name to requirements, including the locked groups
+
+    Returns:
+        the optional dependencies with compacted locked groups
+    """
+    pinned = set(optional_dependencies.get("locked", []))
+    if not pinned:
+        return optional_dependencies
+    self_reference = f"{normalize_name(name)}[locked]"
+    compacted = {}
+    for group, requirements in optional_dependencies.items():
+        if group.endswith("-locked"):
+            delta = [requirement for requirement in requirements if requirement not in pinned]
+            if len(delta) < len(requirements):
+                requirements = [*delta, self_reference]
+        compacted[group] = requirements
+    return compacted
+
+
+def dump_handover_groups(name: str, locked_groups: dict[str, list[str]]) -> str:
+    """Serialize locked groups to be handed over to the build backend via PDM_BUILD_LOCKED_GROUPS
+
+    Args:
+        name: the project name the groups were computed for
+        locked_groups: mapping of locked group name to requirements
+
+    Returns:
+        the value for PDM_BUILD_LOCKED_GROUPS
+    """
+    return json.dumps({"name": normalize_name(name), "optional-dependencies": locked_groups})
+
+
+def get_handover_groups(metadata: MutableMapping[str, Any]) -> dict[str, list[str]] | None:
+    """Get the locked groups handed over by `pdm build --locked` for this project
+
+    Args:
+        metadata: The metadata dictionary of the project being built
+
+    Returns:
+        mapping of locked group name to requirements, None if nothing was handed over for this project
+    """
+    if not (handover := os.getenv(LOCKED_GROUPS_ENV)):
+        return None
+    data = json.loads(handover)
+    if data.get("name") != normalize_name(metadata.get("name", "")):
+        # groups were computed for another project, e.g. a build dependency built from source
+        return None
+    return data["optional-dependencies"]
+
+
+def _tokenize_marker(marker: str) -> list[tuple[str, str]]:
+    tokens: list[tuple[str, str]] = []
+    pos = 0
+    while pos < len(marker.rstrip()):
+        match = _MARKER_TOKEN.match(marker, pos)
+        if match is None:
+            raise ValueError(f"Invalid marker: {marker}")
+        string, op, paren, word = match.groups()
+        if string is not None:
+            tokens.append(("str", string[1:-1]))
+        elif op is not None:
+            tokens.append(("op", op))
+        elif paren is not None:
+            tokens.append((paren, paren))
+        elif word in ("and", "or"):
+            tokens.append((word, word))
+        elif word == "in":
+            tokens.append(("op", "in"))
+        elif word == "not" and tokens and tokens[-1][0] in ("var", "str"):
+            # `not in` is the only use of `not` in markers
+            next_match = _MARKER_TOKEN.match(marker, match.end())
+            if next_match is None or next_match.group(4) != "in":
+                raise ValueError(f"Invalid marker: {marker}")
+            tokens.append(("op", "not in"))
+            match = next_match
+        else:
+            tokens.append(("var", word))
+        pos = match.end()
+    return tokens
+
+
+def _parse_marker(tokens: list[tuple[str, str]], pos: int = 0) -> tuple[MarkerNode, int]:
+    """recursive descent parser of `expr := conjunction ("or" conjunction)*`"""
+    conjunctions = []
+    while True:
+        clauses = []
+        while True:
+            if pos < len(tokens) and tokens[pos][0] == "(":
+                node, pos = _parse_marker(tokens, pos + 1)
+                if pos >= len(tokens) or tokens[pos][0] != ")":
+                    raise ValueError("Unbalanced parentheses in marker")
+                pos += 1
+            elif (
+                pos + 2 < len(tokens)
+                and tokens[pos][0] in ("var", "str")
+                and tokens[pos + 1][0] == "op"
+                and tokens[pos + 2][0] in ("var", "str")
+            ):
+                node = ("clause", tokens[pos], tokens[pos + 1][1], tokens[pos + 2])
+                pos += 3
+            else:
+                raise ValueError("Invalid marker clause")
+            clauses.append(node)
+            if pos < len(tokens) and tokens[pos][0] == "and":
+                pos += 1
+                continue
+            break
+        conjunctions.append(clauses[0] if len(clauses) == 1 else ("and", tuple(clauses)))
+        if pos < len(tokens) and tokens[pos][0] == "or":
+            pos += 1
+            continue
+        break
+    return (conjunctions[0] if len(conjunctions) == 1 else ("or", tuple(conjunctions))), pos
+
+
+@functools.lru_cache(maxsize=None)
+def _marker_node(marker: str) -> MarkerNode | None:
+    """parse an environment marker, memoized per distinct marker, None if it can't be parsed"""
+    try:
+        tokens = _tokenize_marker(marker)
+        node, pos = _parse_marker(tokens)
+    except ValueError:
+        return None
+    return node if pos == len(tokens) else None
+
+
+def _render_marker(node: MarkerNode, parent: str = "") -> str:
+    if node[0] == "clause":
+        lhs, op, rhs = node[1:]
+        return f"{_render_marker_value(lhs)} {op} {_render_marker_value(rhs)}"
+    rendered = f" {node[0]} ".join(_render_marker(child, node[0]) for child in node[1])
+    return f"({rendered})" if parent == "and" and node[0] == "or" else rendered
+
+
+def _render_marker_value(value: tuple[str, str]) -> str:
+    kind, text = value
+    if kind == "var":
+        return text
+    return f"'{text}'" if '"' in text else f'"{text}"'
+
+
+def _marker_key(node: MarkerNode) -> Any:
+    """key identifying equivalent markers, independent of the order of and/or operands"""
+    if node[0] == "clause":
+        return _render_marker(node)
+    return (node[0], frozenset(_marker_key(child) for child in node[1]))
+
+
+def _pad(release: tuple[int, ...], length: int) -> tuple[int, ...]:
+    return release + (0,) * (length - len(release))
+
+
+def _parse_version(version: str, length: int) -> tuple[int, ...] | None:
+    if not re.fullmatch(r"[0-9]+(?:\.[0-9]+)*", version):
+        return None
+    release = tuple(int(part) for part in version.split("."))
+    return _pad(release, length) if len(release) <= length else None
+
+
+@functools.lru_cache(maxsize=None)
+def _python_bounds(requires_python: str) -> PythonBounds:
+    """inclusive lower and exclusive upper bound of requires-python, None if unbounded or not understood"""
+    lower: tuple[int, ...] | None = None
+    upper: tuple[int, ...] | None = None
+    for specifier in requires_python.split(","):
+        match = _PYTHON_SPECIFIER.fullmatch(specifier)
+        if match is None:
+            continue
+        op, version, wildcard = match.groups()
+        release = tuple(int(part) for part in version.split("."))
+        spec_lower: tuple[int, ...] | None = None
+        spec_upper: tuple[int, ...] | None = None
+        if op in (">=", ">"):
+            # `>` is weakened to `>=`, which is still a sound lower bound
+            spec_lower = release
+        elif op == "<" and not wildcard:
+            spec_upper = release
+        elif op == "~=" and len(release) >= 2 and not wildcard:
+            spec_lower = release
+            spec_upper = (*release[:-2], release[-2] + 1)
+        elif op == "==" and (wildcard or len(release) <= 3):
+            spec_lower = release
+            spec_upper = (
+                (*release[:-1], release[-1] + 1) if wildcard else (*_pad(release, 3)[:2], _pad(release, 3)[2] + 1)
+            )
+        if spec_lower is not None and len(spec_lower) <= 3:
+            lower = max(lower or (), _pad(spec_lower, 3))
+        if spec_upper is not None and len(spec_upper) <= 3:
+            upper = min(upper, _pad(spec_upper, 3)) if upper is not None else _pad(spec_upper, 3)
+    return lower or None, upper
+
+
+def _is_implied(node: MarkerNode, bounds: PythonBounds) -> bool:
+    """check whether a python_version or python_full_version clause always holds within requires-python"""
+    (lhs_kind, variable), op, (rhs_kind, version) = node[1:]
+    if lhs_kind != "var" or rhs_kind != "str" or variable not in ("python_version", "python_full_version"):
+        return False
+    lower, upper = bounds
+    if variable == "python_version":
+        release = _parse_version(version, 2)
+        if release is None:
+            return False
+        if op in (">=", ">"):
+            return lower is not None and (lower[:2] >= release if op == ">=" else lower[:2] > release)
+        if op in ("<", "<="):
+            limit = (*release, 0) if op == "<" else (release[0], release[1] + 1, 0)
+            return upper is not None and upper <= limit
+        return False
+    release = _parse_version(version, 3)
+    if release is None:
+        return False
+    if op in (">=", ">"):
+        return lower is not None and (lower >= release if op == ">=" else lower > release)
+    if op in ("<", "<="):
+        return upper is not None and upper <= release
+    return False
+
+
+_NEGATED_OPERATORS = {"<": ">=", "<=": ">", ">=": "<", ">": "<="}
+
+
+def _is_excluded(node: MarkerNode, bounds: PythonBounds) -> bool:
+    """check whether a marker never holds within requires-python"""
+    if node[0] == "and":
+        return any(_is_excluded(child, bounds) for child in node[1])
+    if node[0] == "or":
+        return all(_is_excluded(child, bounds) for child in node[1])
+    lhs, op, rhs = node[1:]
+    return op in _NEGATED_OPERATORS and _is_implied(("clause", lhs, _NEGATED_OPERATORS[op], rhs), bounds)
+
+
+@functools.lru_cache(maxsize=None)
+def is_marker_excluded(marker: str, requires_python: str) -> bool:
+    """Check whether an environment marker never holds for the given requires-python
+
+    Args:
+        marker: the environment marker
+        requires_python: the requires-python of the project
+
+    Returns:
+        True if a python_version or python_full_version clause rules out all versions of requires-python,
+        False if the marker may hold or can't be parsed
+    """
+    node = _marker_node(marker)
+    return node is not None and _is_excluded(node, _python_bounds(requires_python))
+
+
+def _simplify_marker_node(node: MarkerNode, bounds: PythonBounds) -> MarkerNode | None:
+    """drop clauses implied by requires-python and duplicate operands, None if the marker always holds"""
+    if node[0] == "clause":
+        return None if _is_implied(node, bounds) else node
+    children: dict[Any, MarkerNode] = {}
+    for child in node[1]:
+        simplified = _simplify_marker_node(child, bounds)
+        if simplified is None:
+            if node[0] == "or":
+                return None
+            continue
+        # flatten nested operators of the same kind
+        for operand in simplified[1] if simplified[0] == node[0] else (simplified,):
+            children.setdefault(_marker_key(operand), operand)
+    if not children:
+        return None
+    operands = tuple(children.values())
+    return operands[0] if len(operands) == 1 else (node[0], operands)
+
+
+@functools.lru_cache(maxsize=None)
+def simplify_marker(marker: str, requires_python: str = "") -> str:
+    """Simplify an environment marker for the given requires-python
+
+    Clauses on python_version and python_full_version that always hold within requires-python are dropped,
+    duplicate operands of and/or are merged and the formatting is canonicalized.
+    Results are memoized per distinct marker, markers that can't be parsed are returned unchanged.
+
+    Args:
+        marker: the environment marker
+        requires_python: the requires-python of the project
+
+    Returns:
+        the simplified marker, an empty string if it always holds
+    """
+    if (node := _marker_node(marker)) is None:
+        return marker
+    simplified = _simplify_marker_node(node, _python_bounds(requires_python))
+    return "" if simplified is None else _render_marker(simplified)
+
+
+def simplify_requirement_marker(requirement: str, requires_python: str = "") -> str:
+    """Simplify the environment marker of a requirement string
+
+    Args:
+        requirement: a PEP 508 requirement string
+        requires_python: the requires-python of the project
+
+    Returns:
+        the requirement with a simplified marker
+    """
+    name, marker = _split_marker(requirement)
+    if not marker:
+        return requirement
+    simplified = simplify_marker(marker, requires_python)
+    return f"{name} ; {simplified}" if simplified else name
+
+
+def _python_tag_specifier(python_tag: str, abi_tag: str) -> tuple[str, tuple[tuple[str, str], ...]]:
+    """python versions and implementation marker variables implied by the python tag of a wheel"""
+    match = _PYTHON_TAG.fullmatch(python_tag)
+    if match is None:
+        return "", ()
+    implementation, major, minor = match.groups()
+    version = f"{major}.{minor}" if minor else major
+    # abi3 wheels are built for the given version and all later ones
+    specifier = f">={version}" if abi_tag == "abi3" else f"=={version}.*"
+    if implementation not in _IMPLEMENTATIONS:
+        return specifier, ()
+    implementation_name, platform_python_implementation = _IMPLEMENTATIONS[implementation]
+    return specifier, (
+        ("implementation_name", implementation_name),
+        ("platform_python_implementation", platform_python_implementation),
+    )
+
+
+def _platform_tag_variables(platform_tag: str) -> tuple[tuple[str, str], ...]:
+    """platform marker variables implied by the platform tag of a wheel"""
+    for pattern, (sys_platform, platform_system, os_name) in _PLATFORM_TAGS:
+        if not pattern.fullmatch(platform_tag):
+            continue
+        variables = (("os_name", os_name), ("platform_system", platform_system), ("sys_platform", sys_platform))
+        for machine_pattern, machine in _PLATFORM_MACHINES.items():
+            if machine_pattern.fullmatch(platform_tag):
+                return (*variables, ("platform_machine", machine))
+        return variables
+    return ()
+
+
+def get_wheel_environments(tag: str, requires_python: str = "") -> list[WheelEnvironment]:
+    """Get the environments a wheel can be installed in, as far as its tag tells
+
+    Args:
+        tag: the wheel tag, e.g. `cp311-cp311-manylinux_2_17_x86_64` or `py3-none-any`
+        requires_python: the requires-python of the project
+
+    Returns:
+        one environment per combination of the compressed python and platform tags
+
+    Raises:
+        ValueError: if the tag isn't a wheel tag
+    """
+    parts = tag.lower().split("-")
+    if len(parts) != 3:
+        raise ValueError(f"Invalid wheel tag: {tag}")
+    python_tags, abi_tag, platform_tags = parts
+    environments = []
+    for python_tag in python_tags.split("."):
+        specifier, implementation = _python_tag_specifier(python_tag, abi_tag)
+        bounds = _python_bounds(f"{requires_python},{specifier}")
+        for platform_tag in platform_tags.split("."):
+            environments.append((tuple(sorted((*implementation, *_platform_tag_variables(platform_tag)))), bounds))
+    return environments
+
+
+def _evaluate_marker(node: MarkerNode, variables: Mapping[str, str], bounds: PythonBounds) -> bool | None:
+    """three-valued evaluation of a marker, None if it depends on something the environment doesn't tell"""
+    if node[0] in ("and", "or"):
+        results = [_evaluate_marker(child, variables, bounds) for child in node[1]]
+        # True decides a disjunction, False decides a conjunction
+        decisive = node[0] == "or"
+        if decisive in results:
+            return decisive
+        return None if None in results else not decisive
+    lhs, op, rhs = node[1:]
+    if lhs[0] == "var" and lhs[1] in ("python_version", "python_full_version"):
+        if lhs[1] == "python_version" and op in ("==", "!=") and rhs[0] == "str" and "*" not in rhs[1]:
+            # python_version == "3.10" holds for all 3.10.x versions
+            if op == "==":
+                return _evaluate_marker(("and", (("clause", lhs, ">=", rhs), ("clause", lhs, "<=", rhs))), {}, bounds)
+            return _evaluate_marker(("or", (("clause", lhs, "<", rhs), ("clause", lhs, ">", rhs))), {}, bounds)
+        if _is_excluded(node, bounds):
+            return False
+        return True if _is_implied(node, bounds) else None
+    values = []
+    for kind, value in (lhs, rhs):
+        if kind == "var" and (value := variables.get(value)) is None:
+            return None
+        values.append(value)
+    left, right = values
+    if op == "==":
+        return left == right
+    if op == "!=":
+        return left != right
+    if op == "in":
+        return left in right
+    if op == "not in":
+        return left not in right
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _marker_may_hold(marker: str, environment: WheelEnvironment) -> bool:
+    if (node := _marker_node(marker)) is None:
+        return True
+    variables, bounds = environment
+    return _evaluate_marker(node, dict(variables), bounds) is not False
+
+
+def prune_locked_groups(
+    optional_dependencies: MutableMapping[str, list[str]], tag: str, requires_python: str = ""
+) -> list[str]:
+    """Inplace drop the locked requirements that can never be installed along with a wheel
+
+    Each distinct marker is evaluated once per environment of the wheel tag, a requirement is only dropped
+    if its marker is false in all of them. Markers depending on anything the tag doesn't tell are kept.
+
+    Args:
+        optional_dependencies: mapping of group name to requirements, only the locked groups are pruned
+        tag: the wheel tag, see `get_wheel_environments`
+        requires_python: the requires-python of the project
+
+    Returns:
+        the dropped requirements
+    """
+    environments = get_wheel_environments(tag, requires_python)
+    pruned = []
+    for group, requirements in optional_dependencies.items():
+        if group != "locked" and not group.endswith("-locked"):
+            continue
+        kept = []
+        for requirement in requirements:
+            _, marker = _split_marker(requirement)
+            if not marker or any(_marker_may_hold(marker, environment) for environment in environments):
+                kept.append(requirement)
+            else:
+                pruned.append(requirement)
+        optional_dependencies[group] = kept
+    return pruned
+
+
+def get_locked_requirements(
+    packages: Iterable[dict[str, Any]], groups: list[str], requires_python: str | None = None
+) -> dict[str, list[str]]:
+    """Collect the locked requirement strings of several groups in a single pass over the lockfile packages
+
+    Each package is formatted at most once and the resulting string is shared by all groups it belongs to.
+
+    Args:
+        packages: The package items from pdm.lock
+        groups: The groups to collect requirements for
+        requires_python: if given, markers are simplified for this requires-python
+
+    Returns:
+        A mapping of group name to its locked requirement strings, in lockfile order
+    """
+    return select_locked_requirements(_lockfile.compact_packages(packages, groups), groups, groups, requires_python)
+
+
+def select_locked_requirements(
+    packages: Iterable[_lockfile.LockedPackage],
+    group_names: list[str],
+    groups: list[str],
+    requires_python: str | None = None,
+) -> dict[str, list[str]]:
+    """Collect the locked requirement strings of several groups from compact package records
+
+    Group membership is tested with a bitwise AND against the group bits of each package.
+
+    Args:
+        packages: The compact package records
+        group_names: The groups the bitmasks of the records refer to
+        groups: The groups to collect requirements for
+        requires_python: if given, markers are simplified for this requires-python
+
+    Returns:
+        A mapping of group name to its locked requirement strings, in lockfile order
+    """
+    requirements: dict[str, list[str]] = {group: [] for group in groups}
+    targets = [(1 << group_names.index(group), requirements[group]) for group in groups if group in group_names]
+    selected = 0
+    for bit, _ in targets:
+        selected |= bit
+    scanned = unsupported = 0
+    for package in packages:
+        scanned += 1
+        if not package.groups & selected:
+            continue
+        req_dict = package.to_dict()
+        if requires_python is not None and package.marker:
+            req_dict["marker"] = simplify_marker(package.marker, requires_python)
+        try:
+            requirement = requirement_dict_to_string(req_dict)
+        except UnsupportedRequirement as e:
+            print(f"Skipping unsupported requirement: {e}")
+            unsupported += 1
+            continue
+        for bit, target in targets:
+            if package.groups & bit:
+                target.append(requirement)
+
+    _trace.counter(
+        "locked requirements",
+        packages_scanned=scanned,
+        groups_emitted=sum(1 for group_requirements in requirements.values() if group_requirements),
+        unsupported_skipped=unsupported,
+    )
+    return requirements
+
+
+def parse_requirement(requirement: str) -> tuple[str, tuple[str, ...], str]:
+    """Split a PEP 508 requirement string into the parts needed to look it up in a lockfile
+
+    Args:
+        requirement: a PEP 508 requirement string
+
+    Returns:
+        the normalized name, the sorted normalized extras and the marker, empty if there is none
+
+    Raises:
+        UnsupportedRequirement: if the requirement doesn't start with a project name
+    """
+    match = _REQUIREMENT_NAME.match(requirement)
+    if match is None:
+        raise UnsupportedRequirement(f"Invalid requirement: {requirement}")
+    _, marker = _split_marker(requirement)
+    extras = {normalize_name(extra.strip()) for extra in (match.group(2) or "").split(",") if extra.strip()}
+    return normalize_name(match.group(1)), tuple(sorted(extras)), marker
+
+
+@functools.lru_cache(maxsize=None)
+def _required_clauses(marker: str) -> tuple[tuple[str, str, str], ...]:
+    """the `variable op "value"` clauses that all have to hold for a marker, empty if it can't be parsed"""
+    if (node := _marker_node(marker)) is None:
+        return ()
+    clauses = []
+    nodes = [node]
+    while nodes:
+        node = nodes.pop()
+        if node[0] == "and":
+            nodes.extend(node[1])
+        elif node[0] == "clause" and node[1][0] == "var" and node[3][0] == "str":
+            clauses.append((node[1][1], node[2], node[3][1]))
+    return tuple(clauses)
+
+
+# specifiers of the python versions a python_version or python_full_version clause holds for
+_PYTHON_VERSION_SPECIFIERS = {
+    ("python_version", "<"): "<{}",
+    ("python_version", ">="): ">={}",
+    ("python_version", "=="): "=={}.*",
+    ("python_full_version", "<"): "<{}",
+    ("python_full_version", ">="): ">={}",
+    ("python_full_version", ">"): ">{}",
+    ("python_full_version", "=="): "=={}",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _is_satisfiable(clause: frozenset[str], requires_python: str = "") -> bool:
+    """check whether the markers of a clause can hold at the same time within requires-python
+
+    Markers requiring different values of the same variable with `==` contradict each other, as do python_version
+    and python_full_version clauses which leave no version of requires-python.
+    """
+    values: dict[str, str] = {}
+    specifiers = [requires_python] if requires_python else []
+    for marker in clause:
+        for variable, op, value in _required_clauses(marker):
+            if (variable, op) in _PYTHON_VERSION_SPECIFIERS:
+                if _parse_version(value, 3) is not None:
+                    specifiers.append(_PYTHON_VERSION_SPECIFIERS[variable, op].format(value))
+            elif op == "==" and values.setdefault(variable, value) != value:
+                return False
+    lower, upper = _python_bounds(",".join(specifiers))
+    if lower is not None and upper is not None and lower >= upper:
+        return False
+    return not (requires_python and is_marker_excluded(" and ".join(sorted(clause)), requires_python))
+
+
+def _marker_condition(marker: str | None, requires_python: str = "") -> Condition:
+    if not marker:
+        return _ALWAYS
+    clause = frozenset({f"({marker})" if " or " in marker else marker})
+    # empty if it never holds
+    return frozenset({clause}) if _is_satisfiable(clause, requires_python) else frozenset()
+
+
+def _absorb(condition: Condition) -> Condition:
+    # an alternative implied by a weaker one is redundant
+    return frozenset(clause for clause in condition if not any(other < clause for other in condition))
+
+
+def _and_conditions(left: Condition, right: Condition, requires_python: str = "") -> Condition:
+    if right == _ALWAYS:
+        return left
+    # alternatives with contradicting markers never hold
+    combined = (a | b for a in left for b in right)
+    return _absorb(frozenset(clause for clause in combined if _is_satisfiable(clause, requires_python)))
+
+
+def _or_conditions(left: Condition, right: Condition) -> Condition:
+    return _absorb(left | right)
+
+
+def _render_condition(condition: Condition) -> str:
+    if _ALWAYS <= condition:
+        return ""
+    return " or ".join(sorted(" and ".join(sorted(clause)) for clause in condition))
+
+
+class LockGraph:
+    """Dependency graph of the packages of a pdm.lock, built from the `dependencies` recorded for each package
+
+    Works for all lock strategies, as it doesn't rely on the groups and markers written by `inherit_metadata`.
+    Packages are indexed by normalized name and extras, the closure of each requirement is memoized,
+    so requirements shared by several groups are only traversed once.
+    Dependencies whose markers never hold for the requires-python of the project are not followed.
+    """
+
+    def __init__(self, packages: list[dict[str, Any]], requires_python: str = "") -> None:
+        self.packages = packages
+        self.requires_python = requires_python
+        self._index: dict[tuple[str, tuple[str, ...]], list[int]] = {}
+        for position, package in enumerate(packages):
+            extras = tuple(sorted(normalize_name(extra) for extra in package.get("extras", [])))
+            self._index.setdefault((normalize_name(package["name"]), extras), []).append(position)
+        self._edges: dict[int, list[tuple[list[int], Condition]]] = {}
+        self._closures: dict[str, dict[int, Condition]] = {}
+
+    def _lookup(self, name: str, extras: tuple[str, ...]) -> list[int]:
+        if extras and (name, extras) in self._index:
+            # lock entries with extras depend on the entry without extras themselves
+            return self._index[(name, extras)]
+        nodes = list(self._index.get((name, ()), []))
+        for extra in extras:
+            nodes.extend(self._index.get((name, (extra,)), []))
+        return nodes
+
+    def _dependencies(self, node: int) -> list[tuple[list[int], Condition]]:
+        if node not in self._edges:
+            edges = []
+            for dependency in self.packages[node].get("dependencies", []):
+                name, extras, marker = parse_requirement(dependency)
+                edges.append((self._lookup(name, extras), _marker_condition(marker, self.requires_python)))
+            self._edges[node] = edges
+        return self._edges[node]
+
+    def closure(self, requirement: str) -> dict[int, Condition]:
+        """Collect the locked packages installed for a requirement
+
+        Args:
+            requirement: a PEP 508 requirement string
+
+        Returns:
+            mapping of package position in the lockfile to the condition it is installed under
+        """
+        if requirement in self._closures:
+            return self._closures[requirement]
+        reached: dict[int, Condition] = {}
+        pending: list[int] = []
+
+        def visit(nodes: list[int], condition: Condition) -> None:
+            for node in nodes:
+                node_marker = _marker_condition(self.packages[node].get("marker"), self.requires_python)
+                node_condition = _and_conditions(condition, node_marker, self.requires_python)
+                if not node_condition:
+                    continue
+                merged = _or_conditions(reached[node], node_condition) if node in reached else node_condition
+                if merged != reached.get(node):
+                    reached[node] = merged
+                    pending.append(node)
+
+        name, extras, marker = parse_requirement(requirement)
+        visit(self._lookup(name, extras), _marker_condition(marker, self.requires_python))
+        while pending:
+            node = pending.pop()
+            for nodes, condition in self._dependencies(node):
+                visit(nodes, _and_conditions(reached[node], condition, self.requires_python))
+        self._closures[requirement] = reached
+        return reached
+
+    def resolve(self, requirements: Iterable[str]) -> dict[int, str]:
+        """Compute the transitive closure of the direct requirements of a group
+
+        Args:
+            requirements: the direct requirements of the group
+
+        Returns:
+            mapping of package position in the lockfile to its environment marker, empty if it always applies,
+            in lockfile order
+        """
+        resolved: dict[int, Condition] = {}
+        for requirement in requirements:
+            try:
+                closure = self.closure(requirement)
+            except UnsupportedRequirement as e:
+                print(f"Skipping unsupported requirement: {e}")
+                continue
+            for node, condition in closure.items():
+                resolved[node] = _or_conditions(resolved[node], condition) if node in resolved else condition
+        return {node: _render_condition(resolved[node]) for node in sorted(resolved)}
+
+
+def get_direct_requirements(metadata: MutableMapping[str, Any], groups: list[str]) -> dict[str, list[str]]:
+    """Get the direct requirements of the default and optional groups from the project metadata
+
+    Self-references like `name[group]` are expanded to the requirements of the referred groups.
+
+    Args:
+        metadata: The metadata dictionary of the project
+        groups: the groups to get requirements for
+
+    Returns:
+        mapping of group to its direct requirements, groups not in the metadata are left out
+    """
+    project_name = normalize_name(metadata.get("name", ""))
+    declared = {"default": metadata.get("dependencies", [])}
+    for group, requirements in metadata.get("optional-dependencies", {}).items():
+        declared[normalize_name(group)] = requirements
+
+    def expand(group: str, seen: set[str]) -> list[str]:
+        seen.add(group)
+        expanded = []
+        for requirement in declared[group]:
+            name, extras, _ = parse_requirement(requirement)
+            if name != project_name:
+                expanded.append(requirement)
+                continue
+            for extra in extras:
+                if extra in declared and extra not in seen:
+                    expanded.extend(expand(extra, seen))
+        return expanded
+
+    return {group: expand(normalize_name(group), set()) for group in groups if normalize_name(group) in declared}
+
+
+def load_locked_groups(
+    lockfile: Path,
+    groups: list[str],
+    requires_python: str | None = None,
+    requirements: dict[str, list[str]] | None = None,
+    python_requires: str = "",
+) -> dict[str, list[str] | None] | None:
+    """Compute the locked requirements of the given groups from a lockfile
+
+    Results are memoized for the lifetime of the process, keyed by the lockfile path, size, modification time
+    and the requested groups, so repeated builds (sdist, wheel, metadata) only parse the lockfile once.
+    If PDM_BUILD_LOCKED_CACHE is set, the result is additionally cached on disk, keyed by the lockfile content,
+    the requested groups and the plugin version. A cache hit skips parsing the lockfile.
+
+    Lockfiles with the 'inherit_metadata' strategy record the groups and markers of each package.
+    For other pdm.lock files, the groups are resolved from their direct requirements with a `LockGraph`.
+
+    Args:
+        lockfile: path to pdm.lock or pylock.toml
+        groups: the groups to lock
+        requires_python: if given, markers are simplified for this requires-python
+        requirements: the direct requirements of the groups, needed without the 'inherit_metadata' strategy
+        python_requires: the requires-python of the project, the graph isn't followed to packages never installed for it
+
+    Returns:
+        A mapping of group name to locked requirement strings, None for groups not stored in the lockfile.
+        None if the lockfile doesn't support the 'inherit_metadata' strategy and no requirements are given.
+    """
+    stat = lockfile.stat()
+    memo_key = (
+        str(lockfile.resolve()),
+        stat.st_size,
+        stat.st_mtime_ns,
+        tuple(groups),
+        requires_python,
+        None if requirements is None else tuple((group, tuple(reqs)) for group, reqs in sorted(requirements.items())),
+        python_requires,
+    )
+    if memo_key not in _LOCKED_GROUPS_MEMO:
+        _LOCKED_GROUPS_MEMO[memo_key] = _compute_locked_groups(
+            lockfile, groups, requires_python, requirements, python_requires
+        )
+    result = _LOCKED_GROUPS_MEMO[memo_key]
+    if result is None:
+        return None
+    # hand out copies, the build backends may modify the metadata in place
+    return {group: None if requirements is None else list(requirements) for group, requirements in result.items()}
+
+
+def _compute_locked_groups(
+    lockfile: Path,
+    groups: list[str],
+    requires_python: str | None,
+    requirements: dict[str, list[str]] | None,
+    python_requires: str,
+) -> dict[str, list[str] | None] | None:
+    content = lockfile.read_bytes()
+    cache_dir = _cache.get_cache_dir()
+    if cache_dir is not None:
+        options: dict[str, Any] = {"requires-python": requires_python}
+        if requirements is not None:
+            options["requirements"] = requirements
+            options["python-requires"] = python_requires
+        cache_key = _cache.get_cache_key(content, groups, options)
+        cached = _cache.load(cache_dir, cache_key)
+        if isinstance(cached, dict) and "groups" in cached:
+            return cached["groups"]
+
+    with _trace.span("parse", lockfile=str(lockfile), size=len(content)):
+        # don't keep the raw bytes alive next to the decoded text
+        text, content = content.decode("utf-8"), b""
+        if _lockfile.is_pylock(lockfile):
+            lockfile_content = _lockfile.load_pylock(text)
+            lock_metadata = lockfile_content["metadata"]
+            packages = _lockfile.compact_packages(
+                _lockfile.consume_packages(lockfile_content.pop("package")), lock_metadata["groups"]
+            )
+        else:
+            lock_metadata, packages = _lockfile.load_locked_packages(text)
+            if requirements is not None and "inherit_metadata" not in lock_metadata.get("strategy", []):
+                # the dependency graph is only needed without the groups and markers of inherit_metadata
+                lockfile_content = _lockfile.load_lockfile(text, _lockfile.GRAPH_PACKAGE_KEYS)
+        del text
+    result: dict[str, list[str] | None] | None = None
+    stored_groups = lock_metadata.get("groups", [])
+    if "inherit_metadata" in lock_metadata.get("strategy", []):
+        # packages are filtered by their group bits and formatted in the same pass
+        with _trace.span("index and format", groups=groups):
+            selected = select_locked_requirements(
+                packages, stored_groups, [group for group in groups if group in stored_groups], requires_python
+            )
+        result = {group: selected.get(group) for group in groups}
+    elif requirements is not None:
+        with _trace.span("resolve graph", groups=groups):
+            graph = LockGraph(lockfile_content["package"], python_requires)
+            result = {
+                group: _format_resolved(graph, requirements[group], requires_python)
+                if group in stored_groups and group in requirements
+                else None
+                for group in groups
+            }
+
+    if cache_dir is not None:
+        _cache.store(cache_dir, cache_key, {"groups": result})
+    return result
+
+
+def _format_resolved(graph: LockGraph, requirements: list[str], requires_python: str | None) -> list[str]:
+    formatted = []
+    for node, marker in graph.resolve(requirements).items():
+        req_dict = {key: value for key, value in graph.packages[node].items() if key != "dependencies"}
+        req_dict["marker"] = (
+            simplify_marker(marker, requires_python) if marker and requires_python is not None else marker
+        )
+        try:
+            formatted.append(requirement_dict_to_string(req_dict))
+        except UnsupportedRequirement as e:
+            print(f"Skipping unsupported requirement: {e}")
+    return formatted
+
+
+def get_content_hash(pyproject: dict[str, Any], algo: str = "sha256") -> str:
+    """Compute the hash of the dependency tables of pyproject.toml like pdm does when locking, without pdm
+
+    Args:
+        pyproject: the parsed pyproject.toml
+        algo: the hash algorithm
+
+    Returns:
+        hex digest to compare with the content hash stored in the lockfile
+    """
+    metadata = pyproject.get("project", {})
+    settings = pyproject.get("tool", {}).get("pdm", {})
+    dev_dependencies: dict[str, list[Any]] = {}
+    for group, requirements in pyproject.get("dependency-groups", {}).items():
+        dev_dependencies.setdefault(normalize_name(group), []).extend(requirements)
+    for group, requirements in settings.get("dev-dependencies", {}).items():
+        dev_dependencies.setdefault(normalize_name(group), []).extend(requirements)
+    dump_data = {
+        "sources": settings.get("source", []),
+        "dependencies": metadata.get("dependencies", []),
+        "dev-dependencies": dev_dependencies,
+        "optional-dependencies": metadata.get("optional-dependencies", {}),
+        "requires-python": metadata.get("requires-python", ""),
+        "resolution": settings.get("resolution", {}),
+    }
+    return hashlib.new(algo, json.dumps(dump_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _iter_workspace_members(root: Path, pyproject: dict[str, Any]) -> Iterator[Path]:
+    """iterate over the resolved member directories of a pdm workspace, like pdm's WorkspaceManager"""
+    seen: set[Path] = set()
+    for pattern in pyproject.get("tool", {}).get("pdm", {}).get("workspace", {}).get("members", []):
+        paths = root.glob(pattern) if any(char in pattern for char in "*?[") else [root / pattern]
+        for path in paths:
+            path = path.resolve()
+            if path in seen or not path.is_dir() or not path.joinpath("pyproject.toml").is_file():
+                continue
+            seen.add(path)
+            yield path
+
+
+def _read_pyproject(root: Path) -> dict[str, Any]:
+    with root.joinpath("pyproject.toml").open("rb") as f:
+        return _lockfile.tomllib.load(f)
+
+
+def get_workspace_content_hash(root: Path, algo: str = "sha256") -> str:
+    """Get the content hash pdm stores in the lockfile of a project, including the members of a workspace
+
+    The same as `pdm.project.Project.pyproject_content_hash`: the hash of a workspace root combines its own
+    content hash with those of its members.
+
+    Args:
+        root: The path to the project root
+        algo: the hash algorithm
+
+    Returns:
+        the hex digest
+    """
+    pyproject = _read_pyproject(root)
+    root_hash = get_content_hash(pyproject, algo)
+    if not pyproject.get("tool", {}).get("pdm", {}).get("workspace"):
+        return root_hash
+    hasher = hashlib.new(algo)
+    hasher.update(root_hash.encode("utf-8"))
+    root = root.resolve()
+    for member in sorted(_iter_workspace_members(root, pyproject), key=lambda path: path.relative_to(root).as_posix()):
+        hasher.update(b"\0")
+        hasher.update(member.relative_to(root).as_posix().encode("utf-8"))
+        hasher.update(b"\0")
+        hasher.update(get_content_hash(_read_pyproject(member), algo).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def get_lockfile_hash(lockfile: Path) -> tuple[str, str] | None:
+    """Read the content hash stored in a lockfile, without parsing the whole file
+
+    Args:
+        lockfile: path to pdm.lock or pylock.toml
+
+    Returns:
+        the hash algorithm and hex digest, None if the lockfile doesn't store a content hash
+    """
+    with lockfile.open("rb") as f:
+        if _lockfile.is_pylock(lockfile):
+            f.seek(max(lockfile.stat().st_size - _LOCKFILE_HASH_CHUNK, 0))
+            chunk = f.read().decode("utf-8", "ignore")
+            # package tables can have hashes as well, only consider the [tool.pdm] table
+            _, found, chunk = chunk.rpartition("\n[tool.pdm]\n")
+            if not found:
+                return None
+            match = _PYLOCK_HASH.search(chunk.split("\n[", 1)[0])
+        else:
+            match = _CONTENT_HASH.search(f.read(_LOCKFILE_HASH_CHUNK).decode("utf-8", "ignore"))
+    return (match["algo"], match["digest"]) if match else None
+
+
+def check_lockfile_hash(root: Path, lockfile: Path, stale: str = "warn") -> None:
+    """Check that the lockfile was created for the current dependencies in pyproject.toml
+
+    The lockfile of a pdm workspace is checked against the workspace and its members. Lockfiles outside
+    of the project and its workspace, e.g. shared lockfiles selected with PDM_LOCKFILE, are not checked,
+    as it's unknown which projects they were locked for.
+
+    Args:
+        root: The path to the project root
+        lockfile: path to pdm.lock or pylock.toml
+        stale: what to do if the lockfile is outdated, one of "warn", "fail" and "ignore"
+
+    Raises:
+        StaleLockfile: if the lockfile is outdated and stale is "fail"
+    """
+    if stale not in ("warn", "fail", "ignore"):
+        raise ValueError(f"Invalid value for locked-stale: {stale!r}, expected 'warn', 'fail' or 'ignore'")
+    if stale == "ignore" or (stored := get_lockfile_hash(lockfile)) is None:
+        return
+    algo, digest = stored
+    owner = lockfile.parent.resolve()
+    if owner != root.resolve() and (
+        not owner.joinpath("pyproject.toml").is_file()
+        or root.resolve() not in _iter_workspace_members(owner, _read_pyproject(owner))
+    ):
+        return
+    if algo not in hashlib.algorithms_available or get_workspace_content_hash(owner, algo) == digest:
+        return
+    message = f"The lockfile {lockfile.name} doesn't match pyproject.toml, run `pdm lock` to update it"
+    if stale == "fail":
+        raise StaleLockfile(message)
+    warnings.warn(f"{message}. The locked dependencies may be outdated.", UserWarning, stacklevel=1)
+
+
+def _requires_dist_line(requirement: str, group: str) -> str:
+    name, marker = _split_marker(requirement)
+    extra = f'extra == "{group}"'
+    return f"Requires-Dist: {name}; {f'({marker}) and {extra}' if marker else extra}\n"
+
+
+def check_metadata_budget(optional_dependencies: MutableMapping[str, list[str]], budget: Any) -> str | None:
+    """Measure the core metadata added by the locked groups against the `locked-metadata-budget` setting
+
+    Each locked requirement adds a `Requires-Dist` line to METADATA and each locked group a `Provides-Extra` line.
+
+    Args:
+        optional_dependencies: mapping of group name to requirements, only the locked groups are measured
+        budget: the setting, a maximum number of bytes or a table with the keys
+            `bytes`, `lines` and `action` ("warn" or "fail")
+
+    Returns:
+        a report of the lines and bytes per locked group and its largest requirements, None without a budget
+
+    Raises:
+        ValueError: if the setting is invalid
+        MetadataBudgetExceeded: if the budget is exceeded and action is "fail"
+    """
+    if budget is None:
+        return None
+    if isinstance(budget, int) and not isinstance(budget, bool):
+        budget = {"bytes": budget}
+    if not isinstance(budget, MutableMapping) or set(budget) - {"bytes", "lines", "action"}:
+        raise ValueError(f"Invalid value for locked-metadata-budget: {budget!r}")
+    action = budget.get("action", "warn")
+    if action not in ("warn", "fail"):
+        raise ValueError(f"Invalid action for locked-metadata-budget: {action!r}, expected 'warn' or 'fail'")
+
+    total_lines = total_bytes = 0
+    report = []
+    for group, requirements in optional_dependencies.items():
+        if group != "locked" and not group.endswith("-locked"):
+            continue
+        sizes = [
+            (len(_requires_dist_line(requirement, group).encode("utf-8")), requirement) for requirement in requirements
+        ]
+        group_lines = len(sizes) + 1
+        group_bytes = len(f"Provides-Extra: {group}\n") + sum(size for size, _ in sizes)
+        total_lines += group_lines
+        total_bytes += group_bytes
+        report.append(f"  {group}: {group_lines} lines, {group_bytes} bytes")
+        for size, requirement in sorted(sizes, key=lambda item: -item[0])[:_BUDGET_TOP_REQUIREMENTS]:
+            kinds = ", ".join(
+                kind
+                for kind, found in (("URL", " @ " in requirement), ("marker", bool(_split_marker(requirement)[1])))
+                if found
+            )
+            report.append(f"    {size} bytes{f' ({kinds})' if kinds else ''}: {requirement}")
+
+    limits = [f"{budget[key]} {key}" for key in ("bytes", "lines") if key in budget]
+    report.insert(
+        0,
+        f"Locked metadata: {total_lines} lines, {total_bytes} bytes"
+        + (f" (budget: {', '.join(limits)})" if limits else ""),
+    )
+    exceeded = [
+        f"{value} {key} > {budget[key]}"
+        for key, value in (("bytes", total_bytes), ("lines", total_lines))
+        if key in budget and value > budget[key]
+    ]
+    if exceeded:
+        message = f"The locked groups exceed locked-metadata-budget: {', '.join(exceeded)}"
+        if action == "fail":
+            raise MetadataBudgetExceeded(f"{message}\n" + "\n".join(report))
+        warnings.warn(message, UserWarning, stacklevel=1)
+    return "\n".join(report)
+
+
+def find_lockfile(root: Path) -> Path:
+    """Find the lockfile of a project: PDM_LOCKFILE, pdm.lock or pylock.toml
+
+    Args:
+        root: The path to the project root
+
+    Returns:
+        path of the lockfile, which may not exist
+    """
+    lockfile = root / "pdm.lock"
+    if "PDM_LOCKFILE" in os.environ:
+        lockfile = root / os.environ["PDM_LOCKFILE"]
+    elif not lockfile.exists() and root.joinpath("pylock.toml").exists():
+        lockfile = root / "pylock.toml"
+    return lockfile
+
+
 def update_metadata_with_locked(
-    metadata: MutableMapping[str, Any], root: Path, groups: list[str] | None = None
+    metadata: MutableMapping[str, Any],
+    root: Path,
+    groups: list[str] | None = None,
+    simplify_markers: bool = False,
+    compact: bool = False,
+    stale: str = "warn",
+    budget: Any = None,
 ) -> None:  # pragma: no cover
     """Inplace update the metadata(pyproject.toml) with the locked dependencies.
 
@@ -80,20 +1278,58 @@ def update_metadata_with_locked(
         metadata (dict[str, Any]): The metadata dictionary
         root (Path): The path to the project root
         groups (list[str], optional): The groups to lock. Defaults to default + all optional groups.
+        simplify_markers (bool, optional): Simplify the markers for the requires-python of the project.
+        compact (bool, optional): Delta-encode the optional locked groups against the `locked` group.
+        stale (str, optional): What to do if the lockfile doesn't match pyproject.toml: "warn", "fail" or "ignore".
+        budget (optional): The locked-metadata-budget setting, see `check_metadata_budget`.
 
     Raises:
         UnsupportedRequirement
+        StaleLockfile: if the lockfile is outdated and stale is "fail"
+        MetadataBudgetExceeded: if the locked groups exceed the budget and its action is "fail"
     """
-    lockfile = root / "pdm.lock"
-    if "PDM_LOCKFILE" in os.environ:
-        lockfile = Path(os.environ["PDM_LOCKFILE"])
+    with _trace.span("update_metadata_with_locked", root=str(root)):
+        _update_metadata_with_locked(metadata, root, groups, simplify_markers, compact, stale, budget)
+
+
+def _update_metadata_with_locked(
+    metadata: MutableMapping[str, Any],
+    root: Path,
+    groups: list[str] | None,
+    simplify_markers: bool,
+    compact: bool,
+    stale: str,
+    budget: Any,
+) -> None:  # pragma: no cover
+    if (handover_groups := get_handover_groups(metadata)) is not None:
+        optional_dependencies = metadata.setdefault("optional-dependencies", {})
+        for locked_group, locked_requirements in handover_groups.items():
+            # already exists, don't override
+            optional_dependencies.setdefault(locked_group, locked_requirements)
+        return
+
+    lockfile = find_lockfile(root)
     if not lockfile.exists():
         warnings.warn("The lockfile doesn't exist, skip locking dependencies", UserWarning, stacklevel=1)
         return
-    with lockfile.open("rb") as f:
-        lockfile_content = tomllib.load(f)
+    with _trace.span("check lockfile hash"):
+        check_lockfile_hash(root, lockfile, stale)
 
-    if "inherit_metadata" not in lockfile_content.get("metadata", {}).get("strategy", []):
+    optional_groups = list(metadata.get("optional-dependencies", {}))
+    if groups is None:
+        groups = ["default", *optional_groups]
+    # already existing locked groups are not overridden
+    groups = [group for group in groups if get_locked_group_name(group) not in optional_groups]
+
+    requires_python = metadata.get("requires-python", "") if simplify_markers else None
+    locked = load_locked_groups(
+        lockfile,
+        groups,
+        requires_python,
+        get_direct_requirements(metadata, groups),
+        metadata.get("requires-python", ""),
+    )
+    if locked is None:
         warnings.warn(
             "The lockfile doesn't support 'inherit_metadata' strategy, skip locking dependencies",
             UserWarning,
@@ -101,24 +1337,19 @@ def update_metadata_with_locked(
         )
         return
 
-    optional_groups = list(metadata.get("optional-dependencies", {}))
-    locked_groups = lockfile_content.get("metadata", {}).get("groups", [])
-    if groups is None:
-        groups = ["default", *optional_groups]
-    for group in groups:
-        locked_group = get_locked_group_name(group)
-        if locked_group in optional_groups:
-            # already exists, don't override
-            continue
-        if group not in locked_groups:
-            print(f"Group {group} is not stored in the lockfile, skip locking dependencies for it.")
-            continue
-        requirements: list[str] = []
-        for package in lockfile_content.get("package", []):
-            if group in package.get("groups", []):
-                try:
-                    requirements.append(requirement_dict_to_string(package))
-                except UnsupportedRequirement as e:
-                    print(f"Skipping unsupported requirement: {e}")
-
-        metadata.setdefault("optional-dependencies", {})[locked_group] = requirements
+    with _trace.span("write"):
+        written = {}
+        for group, requirements in locked.items():
+            if requirements is None:
+                print(f"Group {group} is not stored in the lockfile, skip locking dependencies for it.")
+                continue
+            written[get_locked_group_name(group)] = requirements
+        written = canonicalize_locked_groups(written)
+        if compact:
+            # an existing locked group is not overridden, but still used as base
+            base = {key: value for key, value in metadata.get("optional-dependencies", {}).items() if key == "locked"}
+            written = compact_locked_groups(metadata.get("name", ""), {**base, **written})
+        if written:
+            metadata.setdefault("optional-dependencies", {}).update(written)
+            if (report := check_metadata_budget(written, budget)) is not None:
+                print(report)
@@ -1,29 +1,78 @@
 from __future__ import annotations
 
 import os
-from typing import TYPE_CHECKING
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
 
-from ._utils import update_metadata_with_locked
+from ._pylock import embed_pylock, get_original_groups, load_locked_pylock, pylock_enabled
+from ._utils import get_handover_groups, prune_locked_groups, update_metadata_with_locked
 
 if TYPE_CHECKING:
     from pdm.backend.hooks import BuildHookInterface
     from pdm.backend.hooks.base import Context
+    from pdm.backend.wheel import WheelBuilder
 else:
     BuildHookInterface = object
 
+# set in the pyproject.toml of built sdists, whose metadata already contains the locked groups
+STATIC_KEY = "locked-static"
+# drop the locked requirements that can't be installed along with the wheel
+PRUNE_KEY = "locked-prune"
+
 
 class BuildLockedHook(BuildHookInterface):
     def pdm_build_hook_enabled(self, context: Context) -> bool:
         if os.getenv("PDM_BUILD_LOCKED", "false") != "false":
             return True
+        if get_handover_groups(context.config.metadata) is not None:
+            return True
         return context.config.build_config.get("locked", False)
 
     def pdm_build_initialize(self, context: Context) -> None:
+        # when building from an sdist, the locked groups were computed when building it
+        if not context.config.build_config.get(STATIC_KEY, False):
+            self._update_metadata(context)
+
+    def pdm_build_update_files(self, context: Context, files: dict[str, Path]) -> None:
+        # the wheel tag is cached on first access, so it is only read once the initialize hooks of the project,
+        # e.g. a local pdm_build.py setting is-purelib, have run. The METADATA file is written after this hook,
+        # unless it is copied from the metadata_directory prepared before.
+        if (
+            context.target == "wheel"
+            and context.config.build_config.get(PRUNE_KEY, False)
+            and not context.kwargs.get("metadata_directory")
+        ):
+            metadata = context.config.metadata
+            tag = cast("WheelBuilder", context.builder).tag
+            pruned = prune_locked_groups(
+                metadata.get("optional-dependencies", {}), tag, metadata.get("requires-python", "")
+            )
+            if pruned:
+                print(f"Pruned {len(pruned)} locked requirements that can't be installed with {tag} wheels")
+
+    def _update_metadata(self, context: Context) -> None:
         static_fields = list(context.config.metadata)
         update_metadata_with_locked(
-            context.config.metadata, context.root, context.config.build_config.get("locked-groups")
+            context.config.metadata,
+            context.root,
+            context.config.build_config.get("locked-groups"),
+            context.config.build_config.get("locked-simplify-markers", False),
+            context.config.build_config.get("locked-compact", False),
+            context.config.build_config.get("locked-stale", "warn"),
+            context.config.build_config.get("locked-metadata-budget"),
         )
         new_fields = set(context.config.metadata) - set(static_fields)
         for field in new_fields:
             if field in context.config.metadata.get("dynamic", []):
                 context.config.metadata["dynamic"].remove(field)
+        if context.target == "sdist":
+            # the pyproject.toml of the sdist is written from the updated config
+            context.config.data.setdefault("tool", {}).setdefault("pdm", {}).setdefault("build", {})[STATIC_KEY] = True
+
+    def pdm_build_finalize(self, context: Context, artifact: Path) -> None:
+        if context.target != "wheel" or not pylock_enabled(context.config.build_config):
+            return
+        metadata = context.config.metadata
+        groups = get_original_groups(metadata.get("optional-dependencies", {}))
+        if (content := load_locked_pylock(context.root, groups, metadata.get("requires-python", ""))) is not None:
+            embed_pylock(artifact, content)
@@ -3,19 +3,45 @@
 from __future__ import annotations
 
 import argparse
+import dataclasses
+import email
+import functools
 import inspect
+import operator
 import os
+import re
 import subprocess
+import sys
+import zipfile
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from contextlib import suppress
 from importlib import import_module
-from typing import Dict, List, Optional, Tuple, Union
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from pdm.cli import actions
 from pdm.cli.commands.build import Command as BaseCommand
 from pdm.exceptions import PdmException
 from pdm.project.core import Project
 
-from ._utils import get_locked_group_name
+from . import _trace
+from ._fingerprint import compute_fingerprint, get_sidecar_path, is_up_to_date, record
+from ._pylock import PYLOCK_ENV, embed_pylock, get_original_groups, load_locked_pylock, pylock_enabled
+from ._utils import (
+    LOCKED_GROUPS_ENV,
+    canonicalize_locked_groups,
+    check_metadata_budget,
+    compact_locked_groups,
+    dump_handover_groups,
+    find_lockfile,
+    get_handover_groups,
+    get_locked_group_name,
+    load_locked_groups,
+    normalize_name,
+    simplify_requirement_marker,
+)
+from .plugin import add_locked_arguments
 
 DependencyList = Dict[str, Union[List[str], Dict[str, List[str]]]]
 
@@ -23,31 +49,201 @@ DependencyList = Dict[str, Union[List[str], Dict[str, List[str]]]]
 CandidateKey = Tuple[str, Optional[str], Optional[str], bool]
 
 
+@functools.lru_cache(maxsize=None)
+def _lockfile_resolver_parameters() -> frozenset[str]:
+    """Probe the parameters of the installed pdm's resolve_candidates_from_lockfile, only once per process"""
+    from pdm.cli.actions import resolve_candidates_from_lockfile
+
+    return frozenset(inspect.signature(resolve_candidates_from_lockfile).parameters)
+
+
 class BuildCommand(BaseCommand):
     """subclasses pdm's build command and calls it via super()"""
 
     name = "build"
 
     def add_arguments(self, parser: argparse.ArgumentParser) -> None:
-        parser.add_argument(
-            "-l", "--locked", help="Add locked dependencies to distribution metadata.", action="store_true"
-        )
+        add_locked_arguments(parser)
         super().add_arguments(parser)
 
     def handle(self, project: Project, options: argparse.Namespace) -> None:
-        # pylint: disable=too-many-locals; we want this in a single function
+        if options.workspace:
+            with _trace.span("pdm build --workspace", patterns=options.workspace):
+                self._build_workspace(project, options)
+            return
+
         if (
             not options.locked
+            # a frozen lockfile is only used for locked builds
+            and not options.frozen_lockfile
             and not project.pyproject.settings.get("build", {}).get("locked", False)
             and os.getenv("PDM_BUILD_LOCKED", "false") == "false"
         ):
             super().handle(project, options)
             return
 
+        with _trace.span("pdm build --locked", project=str(project.root)):
+            self._handle_locked(project, options)
+
+    def _handle_locked(self, project: Project, options: argparse.Namespace) -> None:
+        # pylint: disable=too-many-locals; we want this in a single function
+        if (handover_groups := get_handover_groups(project.pyproject.metadata)) is not None:
+            # the locked groups were already computed, e.g. by a workspace build
+            optional_dependencies = handover_groups
+            locked_groups = list(handover_groups)
+        else:
+            groups = self._get_groups(project)
+            locked_groups = [get_locked_group_name(group) for group in groups]
+
+            # update lockfile
+            frozen = options.frozen_lockfile or project.pyproject.settings.get("build", {}).get("locked-frozen", False)
+            with _trace.span("update lockfile", frozen=frozen):
+                self._update_lockfile(project, frozen)
+
+            # retrieve locked dependencies and write to pyproject
+            optional_dependencies = {}
+
+            # determine locked dependencies
+            project.core.ui.echo("pdm-build-locked - Resolving locked packages from lockfile...")
+
+            requires_python = self._get_marker_python(project)
+            with _trace.span("resolve locked packages", groups=sorted(groups)):
+                for group, locked_packages in self._get_locked_groups(project, groups).items():
+                    if locked_packages and requires_python is not None:
+                        locked_packages = [
+                            simplify_requirement_marker(requirement, requires_python) for requirement in locked_packages
+                        ]
+                    if locked_packages:
+                        optional_dependencies[get_locked_group_name(group)] = locked_packages
+            optional_dependencies = canonicalize_locked_groups(optional_dependencies)
+            if project.pyproject.settings.get("build", {}).get("locked-compact", False):
+                optional_dependencies = compact_locked_groups(project.name, optional_dependencies)
+            self._check_metadata_budget(project, optional_dependencies)
+
+        pylock = options.pylock or pylock_enabled(project.pyproject.settings.get("build", {}))
+        if not options.if_changed:
+            self._build_locked(project, options, optional_dependencies, locked_groups, pylock)
+            return
+
+        dest = project.root.joinpath(options.dest)
+        with _trace.span("fingerprint"):
+            fingerprint = compute_fingerprint(
+                project.root,
+                {
+                    "optional-dependencies": optional_dependencies,
+                    "sdist": options.sdist,
+                    "wheel": options.wheel,
+                    "pylock": pylock,
+                    "config-settings": project.core.state.config_settings or {},
+                    "build-environment": self._get_build_environment(project),
+                },
+                exclude=dest,
+            )
+        sidecar = get_sidecar_path(dest, project.name)
+        if is_up_to_date(sidecar, fingerprint):
+            project.core.ui.echo("pdm-build-locked - Sources and locked dependencies are unchanged, skip building")
+            return
+        before = {path.name: path.stat().st_mtime_ns for path in dest.glob("*") if path.is_file()}
+        self._build_locked(project, options, optional_dependencies, locked_groups, pylock)
+        artifacts = [
+            path.name
+            for path in dest.glob("*")
+            if path.is_file() and path != sidecar and before.get(path.name) != path.stat().st_mtime_ns
+        ]
+        record(sidecar, fingerprint, artifacts)
+
+    def _build_locked(
+        self,
+        project: Project,
+        options: argparse.Namespace,
+        optional_dependencies: dict[str, list[str]],
+        locked_groups: list[str],
+        pylock: bool,
+    ) -> None:
+        """
+        Build the project with the locked groups added to its metadata
+
+        Args:
+            project: the pdm project
+            options: the command line options
+            optional_dependencies: mapping of locked group name to requirements
+            locked_groups: the names of the locked groups to remove from pyproject.toml after the build
+            pylock: embed a pylock.toml in the wheel
+        """
+        if self._backend_accepts_handover(project):
+            # the build backend hook picks up the locked groups, pyproject.toml is never touched
+            os.environ[LOCKED_GROUPS_ENV] = dump_handover_groups(project.name, optional_dependencies)
+            if pylock:
+                os.environ[PYLOCK_ENV] = "true"
+            try:
+                with _trace.span("build"):
+                    super().handle(project, options)
+            finally:
+                del os.environ[LOCKED_GROUPS_ENV]
+                os.environ.pop(PYLOCK_ENV, None)
+            if options.wheel:
+                with _trace.span("check handover"):
+                    self._check_handover(project, options.dest, optional_dependencies)
+                if pylock:
+                    self._embed_pylock(project, options.dest, locked_groups)
+            return
+
         # we need to let pdm known that we're intending to write this file (only for pdm versions >=2.26.2)
         if hasattr(project.pyproject, "open_for_write"):
             project.pyproject.open_for_write()
 
+        # write to pyproject
+        # get reference to optional-dependencies in project.pyproject, or create it if it doesn't exist
+        optional_key = "optional-dependencies"
+        optional = project.pyproject.metadata.get(optional_key, None) or project.pyproject.metadata.setdefault(
+            optional_key, {}
+        )
+
+        # update target
+        optional.update(optional_dependencies)
+        project.pyproject.metadata[optional_key] = optional
+        with _trace.span("write pyproject"):
+            project.pyproject.write(show_message=False)
+
+        # to prevent unclean scm status, we need to ignore pyproject.toml during build
+        with _trace.span("git update-index"):
+            self._git_ignore_pyproject(project, True)
+
+        # build project
+        try:
+            with _trace.span("build"):
+                super().handle(project, options)
+        finally:
+            # undo our changes to pyproject.toml even if pdm build crashes
+            for group in locked_groups:
+                with suppress(KeyError):
+                    project.pyproject.metadata.get("optional-dependencies", {}).pop(group)
+            if not project.pyproject.settings:
+                del project.pyproject._data["tool"]["pdm"]  # type: ignore[union-attr]
+                if not project.pyproject._data["tool"]:
+                    del project.pyproject._data["tool"]
+
+            with _trace.span("restore pyproject"):
+                project.pyproject.write(show_message=False)
+                self._git_ignore_pyproject(project, False)
+
+        if pylock and options.wheel:
+            self._embed_pylock(project, options.dest, locked_groups)
+
+    @staticmethod
+    def _get_groups(project: Project) -> list[str]:
+        """
+        Determine the groups to lock
+
+        Args:
+            project: the pdm project
+
+        Returns:
+            the configured locked-groups, or all groups except for pdm dev-dependencies, sorted
+
+        Raises:
+            PdmException: if a group would be overwritten by a locked group
+        """
         # we are not interested in the pdm dev-dependencies group
         pdm_dev_dependencies = set()
         if dev_dependencies := project.pyproject.settings.get("dev-dependencies"):
@@ -66,65 +262,325 @@ class BuildCommand(BaseCommand):
         if duplicate_groups := groups.intersection(locked_groups):
             raise PdmException(
                 f"You already have groups in your lockfile that would be overwritten by this command:"
-                f" {duplicate_groups}. Please remove them."
+                f" {sorted(duplicate_groups)}. Please remove them."
             )
+        return sorted(groups)
 
-        # update lockfile
-        self._update_lockfile(project)
-
-        # retrieve locked dependencies and write to pyproject
-        optional_dependencies: dict[str, list[str]] = {}
+    def _build_workspace(self, project: Project, options: argparse.Namespace) -> None:
+        """
+        Build several projects sharing a lockfile with locked dependencies
 
-        # determine locked dependencies
-        project.core.ui.echo("pdm-build-locked - Resolving locked packages from lockfile...")
+        The locked groups of all projects are computed upfront, parsing each lockfile only once.
+        The projects are then built concurrently by `pdm build --locked` subprocesses,
+        which receive their locked groups via PDM_BUILD_LOCKED_GROUPS.
+        The lockfile is considered authoritative and is never updated in workspace mode.
 
-        for group in groups:
-            locked_group_name = get_locked_group_name(group)
-
-            locked_packages = self._get_locked_packages(project, group)
-            if locked_packages:
-                optional_dependencies[locked_group_name] = locked_packages
+        Args:
+            project: the pdm project, patterns are relative to its root
+            options: the command line options
 
-        # write to pyproject
-        # get reference to optional-dependencies in project.pyproject, or create it if it doesn't exist
-        optional_key = "optional-dependencies"
-        optional = project.pyproject.metadata.get(optional_key, None) or project.pyproject.metadata.setdefault(
-            optional_key, {}
+        Raises:
+            PdmException: if no projects match, a lockfile is missing or any of the builds fails
+        """
+        roots = sorted(
+            {
+                path.resolve()
+                for pattern in options.workspace
+                for path in project.root.glob(pattern)
+                if path.joinpath("pyproject.toml").is_file()
+            }
         )
+        if not roots:
+            raise PdmException(f"No projects found matching {options.workspace}")
+
+        project.core.ui.echo(f"pdm-build-locked - Resolving locked packages for {len(roots)} projects...")
+        members = [project.core.create_project(root) for root in roots]
+        member_groups = [self._get_groups(member) for member in members]
+        # group the projects by lockfile to parse each shared lockfile only once, for the union of all groups
+        lockfile_groups: dict[tuple[Path, str | None], set[str]] = {}
+        for member, groups in zip(members, member_groups):
+            key = (find_lockfile(member.root), self._get_marker_python(member))
+            lockfile_groups.setdefault(key, set()).update(groups)
+        if missing := sorted({str(lockfile) for lockfile, _ in lockfile_groups if not lockfile.exists()}):
+            raise PdmException(f"Lockfile not found: {missing}. Run `pdm lock` first.")
+        locked_by_lockfile = {
+            (lockfile, requires_python): load_locked_groups(lockfile, sorted(groups), requires_python)
+            for (lockfile, requires_python), groups in lockfile_groups.items()
+        }
+
+        handovers: dict[Project, str] = {}
+        for member, groups in zip(members, member_groups):
+            requires_python = self._get_marker_python(member)
+            locked = locked_by_lockfile[find_lockfile(member.root), requires_python]
+            if locked is None:
+                # the lockfile doesn't support inherit_metadata, resolve the dependency graph for this project
+                locked = {
+                    group: [
+                        simplify_requirement_marker(requirement, requires_python)
+                        if requires_python is not None
+                        else requirement
+                        for requirement in requirements
+                    ]
+                    for group, requirements in self._get_locked_groups(member, groups).items()
+                }
+            optional_dependencies = canonicalize_locked_groups(
+                {get_locked_group_name(group): requirements for group in groups if (requirements := locked.get(group))}
+            )
+            if member.pyproject.settings.get("build", {}).get("locked-compact", False):
+                optional_dependencies = compact_locked_groups(member.name, optional_dependencies)
+            self._check_metadata_budget(member, optional_dependencies)
+            handovers[member] = dump_handover_groups(member.name, optional_dependencies)
+
+        failures: list[Path] = []
+        with ThreadPoolExecutor(max_workers=max(options.jobs, 1)) as executor:
+            futures = {
+                executor.submit(self._build_workspace_member, project, member, handover, options): member.root
+                for member, handover in handovers.items()
+            }
+            for future in as_completed(futures):
+                root = futures[future]
+                result = future.result()
+                project.core.ui.echo(
+                    f"pdm-build-locked - Built {root}:" if result.returncode == 0 else f"[error]Failed to build {root}:"
+                )
+                project.core.ui.echo(result.stdout.rstrip())
+                if result.returncode != 0:
+                    project.core.ui.echo(result.stderr.rstrip(), err=True)
+                    failures.append(root)
 
-        # update target
-        optional.update(optional_dependencies)
-        project.pyproject.metadata[optional_key] = optional
-        project.pyproject.write(show_message=False)
+        if failures:
+            raise PdmException(f"Failed to build {len(failures)} of {len(roots)} projects: {sorted(failures)}")
 
-        # to prevent unclean scm status, we need to ignore pyproject.toml during build
-        self._git_ignore_pyproject(project, True)
+    @staticmethod
+    def _check_metadata_budget(project: Project, optional_dependencies: dict[str, list[str]]) -> None:
+        """
+        Report the core metadata added by the locked groups if `locked-metadata-budget` is configured
 
-        # build project
+        Args:
+            project: the pdm Project
+            optional_dependencies: mapping of locked group name to requirements
+
+        Raises:
+            PdmException: if the setting is invalid or the budget is exceeded with action "fail"
+        """
+        budget = project.pyproject.settings.get("build", {}).get("locked-metadata-budget")
         try:
-            super().handle(project, options)
-        finally:
-            # undo our changes to pyproject.toml even if pdm build crashes
-            for group in locked_groups:
-                with suppress(KeyError):
-                    project.pyproject.metadata.get("optional-dependencies", {}).pop(group)
-            if not project.pyproject.settings:
-                del project.pyproject._data["tool"]["pdm"]  # type: ignore[union-attr]
-                if not project.pyproject._data["tool"]:
-                    del project.pyproject._data["tool"]
+            report = check_metadata_budget(optional_dependencies, budget)
+        except ValueError as e:
+            raise PdmException(str(e)) from e
+        if report is not None:
+            project.core.ui.echo(f"pdm-build-locked - {report}")
 
-            project.pyproject.write(show_message=False)
-            self._git_ignore_pyproject(project, False)
+    @staticmethod
+    def _get_marker_python(project: Project) -> str | None:
+        """
+        Get the requires-python to simplify the markers of locked requirements for
+
+        Args:
+            project: the pdm project
+
+        Returns:
+            requires-python of the project if `locked-simplify-markers` is enabled, else None
+        """
+        if project.pyproject.settings.get("build", {}).get("locked-simplify-markers", False):
+            return project.pyproject.metadata.get("requires-python", "")
+        return None
+
+    @staticmethod
+    def _build_workspace_member(
+        project: Project, member: Project, handover: str, options: argparse.Namespace
+    ) -> subprocess.CompletedProcess[str]:
+        """
+        Run `pdm build --locked` for a workspace project in a subprocess
+
+        Args:
+            project: the pdm project the workspace build was started from
+            member: the workspace project to build
+            handover: the value of PDM_BUILD_LOCKED_GROUPS for this project
+            options: the command line options
+
+        Returns:
+            the completed subprocess
+        """
+        cmd = [sys.executable, "-m", "pdm", "build", "--locked", "--project", str(member.root), "--dest", options.dest]
+        if not options.sdist:
+            cmd.append("--no-sdist")
+        if not options.wheel:
+            cmd.append("--no-wheel")
+        if not options.clean:
+            cmd.append("--no-clean")
+        if options.verbose < 0:
+            cmd.append("--quiet")
+        elif options.verbose > 0:
+            cmd.append(f"-{'v' * options.verbose}")
+        if options.skip:
+            cmd.extend(["--skip", ",".join(options.skip)])
+        if options.pylock:
+            cmd.append("--pylock")
+        if options.if_changed:
+            cmd.append("--if-changed")
+        if not project.core.state.build_isolation:
+            cmd.append("--no-isolation")
+        for key, value in (project.core.state.config_settings or {}).items():
+            for item in value if isinstance(value, list) else [value]:
+                cmd.append(f"--config-setting={key}={item}")
+        # use the interpreter selected for the project here, the subprocess doesn't share the configuration
+        env = {**os.environ, LOCKED_GROUPS_ENV: handover, "PDM_PYTHON": str(member.python.executable)}
+        with _trace.span("build workspace project", project=str(member.root)):
+            return subprocess.run(cmd, capture_output=True, text=True, env=env, check=False)
 
     @staticmethod
-    def _update_lockfile(project: Project) -> None:
+    def _get_build_environment(project: Project) -> dict[str, Any]:
+        """
+        Describe the interpreter and the build requirements of the project, which the artifacts depend on as well
+
+        Args:
+            project: the pdm project
+
+        Returns:
+            the executable, version, implementation and ABI identifier of the interpreter and the build requirements
+            with their versions installed in the project environment, None if not installed there
+        """
+        python = project.python
+        working_set = project.environment.get_working_set()
+        build_requires = {}
+        for requirement in project.pyproject._data.get("build-system", {}).get("requires", []):
+            name = normalize_name(re.split(r"[^A-Za-z0-9._-]", requirement, maxsplit=1)[0])
+            build_requires[requirement] = working_set[name].version if name in working_set else None
+        return {
+            "executable": str(python.executable),
+            "version": str(python.version),
+            "implementation": python.implementation,
+            "identifier": python.identifier,
+            "build-requires": build_requires,
+        }
+
+    @staticmethod
+    def _backend_accepts_handover(project: Project) -> bool:
+        """
+        Check whether the build backend runs the pdm-build-locked hook, which accepts the locked groups
+        via PDM_BUILD_LOCKED_GROUPS instead of a modified pyproject.toml
+
+        Args:
+            project: the pdm project
+
+        Returns:
+            True if pdm-build-locked is a build requirement of pdm-backend or a configured hatchling metadata hook
+        """
+        build_system = project.pyproject._data.get("build-system", {})
+        requires = {
+            normalize_name(re.split(r"[^A-Za-z0-9._-]", req, maxsplit=1)[0]) for req in build_system.get("requires", [])
+        }
+        if "pdm-build-locked" not in requires:
+            return False
+        backend = build_system.get("build-backend")
+        if backend == "pdm.backend":
+            return True
+        if backend == "hatchling.build":
+            hooks = project.pyproject._data.get("tool", {}).get("hatch", {}).get("metadata", {}).get("hooks", {})
+            return "build-locked" in hooks and "optional-dependencies" in project.pyproject.metadata.get("dynamic", [])
+        return False
+
+    @staticmethod
+    def _check_handover(project: Project, dest: str, optional_dependencies: dict[str, list[str]]) -> None:
+        """
+        Verify that the build backend hook added the handed over locked groups to the wheel
+
+        Args:
+            project: the pdm project
+            dest: the build destination directory
+            optional_dependencies: the locked groups handed over to the build backend
+
+        Raises:
+            PdmException: if locked groups are missing in the wheel metadata
+        """
+        if (wheel := BuildCommand._find_wheel(project, dest)) is None:
+            return
+        with zipfile.ZipFile(wheel) as zf:
+            metadata_file = next(name for name in zf.namelist() if name.endswith(".dist-info/METADATA"))
+            metadata = email.message_from_bytes(zf.read(metadata_file))
+        extras = {normalize_name(extra) for extra in metadata.get_all("Provides-Extra", [])}
+        if missing := sorted(group for group in optional_dependencies if normalize_name(group) not in extras):
+            raise PdmException(
+                f"The locked groups {missing} are missing in {wheel.name}."
+                " Please make sure pdm-build-locked in build-system.requires is up to date."
+            )
+
+    @staticmethod
+    def _find_wheel(project: Project, dest: str) -> Path | None:
+        """
+        Find the wheel of the project built last
+
+        Args:
+            project: the pdm project
+            dest: the build destination directory
+
+        Returns:
+            path of the wheel, None if there is none
+        """
+        wheel_prefix = f"{re.sub(r'[-_.]+', '_', project.name).lower()}-"
+        wheels = [
+            wheel for wheel in project.root.joinpath(dest).glob("*.whl") if wheel.name.lower().startswith(wheel_prefix)
+        ]
+        return max(wheels, key=lambda path: path.stat().st_mtime) if wheels else None
+
+    @staticmethod
+    def _embed_pylock(project: Project, dest: str, locked_groups: Iterable[str]) -> None:
+        """
+        Embed a pylock.toml sidecar in the built wheel, unless the build backend hook already did
+
+        Args:
+            project: the pdm project
+            dest: the build destination directory
+            locked_groups: the locked groups of the wheel
+
+        Raises:
+            PdmException: if the locked files have no URLs
+        """
+        if (wheel := BuildCommand._find_wheel(project, dest)) is None:
+            return
+        with _trace.span("embed pylock"):
+            groups = get_original_groups(locked_groups)
+            try:
+                content = load_locked_pylock(
+                    project.root, groups, project.pyproject.metadata.get("requires-python", "")
+                )
+            except ValueError as e:
+                raise PdmException(str(e)) from e
+            if content is None:
+                project.core.ui.echo(
+                    "pdm-build-locked - The lockfile doesn't support 'inherit_metadata' strategy, skip embedding pylock.toml",
+                    err=True,
+                )
+                return
+            embed_pylock(wheel, content)
+
+    @staticmethod
+    def _update_lockfile(project: Project, frozen: bool = False) -> None:
         """
         Update the lockfile if needed
         Reimplementation of pdm install lockfile check and update
 
         Args:
             project: the pdm project
+            frozen: if True, never update the lockfile and fail if it doesn't match pyproject.toml
+
+        Raises:
+            PdmException: if the lockfile is frozen and missing or outdated
         """
+        if frozen:
+            # only compares the content hash of pyproject.toml, no environment or repository is needed
+            if not project.lockfile.exists():
+                raise PdmException(
+                    "The lockfile doesn't exist, run `pdm lock` first or build without --frozen-lockfile."
+                )
+            if not project.is_lockfile_hash_match():
+                raise PdmException(
+                    "The lockfile doesn't match pyproject.toml, run `pdm lock` to update it"
+                    " or build without --frozen-lockfile."
+                )
+            return
+
         strategy = actions.check_lockfile(project, raise_not_exist=False)
         groups = list(project.iter_groups())
         with suppress(ValueError):
@@ -132,11 +588,162 @@ class BuildCommand(BaseCommand):
         if strategy:
             actions.do_lock(project, strategy=strategy, groups=groups)
 
+    @staticmethod
+    def _get_locked_groups(project: Project, groups: Iterable[str]) -> dict[str, list[str]]:
+        """
+        Determine locked dependency strings for several groups at once
+
+        The groups are read from the lockfile like the build backend hooks do, without pdm's resolver:
+        from the groups and markers of the inherit_metadata strategy, or else from the dependency graph
+        of the lockfile. Lockfiles with several targets are resolved by pdm for each target.
+
+        Args:
+            project: the pdm Project
+            groups: the groups to get pinned dependencies for
+
+        Returns:
+            Mapping of group to locked packages
+        """
+        groups = list(groups)
+        if "env_spec" in _lockfile_resolver_parameters() and len(BuildCommand._get_lock_targets(project)) > 1:
+            return BuildCommand._resolve_locked_groups(project, groups)
+
+        requirements = {}
+        for group in groups:
+            dependencies: Iterable[Any] = project.get_dependencies(group)
+            if isinstance(dependencies, dict):
+                # pdm<2.17
+                dependencies = dependencies.values()
+            requirements[group] = [str(requirement) for requirement in dependencies]
+        locked = load_locked_groups(
+            find_lockfile(project.root), groups, requirements=requirements, python_requires=str(project.python_requires)
+        )
+        if locked is None:  # pragma: no cover; only without dependency information in the lockfile
+            return BuildCommand._resolve_locked_groups(project, groups)
+        return {group: locked[group] or [] for group in groups}
+
     @staticmethod
     def _get_locked_packages(project: Project, group: str) -> list[str]:
         """
         Determine locked dependency strings for direct and transitive dependencies
 
+        Args:
+            project: the pdm Project
+            group: the group to get pinned dependencies for
+
+        Returns:
+            Set of locked packages
+        """
+        return BuildCommand._get_locked_groups(project, [group])[group]
+
+    @staticmethod
+    def _resolve_locked_groups(project: Project, groups: list[str]) -> dict[str, list[str]]:
+        """
+        Resolve locked dependency strings for several groups with pdm's resolver
+
+        If the lockfile uses the inherit_metadata strategy, the union of all groups is resolved once
+        and the candidates are assigned to the groups they are locked for.
+        Otherwise, each group is resolved separately.
+
+        Args:
+            project: the pdm Project
+            groups: the groups to get pinned dependencies for
+
+        Returns:
+            Mapping of group to locked packages
+        """
+        if (
+            len(groups) < 2
+            or "env_spec" not in _lockfile_resolver_parameters()
+            or "inherit_metadata" not in project.lockfile.strategy
+        ):
+            return {group: BuildCommand._resolve_locked_packages(project, group) for group in groups}
+
+        requirements = [requirement for group in groups for requirement in project.get_dependencies(group)]
+        locked_groups: dict[str, list[str]] = {group: [] for group in groups}
+        for pinned, candidate in BuildCommand._resolve_lock_targets(project, requirements, groups):
+            for group in groups:
+                if group in candidate.req.groups:
+                    locked_groups[group].append(pinned)
+        return locked_groups
+
+    @staticmethod
+    def _get_lock_targets(project: Project) -> list:
+        """
+        Get the environments to resolve the lockfile for
+
+        Args:
+            project: the pdm Project
+
+        Returns:
+            the targets declared by the lockfile if there are several, otherwise only the lowest supported Python
+        """
+        markers = import_module("pdm.models.markers")
+        try:
+            # pylock.toml keeps the targets in its [tool.pdm] table
+            data = (
+                project.lockfile["tool"]["pdm"]
+                if "lock-version" in project.lockfile._data
+                else project.lockfile["metadata"]
+            )
+        except KeyError:
+            data = {}
+        targets = data.get("targets", [])
+        if len(targets) < 2:
+            # use lowest supported specifier to include all deps - we don't know the target Python at build time
+            return [markers.EnvSpec.from_spec(str(project.python_requires))]
+        return [markers.EnvSpec.from_spec(**target) for target in targets]
+
+    @staticmethod
+    def _resolve_lock_targets(project: Project, requirements: list, groups: list[str]) -> list[tuple[str, Any]]:
+        """
+        Resolve requirements from the lockfile for each of its targets and merge the results
+
+        Candidates pinned for some but not all targets are restricted to those targets with their environment markers.
+
+        Args:
+            project: the pdm Project
+            requirements: the requirements to resolve
+            groups: the groups the requirements belong to
+
+        Returns:
+            pairs of pinned requirement strings and the candidates they are pinned from
+        """
+        from pdm.cli.actions import resolve_candidates_from_lockfile
+
+        targets = BuildCommand._get_lock_targets(project)
+        if len(targets) == 1:
+            candidates = resolve_candidates_from_lockfile(project, requirements, groups=groups, env_spec=targets[0])
+            return [(str(c.req.as_pinned_version(c.version)), c) for c in candidates.values()]
+
+        # one after another: the resolution is CPU-bound and shares the state of the project and its lockfile
+        resolved = [
+            resolve_candidates_from_lockfile(project, requirements, groups=groups, env_spec=target)
+            for target in targets
+        ]
+
+        # pinned requirement -> (requirement, candidate, markers of the targets it is pinned for)
+        pins: dict[str, tuple[Any, Any, list]] = {}
+        for target, candidates in zip(targets, resolved):
+            for candidate in candidates.values():
+                pinned = candidate.req.as_pinned_version(candidate.version)
+                pins.setdefault(str(pinned), (pinned, candidate, []))[2].append(target.markers_with_python())
+
+        merged = []
+        for key, (pinned, candidate, target_markers) in pins.items():
+            if len(target_markers) < len(targets):
+                target_marker = functools.reduce(operator.or_, target_markers)
+                if pinned.marker is not None:
+                    target_marker = pinned.marker & target_marker
+                key = str(dataclasses.replace(pinned, marker=target_marker))
+            merged.append((key, candidate))
+        return merged
+
+    @staticmethod
+    def _resolve_locked_packages(project: Project, group: str) -> list[str]:
+        """
+        Resolve locked dependency strings for direct and transitive dependencies with pdm's resolver
+
         Args:
             project: the pdm Project
             group: the group to get pinned dependencies for
@@ -146,14 +753,11 @@ class BuildCommand(BaseCommand):
         """
         from pdm.cli.actions import resolve_candidates_from_lockfile
 
-        supported_params = inspect.signature(resolve_candidates_from_lockfile).parameters
+        supported_params = _lockfile_resolver_parameters()
         if "env_spec" in supported_params:
             # pdm 2.17.0+
             requirements = list(project.get_dependencies(group))
-            markers = import_module("pdm.models.markers")
-            # use lowest supported specifier to include all deps - we don't know the target Python at build time
-            env_spec = markers.EnvSpec.from_spec(str(project.python_requires))
-            candidates = resolve_candidates_from_lockfile(project, requirements, groups=[group], env_spec=env_spec)
+            return [pinned for pinned, _ in BuildCommand._resolve_lock_targets(project, requirements, [group])]
         elif "cross_platform" in supported_params:
             # pdm 2.11.0+
             requirements = list(project.get_dependencies(group).values())  # type: ignore[attr-defined]
@@ -12,7 +12,15 @@ class BuildLockedMetadataHook(MetadataHookInterface):
     PLUGIN_NAME = "build-locked"
 
     def update(self, metadata: dict) -> None:
-        update_metadata_with_locked(metadata, Path(self.root), self.config.get("locked-groups"))
+        update_metadata_with_locked(
+            metadata,
+            Path(self.root),
+            self.config.get("locked-groups"),
+            self.config.get("locked-simplify-markers", False),
+            self.config.get("locked-compact", False),
+            self.config.get("locked-stale", "warn"),
+            self.config.get("locked-metadata-budget"),
+        )
 
 
 @hookimpl
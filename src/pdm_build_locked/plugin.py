@@ -4,9 +4,74 @@ pdm-build-locked
 A PDM plugin that adds locked dependencies to optional-dependencies on build
 """
 
+from __future__ import annotations
+
+import argparse
+import os
+from typing import TYPE_CHECKING
+
+from pdm.cli.commands.build import Command as BaseCommand
 from pdm.core import Core
 
-from .command import BuildCommand
+if TYPE_CHECKING:
+    from pdm.project.core import Project
+
+
+def add_locked_arguments(parser: argparse.ArgumentParser) -> None:
+    """add the arguments of `pdm build --locked` to the build command parser
+
+    Args:
+        parser: the parser of the build command
+    """
+    parser.add_argument("-l", "--locked", help="Add locked dependencies to distribution metadata.", action="store_true")
+    parser.add_argument(
+        "--frozen-lockfile",
+        help="Fail instead of updating the lockfile if it doesn't match pyproject.toml. Implies --locked.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--pylock",
+        help="Embed a PEP 751 pylock.toml with the locked packages and their hashes in the .dist-info of the wheel.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--if-changed",
+        help="Skip the build if the sources and locked dependencies are unchanged since the last build into the"
+        " destination directory.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--workspace",
+        metavar="PATTERN",
+        action="append",
+        help="Build all projects matching the path or glob pattern (relative to the project root) with locked"
+        " dependencies, resolving a shared lockfile only once. Can be supplied multiple times.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of workspace projects to build in parallel. Default: number of CPUs",
+    )
+
+
+class LazyBuildCommand(BaseCommand):
+    """Build artifacts for distribution"""
+
+    name = "build"
+
+    def add_arguments(self, parser: argparse.ArgumentParser) -> None:
+        add_locked_arguments(parser)
+        super().add_arguments(parser)
+
+    def handle(self, project: Project, options: argparse.Namespace) -> None:
+        # the build machinery is only imported when `pdm build` is actually run, not on every pdm invocation
+        from .command import BuildCommand
+
+        command = BuildCommand()
+        command.name = self.name
+        command.handle(project, options)
 
 
 def main(core: Core) -> None:
@@ -15,4 +80,4 @@ def main(core: Core) -> None:
     Args:
         core: pdm core
     """
-    core.register_command(BuildCommand)
+    core.register_command(LazyBuildCommand)
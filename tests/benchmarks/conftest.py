@@ -0,0 +1,130 @@
+"""benchmark configuration, benchmarks only run if PDM_BUILD_LOCKED_BENCHMARK is set
+
+Each benchmark records its best time and peak memory, which are compared against baselines.json.
+A benchmark fails if it regresses beyond PDM_BUILD_LOCKED_BENCHMARK_THRESHOLD (default 1.5, i.e. 50% slower
+or larger). Run with PDM_BUILD_LOCKED_BENCHMARK_UPDATE=1 to store the measurements as new baselines.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+
+from tests.benchmarks.lockgen import LockSpec, generate_project
+
+BASELINES = Path(__file__).with_name("baselines.json")
+_MEASUREMENTS: dict[str, dict[str, float]] = {}
+
+
+def pytest_collection_modifyitems(items: list[pytest.Item]) -> None:
+    """skip benchmarks unless explicitly enabled
+
+    Args:
+        items: collected test items
+    """
+    if os.getenv("PDM_BUILD_LOCKED_BENCHMARK"):
+        return
+    skip = pytest.mark.skip(reason="set PDM_BUILD_LOCKED_BENCHMARK=1 to run benchmarks")
+    for item in items:
+        if "benchmarks" in item.path.parts:
+            item.add_marker(skip)
+
+
+def pytest_sessionfinish(session: pytest.Session) -> None:
+    """store the measurements as new baselines if requested
+
+    Args:
+        session: the pytest session
+    """
+    if not _MEASUREMENTS or not os.getenv("PDM_BUILD_LOCKED_BENCHMARK_UPDATE"):
+        return
+    baselines = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+    baselines.update(_MEASUREMENTS)
+    BASELINES.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + "\n")
+
+
+def check_baseline(name: str, measurement: dict[str, float]) -> None:
+    """Record a measurement and compare it against the stored baseline
+
+    Args:
+        name: name of the benchmark
+        measurement: mapping of metric to measured value
+
+    Raises:
+        AssertionError: if a metric exceeds its baseline by more than the threshold
+    """
+    _MEASUREMENTS[name] = measurement
+    baseline = json.loads(BASELINES.read_text()).get(name) if BASELINES.exists() else None
+    if baseline is None or os.getenv("PDM_BUILD_LOCKED_BENCHMARK_UPDATE"):
+        return
+    threshold = float(os.getenv("PDM_BUILD_LOCKED_BENCHMARK_THRESHOLD", "1.5"))
+    for metric, value in measurement.items():
+        assert value <= baseline[metric] * threshold, (
+            f"{name} regressed: {metric} {value} exceeds baseline {baseline[metric]} * {threshold}"
+        )
+
+
+@pytest.fixture(scope="session")
+def generated_project(tmp_path_factory: pytest.TempPathFactory) -> Callable[..., Path]:
+    """Factory of generated projects, each shape is only generated once per session
+
+    Args:
+        tmp_path_factory: pytest temporary directory factory
+
+    Returns:
+        function taking a LockSpec and build requirements, returning the project root
+    """
+    projects: dict[tuple[LockSpec, tuple[str, ...]], Path] = {}
+
+    def factory(spec: LockSpec, build_requires: tuple[str, ...] = ("pdm-backend",)) -> Path:
+        if (spec, build_requires) not in projects:
+            root = tmp_path_factory.mktemp("generated")
+            projects[spec, build_requires] = generate_project(root, spec, build_requires)
+        return projects[spec, build_requires]
+
+    return factory
+
+
+@pytest.fixture
+def benchmark(request: pytest.FixtureRequest) -> Callable[..., dict[str, float]]:
+    """Measure a function and compare it against the stored baseline of the current benchmark
+
+    Args:
+        request: pytest-internal fixture to access the current test function
+
+    Returns:
+        function taking the function to measure, the number of repetitions and an optional setup function,
+        returning the best time in seconds and the peak memory in bytes
+    """
+
+    def measure(func: Callable[[], Any], repeat: int = 3, setup: Callable[[], Any] | None = None) -> dict[str, float]:
+        timings = []
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+        # memory is measured in a separate run, tracing allocations slows down the function
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        try:
+            func()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        measurement = {"time": round(min(timings), 3), "peak_memory": peak_memory}
+        print(f"\n{request.node.name}: {measurement['time']:.3f}s, {measurement['peak_memory'] / 2**20:.1f} MiB")
+        check_baseline(request.node.name, measurement)
+        return measurement
+
+    return measure
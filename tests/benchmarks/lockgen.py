@@ -0,0 +1,159 @@
+"""deterministic generator of large pdm projects and lockfiles for benchmarks"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class LockSpec:
+    """shape of a generated lockfile
+
+    Attributes:
+        packages: number of packages
+        groups: number of groups, "default" and "group1" ... "group<groups - 1>"
+        marker_every: every n-th package gets an environment marker, 0 to disable
+        url_every: every n-th package is a direct URL requirement, 0 to disable
+        vcs_every: every n-th package is a git requirement, 0 to disable
+        files: number of file hashes per package
+    """
+
+    packages: int = 1000
+    groups: int = 3
+    marker_every: int = 5
+    url_every: int = 0
+    vcs_every: int = 0
+    files: int = 8
+
+    @property
+    def group_names(self) -> list[str]:
+        return ["default", *(f"group{i}" for i in range(1, self.groups))]
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _package_name(index: int) -> str:
+    return f"package-{index:06d}"
+
+
+def _package_groups(spec: LockSpec, index: int) -> list[str]:
+    """every package belongs to one group, every 7th package is shared with the next group"""
+    names = spec.group_names
+    groups = [names[index % len(names)]]
+    if index % 7 == 0 and len(names) > 1:
+        groups.append(names[(index + 1) % len(names)])
+    return groups
+
+
+def _requirement(spec: LockSpec, index: int) -> str:
+    """the requirement of a package as written to pyproject.toml"""
+    name = _package_name(index)
+    if spec.url_every and index % spec.url_every == 0:
+        return f"{name} @ https://example.com/{name}-1.0.tar.gz"
+    if spec.vcs_every and index % spec.vcs_every == 0:
+        return f"{name} @ git+https://example.com/{name}.git@main"
+    return name
+
+
+def generate_dependencies(spec: LockSpec) -> dict[str, list[str]]:
+    """the direct dependencies per group, every locked package is a direct dependency
+
+    Args:
+        spec: shape of the lockfile
+
+    Returns:
+        mapping of group name to requirements
+    """
+    dependencies: dict[str, list[str]] = {group: [] for group in spec.group_names}
+    for index in range(spec.packages):
+        for group in _package_groups(spec, index):
+            dependencies[group].append(_requirement(spec, index))
+    return dependencies
+
+
+def generate_lockfile(spec: LockSpec, content_hash: str = "") -> str:
+    """generate a pdm.lock with the inherit_metadata strategy, formatted like pdm writes it
+
+    Args:
+        spec: shape of the lockfile
+        content_hash: content hash of the corresponding pyproject.toml
+
+    Returns:
+        the lockfile content
+    """
+    lines = [
+        "# This file is @generated by PDM.",
+        "# It is not intended for manual editing.",
+        "",
+        "[metadata]",
+        f"groups = {json.dumps(spec.group_names)}",
+        'strategy = ["inherit_metadata"]',
+        'lock_version = "4.5.0"',
+        f'content_hash = "sha256:{content_hash}"',
+        "",
+        "[[metadata.targets]]",
+        'requires_python = ">=3.9"',
+    ]
+    for index in range(spec.packages):
+        name = _package_name(index)
+        version = f"{index % 10}.{index % 7}.{index % 3}"
+        lines += ["", "[[package]]", f'name = "{name}"', f'version = "{version}"']
+        lines += ['requires_python = ">=3.9"', f'summary = "Generated package number {index}"']
+        if spec.url_every and index % spec.url_every == 0:
+            lines.append(f'url = "https://example.com/{name}-1.0.tar.gz"')
+        elif spec.vcs_every and index % spec.vcs_every == 0:
+            lines += [f'git = "https://example.com/{name}.git"', 'ref = "main"', f'revision = "{_digest(name)[:40]}"']
+        lines.append(f"groups = {json.dumps(_package_groups(spec, index))}")
+        if spec.marker_every and index % spec.marker_every == 0:
+            lines.append("marker = \"sys_platform != 'win32'\"")
+        if spec.files:
+            lines.append("files = [")
+            for file_index in range(spec.files):
+                file_name = f"{name.replace('-', '_')}-{version}-cp3{file_index}-none-any.whl"
+                lines.append(f'    {{file = "{file_name}", hash = "sha256:{_digest(file_name)}"}},')
+            lines.append("]")
+    return "\n".join(lines) + "\n"
+
+
+def generate_project(root: Path, spec: LockSpec, build_requires: tuple[str, ...] = ("pdm-backend",)) -> Path:
+    """write a pdm project with pyproject.toml and a matching pdm.lock
+
+    Args:
+        root: the project directory, created if missing
+        spec: shape of the lockfile
+        build_requires: requirements of the build system
+
+    Returns:
+        the project directory
+    """
+    from pdm.core import Core
+
+    dependencies = generate_dependencies(spec)
+    optional = {group: requirements for group, requirements in dependencies.items() if group != "default"}
+    root.mkdir(parents=True, exist_ok=True)
+    pyproject = [
+        "[project]",
+        'name = "generated"',
+        'version = "0.1.0"',
+        'requires-python = ">=3.9"',
+        f"dependencies = {json.dumps(dependencies['default'])}",
+        "",
+        "[project.optional-dependencies]",
+        *(f"{group} = {json.dumps(requirements)}" for group, requirements in optional.items()),
+        "",
+        "[build-system]",
+        f"requires = {json.dumps(list(build_requires))}",
+        'build-backend = "pdm.backend"',
+        "",
+        "[tool.pdm.build]",
+        "locked = true",
+    ]
+    root.joinpath("pyproject.toml").write_text("\n".join(pyproject) + "\n")
+    content_hash = Core().create_project(root).pyproject.content_hash()
+    root.joinpath("pdm.lock").write_text(generate_lockfile(spec, content_hash))
+    return root
@@ -0,0 +1,41 @@
+"""benchmarks of pdm build --locked"""
+
+from __future__ import annotations
+
+import timeit
+from pathlib import Path
+
+import pytest
+
+
+@pytest.mark.parametrize("test_project", ["large-selected"])
+def test_bench_get_locked_groups(monkeypatch: pytest.MonkeyPatch, data_base_path: Path, test_project: str) -> None:
+    """compare reading all groups from the lockfile in one batch against resolving each group with pdm
+
+    Args:
+        monkeypatch: pytest monkeypatch fixture
+        data_base_path: path to tests/data
+        test_project: path to test project
+    """
+    from pdm.core import Core
+
+    from pdm_build_locked import _utils
+    from pdm_build_locked.command import BuildCommand
+
+    monkeypatch.delenv("PDM_BUILD_LOCKED_CACHE", raising=False)
+    project = Core().create_project(data_base_path.joinpath(test_project))
+    groups = ["default", "cow", "extras"]
+
+    def per_group() -> None:
+        for group in groups:
+            BuildCommand._resolve_locked_packages(project, group)
+
+    def batched() -> None:
+        # the locked groups are memoized per process, read the lockfile on every run
+        _utils._LOCKED_GROUPS_MEMO.clear()
+        BuildCommand._get_locked_groups(project, groups)
+
+    per_group_time = min(timeit.repeat(per_group, number=3, repeat=3))
+    batched_time = min(timeit.repeat(batched, number=3, repeat=3))
+    print(f"\nper-group: {per_group_time:.3f}s, batched: {batched_time:.3f}s")
+    assert batched_time < per_group_time
@@ -0,0 +1,45 @@
+"""benchmark of the plugin's startup overhead on every pdm invocation"""
+
+from __future__ import annotations
+
+import re
+import subprocess
+import sys
+
+from tests.benchmarks.conftest import check_baseline
+
+IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def plugin_import_time() -> float:
+    """measure the cumulative import time of loading the plugin into an initialized pdm core, with -X importtime
+
+    Returns:
+        import time in seconds
+    """
+    code = (
+        "from pdm.core import Core\n"
+        "Core.load_plugins = lambda self: None\n"
+        "core = Core()\n"
+        "from pdm_build_locked.plugin import main\n"
+        "main(core)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    imports = [
+        (len(indent), int(cumulative))
+        for _, cumulative, indent, name in IMPORT_TIME.findall(result.stderr)
+        if name.split(".")[0] == "pdm_build_locked"
+    ]
+    assert imports, "the plugin was not loaded"
+    # only count the outermost imports of the plugin, nested ones are included in their cumulative time
+    outermost = min(indent for indent, _ in imports)
+    return sum(cumulative for indent, cumulative in imports if indent == outermost) / 1e6
+
+
+def test_bench_plugin_import() -> None:
+    """loading the plugin must stay cheap, it happens on every pdm invocation"""
+    import_time = round(min(plugin_import_time() for _ in range(5)), 4)
+    print(f"\nplugin import time: {import_time * 1000:.1f}ms")
+    check_baseline("test_bench_plugin_import", {"time": import_time})
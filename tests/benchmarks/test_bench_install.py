@@ -0,0 +1,142 @@
+"""benchmarks of installing locked and unlocked wheels with pip, offline from a wheelhouse of stub distributions"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, List, Tuple
+
+import pytest
+from pkginfo import Wheel
+
+from pdm_build_locked._utils import normalize_name
+from tests.benchmarks.conftest import check_baseline
+from tests.benchmarks.wheelhouse import generate_wheelhouse
+
+DATA = Path(__file__).parents[1] / "data"
+# build settings of the benchmarked metadata shapes, replacing `locked = true` in [tool.pdm.build]
+VARIANTS = {
+    "unlocked": "locked = false",
+    "locked": "locked = true",
+    "locked-shaped": "locked = true\nlocked-simplify-markers = true\nlocked-compact = true",
+}
+
+# the built wheel, the wheelhouse to install from and the extras to install
+InstallSetup = Tuple[Path, Path, List[str]]
+
+# the distributions installed for each project, which have to be the same for all variants
+_INSTALLED: dict[str, list[str]] = {}
+
+
+def pip_install(requirement: str, wheelhouse: Path, *args: str) -> tuple[float, str]:
+    """run pip install offline, only from the wheelhouse
+
+    Args:
+        requirement: the requirement to install
+        wheelhouse: directory of the wheels to install from
+        args: extra arguments of pip install
+
+    Returns:
+        the wall time in seconds and the output of pip
+    """
+    cmd = [sys.executable, "-m", "pip", "install", "--no-index", "--find-links", str(wheelhouse)]
+    cmd += ["--no-cache-dir", "--disable-pip-version-check", "--quiet", *args, requirement]
+    # ignore the pip configuration of the machine running the benchmarks
+    env = {**os.environ, "PIP_CONFIG_FILE": os.devnull}
+    start = time.perf_counter()
+    result = subprocess.run(cmd, check=False, capture_output=True, text=True, env=env)
+    elapsed = time.perf_counter() - start
+    assert result.returncode == 0, result.stderr
+    return elapsed, result.stdout
+
+
+@pytest.fixture(scope="module")
+def install_setup(tmp_path_factory: pytest.TempPathFactory) -> Callable[[str, str], InstallSetup]:
+    """Factory building a test project with the settings of a variant, along with the wheelhouse of its lockfile
+
+    Args:
+        tmp_path_factory: pytest temporary directory factory
+
+    Returns:
+        function taking the test project and the variant, returning the built wheel, the wheelhouse and the extras
+    """
+    wheelhouses: dict[str, Path] = {}
+    setups: dict[tuple[str, str], InstallSetup] = {}
+
+    def factory(test_project: str, variant: str) -> InstallSetup:
+        if test_project not in wheelhouses:
+            wheelhouses[test_project] = tmp_path_factory.mktemp("wheelhouse")
+            generate_wheelhouse(DATA / test_project / "pdm.lock", wheelhouses[test_project])
+        if (test_project, variant) not in setups:
+            from build.__main__ import build_package
+
+            root = tmp_path_factory.mktemp(variant)
+            project = root / test_project
+            shutil.copytree(
+                DATA / test_project, project, ignore=shutil.ignore_patterns("__pypackages__", ".pdm-python")
+            )
+            pyproject = project / "pyproject.toml"
+            pyproject.write_text(pyproject.read_text().replace("\nlocked = true\n", f"\n{VARIANTS[variant]}\n", 1))
+            with pytest.MonkeyPatch.context() as monkeypatch:
+                # the version of the test projects comes from git
+                monkeypatch.setenv("PDM_BUILD_SCM_VERSION", "1.0")
+                wheel = root / build_package(project, root, ["wheel"], isolation=False)[0]
+            if variant == "unlocked":
+                # the unpinned groups of those locked by default, e.g. only some of them with locked-groups
+                locked_extras = factory(test_project, "locked")[2]
+                extras = [extra[: -len("-locked")] for extra in locked_extras if extra != "locked"]
+            else:
+                extras = [
+                    extra
+                    for extra in Wheel(str(wheel)).provides_extras
+                    if extra == "locked" or extra.endswith("-locked")
+                ]
+            setups[test_project, variant] = (wheel, wheelhouses[test_project], extras)
+        return setups[test_project, variant]
+
+    return factory
+
+
+@pytest.mark.parametrize("variant", list(VARIANTS))
+@pytest.mark.parametrize("test_project", ["large", "large-selected"])
+def test_bench_pip_install(
+    request: pytest.FixtureRequest,
+    install_setup: Callable[[str, str], InstallSetup],
+    tmp_path: Path,
+    test_project: str,
+    variant: str,
+) -> None:
+    """resolve with pip install --dry-run and install into a fresh target directory
+
+    Args:
+        request: pytest-internal fixture to access the current test function
+        install_setup: factory of built wheels and wheelhouses
+        tmp_path: pytest temporary directory
+        test_project: path to test project
+        variant: the metadata shape, see VARIANTS
+    """
+    wheel, wheelhouse, extras = install_setup(test_project, variant)
+    requirement = f"{wheel}[{','.join(extras)}]" if extras else str(wheel)
+
+    resolve_times, install_times = [], []
+    report: dict[str, Any] = {}
+    for index in range(3):
+        elapsed, output = pip_install(requirement, wheelhouse, "--dry-run", "--ignore-installed", "--report", "-")
+        resolve_times.append(elapsed)
+        report = json.loads(output)
+        install_times.append(pip_install(requirement, wheelhouse, "--target", str(tmp_path / f"target-{index}"))[0])
+
+    installed = sorted(normalize_name(item["metadata"]["name"]) for item in report["install"])
+    # the locked groups have to install the same distributions as resolving the unpinned requirements
+    assert _INSTALLED.setdefault(test_project, installed) == installed
+    measurement = {"resolve": round(min(resolve_times), 3), "install": round(min(install_times), 3)}
+    print(
+        f"\n{request.node.name}: {len(installed)} distributions, "
+        f"resolve {measurement['resolve']:.3f}s, install {measurement['install']:.3f}s"
+    )
+    check_baseline(request.node.name, measurement)
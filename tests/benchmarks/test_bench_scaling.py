@@ -0,0 +1,137 @@
+"""benchmarks of the backend hook and pdm build --locked on generated lockfiles"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+
+from pdm_build_locked import _lockfile, _utils
+from pdm_build_locked._lockfile import tomllib
+from tests.benchmarks.lockgen import LockSpec
+
+if TYPE_CHECKING:
+    from pdm.pytest import PDMCallable
+
+
+def read_metadata(root: Path) -> dict[str, Any]:
+    """the project metadata as passed to the backend hook
+
+    Args:
+        root: the project root
+
+    Returns:
+        the project table of pyproject.toml
+    """
+    with root.joinpath("pyproject.toml").open("rb") as f:
+        return tomllib.load(f)["project"]
+
+
+# lockfiles with direct URL and VCS entries, which are only supported by the backend hook
+MIXED = {"url_every": 50, "vcs_every": 75}
+
+
+@pytest.mark.parametrize("packages", [1_000, 10_000, 100_000])
+def test_bench_update_metadata_with_locked(
+    benchmark: Callable[..., dict[str, float]], generated_project: Callable[..., Path], packages: int
+) -> None:
+    """backend hook path: parse the lockfile, select the groups and format the requirements
+
+    Args:
+        benchmark: benchmark fixture
+        generated_project: factory of generated projects
+        packages: number of packages in the lockfile
+    """
+    root = generated_project(LockSpec(packages=packages, **MIXED))
+    metadata: dict[str, Any] = {}
+
+    def run() -> None:
+        metadata.clear()
+        metadata.update(read_metadata(root))
+        _utils.update_metadata_with_locked(metadata, root)
+
+    benchmark(run, setup=_utils._LOCKED_GROUPS_MEMO.clear)
+    locked = [group for group in metadata["optional-dependencies"] if group.endswith("locked")]
+    assert sum(len(metadata["optional-dependencies"][group]) for group in locked) > packages
+
+
+@pytest.mark.parametrize("groups", [3, 30])
+def test_bench_update_metadata_with_locked_groups(
+    benchmark: Callable[..., dict[str, float]], generated_project: Callable[..., Path], groups: int
+) -> None:
+    """backend hook path with many groups
+
+    Args:
+        benchmark: benchmark fixture
+        generated_project: factory of generated projects
+        groups: number of groups in the lockfile
+    """
+    root = generated_project(LockSpec(packages=10_000, groups=groups))
+    benchmark(
+        lambda: _utils.update_metadata_with_locked(read_metadata(root), root), setup=_utils._LOCKED_GROUPS_MEMO.clear
+    )
+
+
+def test_bench_requirement_dict_to_string(
+    benchmark: Callable[..., dict[str, float]], generated_project: Callable[..., Path]
+) -> None:
+    """format the requirement strings of 100k packages
+
+    Args:
+        benchmark: benchmark fixture
+        generated_project: factory of generated projects
+    """
+    root = generated_project(LockSpec(packages=100_000, **MIXED))
+    packages = _lockfile.load_lockfile(root.joinpath("pdm.lock").read_text())["package"]
+    benchmark(lambda: [_utils.requirement_dict_to_string(package) for package in packages])
+
+
+@pytest.mark.parametrize("packages", [1_000, 10_000])
+def test_bench_get_locked_groups(
+    benchmark: Callable[..., dict[str, float]], generated_project: Callable[..., Path], packages: int
+) -> None:
+    """pdm build --locked path: resolve the locked groups with pdm
+
+    Args:
+        benchmark: benchmark fixture
+        generated_project: factory of generated projects
+        packages: number of packages in the lockfile
+    """
+    from pdm.core import Core
+
+    from pdm_build_locked.command import BuildCommand
+
+    spec = LockSpec(packages=packages)
+    root = generated_project(spec)
+
+    def run() -> None:
+        # a fresh project, pdm caches the parsed lockfile on the project
+        project = Core().create_project(root)
+        BuildCommand._get_locked_groups(project, set(spec.group_names))
+
+    benchmark(run, repeat=2)
+
+
+def test_bench_build_locked(
+    benchmark: Callable[..., dict[str, float]],
+    generated_project: Callable[..., Path],
+    pdm: PDMCallable,
+    tmp_path: Path,
+) -> None:
+    """complete pdm build --locked of a wheel, handing the locked groups over to the backend hook
+
+    Args:
+        benchmark: benchmark fixture
+        generated_project: factory of generated projects
+        pdm: PDM runner fixture
+        tmp_path: pytest temporary directory
+    """
+    root = generated_project(LockSpec(packages=1_000), ("pdm-backend", "pdm-build-locked"))
+    cmd = ["build", "--locked", "--frozen-lockfile", "--no-isolation", "--no-sdist", "--project", root.as_posix()]
+
+    def run() -> None:
+        result = pdm([*cmd, "--dest", tmp_path.as_posix()])
+        assert result.exit_code == 0, result.stderr
+
+    benchmark(run, repeat=2)
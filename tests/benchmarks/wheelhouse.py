@@ -0,0 +1,128 @@
+"""local wheelhouse of stub distributions matching a lockfile, for offline installer benchmarks"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from pdm_build_locked._lockfile import tomllib
+from pdm_build_locked._utils import _split_marker, normalize_name, parse_requirement
+
+# fixed timestamp of the archive members, so the stubs are identical across runs
+_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+_WHEEL = b"Wheel-Version: 1.0\nGenerator: pdm-build-locked-benchmarks\nRoot-Is-Purelib: true\nTag: py3-none-any\n"
+
+
+@dataclass
+class StubDistribution:
+    """metadata of a locked package, merged from its lockfile entries with and without extras
+
+    Attributes:
+        name: the project name
+        version: the locked version
+        requires_python: the requires-python of the package
+        requires_dist: the dependencies, those of extras guarded by `extra == "<extra>"` markers
+        extras: the extras the package provides
+    """
+
+    name: str
+    version: str
+    requires_python: str = ""
+    requires_dist: list[str] = field(default_factory=list)
+    extras: list[str] = field(default_factory=list)
+
+    @property
+    def distribution(self) -> str:
+        return normalize_name(self.name).replace("-", "_")
+
+
+def _with_extra(requirement: str, extra: str) -> str:
+    condition = f'extra == "{extra}"'
+    name, marker = _split_marker(requirement)
+    return f"{name} ; ({marker}) and {condition}" if marker else f"{name} ; {condition}"
+
+
+def _record_hash(content: bytes) -> str:
+    return "sha256=" + base64.urlsafe_b64encode(hashlib.sha256(content).digest()).rstrip(b"=").decode()
+
+
+def read_stub_distributions(lockfile: Path) -> list[StubDistribution]:
+    """Collect the distributions locked in a pdm.lock
+
+    Args:
+        lockfile: path of the pdm.lock
+
+    Returns:
+        one distribution per locked name and version, packages without a version (e.g. VCS requirements) are skipped
+    """
+    with lockfile.open("rb") as f:
+        packages = tomllib.load(f).get("package", [])
+    distributions: dict[tuple[str, str], StubDistribution] = {}
+    for package in packages:
+        if "version" not in package:
+            continue
+        key = (normalize_name(package["name"]), package["version"])
+        distribution = distributions.setdefault(
+            key, StubDistribution(package["name"], package["version"], package.get("requires_python", ""))
+        )
+        extras = package.get("extras", [])
+        for requirement in package.get("dependencies", []):
+            if not extras:
+                distribution.requires_dist.append(requirement)
+            elif parse_requirement(requirement)[0] != key[0]:
+                # the entry of an extra depends on the package itself, which the stub already is
+                distribution.requires_dist.extend(_with_extra(requirement, extra) for extra in extras)
+        distribution.extras.extend(extra for extra in extras if extra not in distribution.extras)
+    return list(distributions.values())
+
+
+def write_stub_wheel(dest: Path, distribution: StubDistribution) -> Path:
+    """Write a pure python wheel with the metadata of a distribution and an empty package
+
+    Args:
+        dest: the wheelhouse directory
+        distribution: the distribution to write
+
+    Returns:
+        path of the wheel
+    """
+    dist_info = f"{distribution.distribution}-{distribution.version}.dist-info"
+    metadata = ["Metadata-Version: 2.1", f"Name: {distribution.name}", f"Version: {distribution.version}"]
+    if distribution.requires_python:
+        metadata.append(f"Requires-Python: {distribution.requires_python}")
+    metadata += [f"Provides-Extra: {extra}" for extra in distribution.extras]
+    metadata += [f"Requires-Dist: {requirement}" for requirement in distribution.requires_dist]
+    files = {
+        f"{distribution.distribution}/__init__.py": b"",
+        f"{dist_info}/METADATA": ("\n".join(metadata) + "\n").encode("utf-8"),
+        f"{dist_info}/WHEEL": _WHEEL,
+    }
+    record = [f"{path},{_record_hash(content)},{len(content)}" for path, content in files.items()]
+    files[f"{dist_info}/RECORD"] = ("\n".join([*record, f"{dist_info}/RECORD,,"]) + "\n").encode("utf-8")
+
+    wheel = dest / f"{distribution.distribution}-{distribution.version}-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w") as zf:
+        for path, content in files.items():
+            zf.writestr(zipfile.ZipInfo(path, date_time=_DATE_TIME), content)
+    return wheel
+
+
+def generate_wheelhouse(lockfile: Path, dest: Path) -> list[Path]:
+    """Write a stub wheel for every distribution locked in a pdm.lock
+
+    Installers can resolve and install the locked packages from the wheelhouse with `--no-index --find-links`,
+    without network access. The stubs declare the dependencies recorded in the lockfile, so resolving unpinned
+    requirements walks the same graph as with the real distributions.
+
+    Args:
+        lockfile: path of the pdm.lock
+        dest: the wheelhouse directory, created if missing
+
+    Returns:
+        paths of the wheels
+    """
+    dest.mkdir(parents=True, exist_ok=True)
+    return [write_stub_wheel(dest, distribution) for distribution in read_stub_distributions(lockfile)]
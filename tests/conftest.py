@@ -6,6 +6,7 @@ from typing import Generator
 
 import pytest
 
+from pdm_build_locked import _utils
 from tests.utils import get_pyproject_hash
 
 pytest_plugins = ["pdm.pytest"]
@@ -78,3 +79,13 @@ def assert_pyproject_unmodified(data_base_path: Path, test_project: str) -> Gene
     hash_before = get_pyproject_hash(project)
     yield
     assert get_pyproject_hash(project) == hash_before, "pyproject.toml hashes do not match, check for modifications"
+
+
+@pytest.fixture(autouse=True)
+def clear_locked_groups_memo() -> Generator[None, None, None]:
+    """
+    A pytest fixture to isolate tests from the process-level memo of computed locked groups
+    """
+    _utils._LOCKED_GROUPS_MEMO.clear()
+    yield
+    _utils._LOCKED_GROUPS_MEMO.clear()
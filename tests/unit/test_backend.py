@@ -1,15 +1,20 @@
+from __future__ import annotations
+
+import shutil
+import zipfile
 from pathlib import Path
 
 import pytest
 from pkginfo import Wheel
 
-from tests.utils import count_group_dependencies
+from pdm_build_locked._lockfile import tomllib
+from tests.utils import count_group_dependencies, with_static_urls
 
 
-def build_wheel(src_dir: Path, wheel_dir: Path) -> Wheel:
+def build_wheel(src_dir: Path, wheel_dir: Path, config_settings: dict[str, str] | None = None) -> Wheel:
     from build.__main__ import build_package
 
-    result = build_package(src_dir, wheel_dir, ["wheel"], isolation=False)
+    result = build_package(src_dir, wheel_dir, ["wheel"], config_settings, isolation=False)
     return Wheel(str(wheel_dir / result[0]))
 
 
@@ -38,6 +43,25 @@ def test_pdm_backend_with_selected_groups(temp_dir: Path, data_base_path: Path,
     assert count_group_dependencies(wheel, "cow-locked") == 0
 
 
+@pytest.mark.usefixtures("assert_pyproject_unmodified")
+@pytest.mark.parametrize("test_project", ["pylock"])
+def test_pdm_backend_pylock(temp_dir: Path, data_base_path: Path, test_project: str) -> None:
+    project = data_base_path / test_project
+    wheel = build_wheel(project, temp_dir)
+    assert set(wheel.requires_dist) == {
+        "requests==2.31.0",
+        'colorama; sys_platform == "win32"',
+        'requests==2.31.0; extra == "locked"',
+        'colorama==0.4.6; sys_platform == "win32" and extra == "locked"',
+        'charset-normalizer==3.5.2; extra == "locked"',
+        'idna==3.20; extra == "locked"',
+        'urllib3==2.6.3; extra == "locked"',
+        'certifi==2026.7.22; extra == "locked"',
+        'pysocks; extra == "socks"',
+        'pysocks==1.7.1; extra == "socks-locked"',
+    }
+
+
 @pytest.mark.usefixtures("assert_pyproject_unmodified")
 @pytest.mark.parametrize("test_project", ["lock-disabled"])
 def test_pdm_backend_disabled(temp_dir: Path, data_base_path: Path, test_project: str) -> None:
@@ -81,13 +105,21 @@ def test_hatchling_backend(temp_dir: Path, data_base_path: Path, test_project: s
 
 @pytest.mark.usefixtures("assert_pyproject_unmodified")
 @pytest.mark.parametrize("test_project", ["lock", "lock-hatchling"])
-def test_backend_lockfile_unsupported(
+def test_backend_legacy_lockfile(
     temp_dir: Path, data_base_path: Path, monkeypatch: pytest.MonkeyPatch, test_project: str
 ) -> None:
+    # without inherit_metadata, the locked groups are resolved from the dependency graph of the lockfile
     monkeypatch.setenv("PDM_LOCKFILE", "pdm.legacy.lock")
     project = data_base_path / test_project
     wheel = build_wheel(project, temp_dir)
-    assert set(wheel.requires_dist) == {"requests"}
+    assert {requirement.replace("'", '"') for requirement in wheel.requires_dist} == {
+        "requests",
+        'certifi==2023.11.17; extra == "locked"',
+        'charset-normalizer==3.3.2; extra == "locked"',
+        'requests==2.31.0; extra == "locked"',
+        'urllib3==2.1.0; extra == "locked"',
+        'idna==3.6; extra == "locked"',
+    }
 
 
 @pytest.mark.usefixtures("assert_pyproject_unmodified")
@@ -98,3 +130,211 @@ def test_backend_no_lockfile(
     project = data_base_path / test_project
     wheel = build_wheel(project, temp_dir)
     assert set(wheel.requires_dist) == {"requests==2.31.0"}
+
+
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_pdm_backend_simplify_markers(temp_dir: Path, data_base_path: Path, test_project: str) -> None:
+    project = temp_dir / test_project
+    shutil.copytree(data_base_path / test_project, project, ignore=shutil.ignore_patterns("__pypackages__"))
+    lockfile = project / "pdm.lock"
+    lockfile.write_text(
+        lockfile.read_text()
+        .replace('name = "certifi"\n', 'name = "certifi"\nmarker = "python_version >= \\"3.8\\""\n')
+        .replace('name = "idna"\n', "name = \"idna\"\nmarker = \"python_version>='3.6' and os_name=='nt'\"\n")
+    )
+    pyproject = project / "pyproject.toml"
+    pyproject.write_text(pyproject.read_text() + "locked-simplify-markers = true\n")
+
+    wheel = build_wheel(project, temp_dir / "dist")
+    assert 'certifi==2023.11.17; extra == "locked"' in wheel.requires_dist
+    assert 'idna==3.6; os_name == "nt" and extra == "locked"' in wheel.requires_dist
+
+
+@pytest.mark.usefixtures("assert_pyproject_unmodified")
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_pdm_backend_pylock_sidecar(
+    temp_dir: Path,
+    data_base_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capfd: pytest.CaptureFixture[str],
+    test_project: str,
+) -> None:
+    from build import BuildBackendException
+
+    monkeypatch.setenv("PDM_BUILD_LOCKED_PYLOCK", "true")
+    # installers need the URLs of the locked files
+    with pytest.raises(BuildBackendException):
+        build_wheel(data_base_path / test_project, temp_dir / "dist")
+    assert "lock with `pdm lock --static-urls`" in capfd.readouterr().err
+
+    project = temp_dir / test_project
+    shutil.copytree(data_base_path / test_project, project, ignore=shutil.ignore_patterns("__pypackages__"))
+    lockfile = project / "pdm.lock"
+    lockfile.write_text(with_static_urls(lockfile.read_text()))
+    wheel = build_wheel(project, temp_dir / "dist")
+    with zipfile.ZipFile(wheel.filename) as zf:
+        pylock = tomllib.loads(zf.read("test_pdm-0.1.0.dist-info/pylock.toml").decode())
+        record = zf.read("test_pdm-0.1.0.dist-info/RECORD").decode()
+    assert {package["name"] for package in pylock["packages"]} == {
+        "certifi",
+        "charset-normalizer",
+        "idna",
+        "requests",
+        "urllib3",
+    }
+    assert all("marker" not in package and package["wheels"] for package in pylock["packages"])
+    assert "test_pdm-0.1.0.dist-info/pylock.toml,sha256=" in record
+
+
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_pdm_backend_stale_lockfile(
+    temp_dir: Path, data_base_path: Path, capfd: pytest.CaptureFixture[str], test_project: str
+) -> None:
+    from build import BuildBackendException
+
+    project = temp_dir / test_project
+    shutil.copytree(data_base_path / test_project, project, ignore=shutil.ignore_patterns("__pypackages__"))
+    pyproject = project / "pyproject.toml"
+    pyproject.write_text(
+        pyproject.read_text().replace('dependencies = ["requests"]', 'dependencies = ["requests", "idna"]')
+    )
+
+    with pytest.warns(UserWarning, match="doesn't match pyproject.toml"):
+        build_wheel(project, temp_dir / "dist")
+
+    pyproject.write_text(pyproject.read_text() + 'locked-stale = "fail"\n')
+    with pytest.raises(BuildBackendException):
+        build_wheel(project, temp_dir / "dist")
+    assert "StaleLockfile: The lockfile pdm.lock doesn't match pyproject.toml" in capfd.readouterr().err
+
+
+@pytest.mark.usefixtures("assert_pyproject_unmodified")
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_pdm_backend_wheel_from_sdist(
+    temp_dir: Path, data_base_path: Path, capfd: pytest.CaptureFixture[str], test_project: str
+) -> None:
+    import tarfile
+
+    from build.__main__ import build_package
+
+    sdist = temp_dir / build_package(data_base_path / test_project, temp_dir, ["sdist"], isolation=False)[0]
+    with tarfile.open(sdist) as tf:
+        tf.extractall(temp_dir / "sdist", filter="data")
+    src_dir = temp_dir / "sdist" / "test_pdm-0.1.0"
+    pyproject = tomllib.loads(src_dir.joinpath("pyproject.toml").read_text())
+    assert pyproject["tool"]["pdm"]["build"]["locked-static"] is True
+    assert "locked" in pyproject["project"]["optional-dependencies"]
+
+    # the locked groups are taken from the sdist, even without the lockfile
+    src_dir.joinpath("pdm.lock").unlink(missing_ok=True)
+    capfd.readouterr()
+    wheel = build_wheel(src_dir, temp_dir / "dist")
+    assert "lockfile doesn't exist" not in capfd.readouterr().err
+    assert set(wheel.requires_dist) == {
+        "requests",
+        'certifi==2023.11.17; extra == "locked"',
+        'charset-normalizer==3.3.2; extra == "locked"',
+        'requests==2.31.0; extra == "locked"',
+        'urllib3==2.1.0; extra == "locked"',
+        'idna==3.6; extra == "locked"',
+    }
+
+
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_pdm_backend_metadata_budget(
+    temp_dir: Path, data_base_path: Path, capfd: pytest.CaptureFixture[str], test_project: str
+) -> None:
+    from build import BuildBackendException
+
+    project = temp_dir / test_project
+    shutil.copytree(data_base_path / test_project, project, ignore=shutil.ignore_patterns("__pypackages__"))
+    pyproject = project / "pyproject.toml"
+    content = pyproject.read_text()
+
+    pyproject.write_text(f"{content}locked-metadata-budget = 10000\n")
+    build_wheel(project, temp_dir / "dist")
+    assert "Locked metadata: 6 lines" in capfd.readouterr().out
+
+    pyproject.write_text(f'{content}locked-metadata-budget = {{ lines = 5, action = "fail" }}\n')
+    with pytest.raises(BuildBackendException):
+        build_wheel(project, temp_dir / "dist")
+    assert (
+        "MetadataBudgetExceeded: The locked groups exceed locked-metadata-budget: 6 lines > 5" in capfd.readouterr().err
+    )
+
+
+def read_metadata(wheel: Wheel) -> bytes:
+    with zipfile.ZipFile(wheel.filename) as zf:
+        return zf.read(next(name for name in zf.namelist() if name.endswith(".dist-info/METADATA")))
+
+
+@pytest.mark.usefixtures("assert_pyproject_unmodified")
+@pytest.mark.parametrize("test_project", ["pylock"])
+def test_pdm_backend_reproducible_metadata(
+    temp_dir: Path, data_base_path: Path, monkeypatch: pytest.MonkeyPatch, test_project: str
+) -> None:
+    metadata = []
+    for seed in ("1", "2"):
+        # the order of sets depends on the hash seed of the build process
+        monkeypatch.setenv("PYTHONHASHSEED", seed)
+        metadata.append(read_metadata(build_wheel(data_base_path / test_project, temp_dir / f"dist-{seed}")))
+    assert metadata[0] == metadata[1]
+
+    requires_dist = [line for line in metadata[0].decode().splitlines() if line.startswith("Requires-Dist:")]
+    for group in ("locked", "socks-locked"):
+        group_lines = [line for line in requires_dist if f'extra == "{group}"' in line]
+        assert group_lines
+        assert group_lines == sorted(group_lines)
+
+
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_pdm_backend_prune(
+    temp_dir: Path, data_base_path: Path, capfd: pytest.CaptureFixture[str], test_project: str
+) -> None:
+    project = temp_dir / test_project
+    shutil.copytree(data_base_path / test_project, project, ignore=shutil.ignore_patterns("__pypackages__"))
+    pyproject = project / "pyproject.toml"
+    pyproject.write_text(f"{pyproject.read_text()}locked-prune = true\n")
+    lockfile = project / "pdm.lock"
+    lockfile.write_text(
+        lockfile.read_text()
+        .replace('name = "certifi"\n', 'name = "certifi"\nmarker = "sys_platform == \'win32\'"\n')
+        .replace('name = "idna"\n', 'name = "idna"\nmarker = "python_version < \'3.10\'"\n')
+    )
+
+    # nothing can be ruled out for pure python wheels
+    wheel = build_wheel(project, temp_dir / "dist")
+    assert count_group_dependencies(wheel, "locked") == 5
+    assert "Pruned" not in capfd.readouterr().out
+
+    wheel = build_wheel(project, temp_dir / "dist", {"--python-tag": "cp311", "--plat-name": "manylinux_2_17_x86_64"})
+    assert count_group_dependencies(wheel, "locked") == 3
+    assert not any(dependency.startswith(("certifi", "idna")) for dependency in wheel.requires_dist)
+    assert "Pruned 2 locked requirements that can't be installed with cp311-none-manylinux_2_17_x86_64 wheels" in (
+        capfd.readouterr().out
+    )
+
+    wheel = build_wheel(project, temp_dir / "dist", {"--python-tag": "cp39", "--plat-name": "win_amd64"})
+    assert count_group_dependencies(wheel, "locked") == 5
+
+
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_pdm_backend_prune_platform_wheel(temp_dir: Path, data_base_path: Path, test_project: str) -> None:
+    from packaging.tags import sys_tags
+
+    project = temp_dir / test_project
+    shutil.copytree(data_base_path / test_project, project, ignore=shutil.ignore_patterns("__pypackages__"))
+    pyproject = project / "pyproject.toml"
+    pyproject.write_text(f"{pyproject.read_text()}locked-prune = true\n")
+    # the local build hook runs after this plugin and turns the wheel into a platform wheel
+    (project / "pdm_build.py").write_text(
+        'def pdm_build_initialize(context):\n    context.config.build_config["is-purelib"] = False\n'
+    )
+    lockfile = project / "pdm.lock"
+    lockfile.write_text(
+        lockfile.read_text().replace('name = "certifi"\n', 'name = "certifi"\nmarker = "sys_platform == \'nt\'"\n')
+    )
+
+    wheel = build_wheel(project, temp_dir / "dist")
+    assert Path(wheel.filename).name.endswith(f"-{next(sys_tags())}.whl")
+    assert count_group_dependencies(wheel, "locked") == 4
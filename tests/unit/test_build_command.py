@@ -2,12 +2,22 @@
 
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import zipfile
 from pathlib import Path
-from typing import TYPE_CHECKING
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any
 
 import pytest
+from pkginfo import Wheel
 
-from tests.utils import count_group_dependencies, wheel_from_tempdir
+from pdm_build_locked._lockfile import tomllib
+from tests.utils import count_group_dependencies, wheel_from_tempdir, with_static_urls
 
 if TYPE_CHECKING:
     from pdm.pytest import PDMCallable
@@ -187,3 +197,414 @@ def test_build_locked_empty(pdm: PDMCallable, data_base_path: Path, temp_dir: Pa
     ]
     result = pdm(cmd)
     assert result.exit_code == 0
+
+
+@pytest.mark.parametrize("test_project", ["large-selected"])
+def test_get_locked_groups_batched(data_base_path: Path, test_project: str) -> None:
+    """reading all groups from the lockfile in one pass gives the same result as pdm's resolver for each group
+
+    Args:
+        data_base_path: path to tests/data
+        test_project: path to test project
+    """
+    from packaging.requirements import Requirement
+    from pdm.core import Core
+
+    from pdm_build_locked.command import BuildCommand
+
+    project = Core().create_project(data_base_path.joinpath(test_project))
+    groups = ["default", "cow", "extras"]
+    batched = BuildCommand._get_locked_groups(project, groups)
+    # pdm separates the markers of the pinned requirements differently
+    assert {group: {str(Requirement(pinned)) for pinned in batched[group]} for group in groups} == {
+        group: {str(Requirement(pinned)) for pinned in BuildCommand._resolve_locked_packages(project, group)}
+        for group in groups
+    }
+    assert len(batched["default"]) == 26
+    assert batched["cow"] == ["pycowsay==0.0.0.2"]
+
+
+@pytest.mark.parametrize("test_project", ["large-selected"])
+def test_get_locked_groups_targets(data_base_path: Path, temp_dir: Path, test_project: str) -> None:
+    """each target of a multi-target lock is resolved, pins of some targets get the target markers
+
+    Args:
+        data_base_path: path to tests/data
+        temp_dir: temporary dir
+        test_project: path to test project
+    """
+    from pdm.core import Core
+
+    from pdm_build_locked.command import BuildCommand
+
+    for name in ("pyproject.toml", "pdm.lock"):
+        shutil.copy2(data_base_path / test_project / name, temp_dir)
+    lockfile = temp_dir / "pdm.lock"
+    lockfile.write_text(
+        lockfile.read_text().replace(
+            'requires_python = ">=3.9"\n',
+            'requires_python = ">=3.9,<3.10"\n\n[[metadata.targets]]\nrequires_python = ">=3.10"\n',
+            1,
+        )
+    )
+    project = Core().create_project(temp_dir)
+    groups = ["default", "cow"]
+    single = BuildCommand._get_locked_groups(Core().create_project(data_base_path / test_project), groups)
+    batched = BuildCommand._get_locked_groups(project, groups)
+    assert batched == {group: BuildCommand._get_locked_packages(project, group) for group in groups}
+    assert batched["cow"] == single["cow"] == ["pycowsay==0.0.0.2"]
+
+    # importlib-resources and zipp are only locked for python < 3.10
+    assert len(batched["default"]) == len(single["default"])
+    assert set(batched["default"]) - set(single["default"]) == {
+        'importlib-resources==6.4.0; python_version < "3.10" and python_version >= "3.9"',
+        'zipp==3.19.2; python_version < "3.10" and python_version >= "3.9"',
+    }
+
+
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_build_locked_metadata_budget(
+    pdm: PDMCallable, data_base_path: Path, temp_dir: Path, test_project: str
+) -> None:
+    """the metadata added by the locked groups is reported, exceeding the budget fails the build if configured
+
+    Args:
+        pdm: PDM runner fixture
+        data_base_path: path to tests/data
+        temp_dir: path to tests/_temp/... temporary directory
+        test_project: path to test project
+    """
+    project_path = temp_dir / test_project
+    shutil.copytree(data_base_path / test_project, project_path, ignore=shutil.ignore_patterns("__pypackages__"))
+    pyproject = project_path / "pyproject.toml"
+    content = pyproject.read_text()
+    cmd = ["build", "--locked", "--project", project_path.as_posix(), "--dest", (temp_dir / "dist").as_posix()]
+
+    pyproject.write_text(f"{content}locked-metadata-budget = 10000\n")
+    result = pdm(cmd)
+    assert result.exit_code == 0, result.stderr
+    assert "pdm-build-locked - Locked metadata: 6 lines" in result.stdout
+    assert "  locked: 6 lines" in result.stdout
+
+    pyproject.write_text(f'{content}locked-metadata-budget = {{ lines = 5, action = "fail" }}\n')
+    result = pdm(cmd)
+    assert result.exit_code != 0
+    assert "exceed locked-metadata-budget: 6 lines > 5" in result.stderr
+
+
+@pytest.mark.parametrize("test_project", ["large-selected"])
+def test_build_locked_reproducible(data_base_path: Path, temp_dir: Path, test_project: str) -> None:
+    """building twice gives byte-identical METADATA, regardless of the iteration order of sets
+
+    Args:
+        data_base_path: path to tests/data
+        temp_dir: path to tests/_temp/... temporary directory
+        test_project: path to test project
+    """
+    project_path = temp_dir / test_project
+    shutil.copytree(data_base_path / test_project, project_path, ignore=shutil.ignore_patterns("__pypackages__"))
+    pyproject = project_path / "pyproject.toml"
+    pyproject.write_text(pyproject.read_text().replace('locked-groups = ["default"]\n', ""))
+
+    metadata = []
+    for seed in ("1", "2"):
+        dest = temp_dir / f"dist-{seed}"
+        # the order of sets depends on the hash seed of the pdm process
+        cmd = [sys.executable, "-m", "pdm", "build", "--locked", "--no-sdist", "--no-isolation", "--dest", str(dest)]
+        subprocess.run(
+            [*cmd, "--project", str(project_path)],
+            check=True,
+            capture_output=True,
+            env={**os.environ, "PYTHONHASHSEED": seed},
+        )
+        with zipfile.ZipFile(next(dest.glob("*.whl"))) as zf:
+            metadata.append(zf.read(next(name for name in zf.namelist() if name.endswith(".dist-info/METADATA"))))
+    assert metadata[0] == metadata[1]
+    extras = [line for line in metadata[0].decode().splitlines() if line.startswith("Provides-Extra:")]
+    assert extras[-3:] == ["Provides-Extra: cow-locked", "Provides-Extra: extras-locked", "Provides-Extra: locked"]
+
+
+@pytest.mark.usefixtures("assert_pyproject_unmodified")
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_build_locked_frozen(pdm: PDMCallable, data_base_path: Path, temp_dir: Path, test_project: str) -> None:
+    """a frozen build of a project with an up-to-date lockfile
+
+    Args:
+        pdm: PDM runner fixture
+        data_base_path: path to tests/data
+        temp_dir: path to tests/_temp/... temporary directory
+        test_project: path to test project
+    """
+    project_path = data_base_path.joinpath(test_project)
+    lockfile_hash = hashlib.sha256(project_path.joinpath("pdm.lock").read_bytes()).hexdigest()
+    cmd = ["build", "--frozen-lockfile", "--project", project_path.as_posix(), "--dest", temp_dir.as_posix()]
+    result = pdm(cmd)
+    assert result.exit_code == 0
+    assert hashlib.sha256(project_path.joinpath("pdm.lock").read_bytes()).hexdigest() == lockfile_hash
+
+    wheel = wheel_from_tempdir(temp_dir)
+    assert count_group_dependencies(wheel, "locked") == 5
+
+
+@pytest.mark.parametrize(
+    "test_project,error", [("simple", "lockfile doesn't exist"), ("lock", "lockfile doesn't match pyproject.toml")]
+)
+def test_build_locked_frozen_outdated(
+    pdm: PDMCallable, data_base_path: Path, temp_dir: Path, test_project: str, error: str
+) -> None:
+    """a frozen build fails if the lockfile is missing or outdated instead of locking again
+
+    Args:
+        pdm: PDM runner fixture
+        data_base_path: path to tests/data
+        temp_dir: path to tests/_temp/... temporary directory
+        test_project: path to test project
+        error: expected error message
+    """
+    project_path = temp_dir / test_project
+    shutil.copytree(data_base_path / test_project, project_path)
+    pyproject = project_path / "pyproject.toml"
+    pyproject.write_text(pyproject.read_text().replace('dependencies = ["requests"]', 'dependencies = ["idna"]'))
+    lockfiles = sorted(project_path.glob("*.lock"))
+
+    cmd = ["build", "--project", project_path.as_posix(), "--dest", (temp_dir / "dist").as_posix()]
+    # --frozen-lockfile implies --locked
+    for args in (["--locked", "--frozen-lockfile"], ["--frozen-lockfile"]):
+        result = pdm([*cmd, *args])
+        assert result.exit_code != 0
+        assert error in result.stderr
+        assert sorted(project_path.glob("*.lock")) == lockfiles
+
+
+@pytest.mark.usefixtures("assert_pyproject_unmodified")
+@pytest.mark.parametrize("test_project", ["lock-handover"])
+def test_build_locked_handover(pdm: PDMCallable, data_base_path: Path, temp_dir: Path, test_project: str) -> None:
+    """this project uses the pdm-backend hook, which receives the locked groups without modifying pyproject.toml
+
+    Args:
+        pdm: PDM runner fixture
+        data_base_path: path to tests/data
+        temp_dir: path to tests/_temp/... temporary directory
+        test_project: path to test project
+    """
+    project_path = data_base_path.joinpath(test_project)
+    pyproject_mtime = project_path.joinpath("pyproject.toml").stat().st_mtime_ns
+    cmd = ["build", "--locked", "--no-isolation", "--project", project_path.as_posix(), "--dest", temp_dir.as_posix()]
+    result = pdm(cmd)
+    assert result.exit_code == 0
+    assert project_path.joinpath("pyproject.toml").stat().st_mtime_ns == pyproject_mtime
+
+    wheel = wheel_from_tempdir(temp_dir)
+    assert count_group_dependencies(wheel, "locked") == 5
+
+
+@pytest.mark.usefixtures("assert_pyproject_unmodified")
+@pytest.mark.parametrize("test_project", ["lock", "lock-handover"])
+def test_build_locked_pylock(pdm: PDMCallable, data_base_path: Path, temp_dir: Path, test_project: str) -> None:
+    """the wheel contains a pylock.toml sidecar, written by the backend hook or added by the command
+
+    Args:
+        pdm: PDM runner fixture
+        data_base_path: path to tests/data
+        temp_dir: path to tests/_temp/... temporary directory
+        test_project: path to test project
+    """
+    project_path = temp_dir / test_project
+    shutil.copytree(
+        data_base_path / test_project, project_path, ignore=shutil.ignore_patterns("__pypackages__", ".pdm-python")
+    )
+    dest = temp_dir / "dist"
+    cmd = ["build", "--locked", "--pylock", "--no-isolation", "--no-sdist", "--project", project_path.as_posix()]
+    result = pdm([*cmd, "--dest", dest.as_posix()])
+    # installers need the URLs of the locked files
+    assert result.exit_code != 0
+    assert "lock with `pdm lock --static-urls`" in result.stderr
+
+    lockfile = project_path / "pdm.lock"
+    lockfile.write_text(with_static_urls(lockfile.read_text()))
+    result = pdm([*cmd, "--dest", dest.as_posix()])
+    assert result.exit_code == 0
+
+    wheel = wheel_from_tempdir(dest)
+    with zipfile.ZipFile(wheel.filename) as zf:
+        names = zf.namelist()
+        pylock = tomllib.loads(zf.read("test_pdm-0.1.0.dist-info/pylock.toml").decode())
+    assert names.count("test_pdm-0.1.0.dist-info/pylock.toml") == 1
+    assert len(pylock["packages"]) == count_group_dependencies(wheel, "locked") == 5
+
+
+@pytest.mark.usefixtures("assert_pyproject_unmodified")
+@pytest.mark.parametrize("test_project", ["lock-handover"])
+def test_build_locked_trace(
+    pdm: PDMCallable, data_base_path: Path, temp_dir: Path, test_project: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """the phases of the command and the backend hook are traced to the same file
+
+    Args:
+        pdm: PDM runner fixture
+        data_base_path: path to tests/data
+        temp_dir: path to tests/_temp/... temporary directory
+        test_project: path to test project
+        monkeypatch: pytest monkeypatch fixture
+    """
+    trace_file = temp_dir / "trace.json"
+    monkeypatch.setenv("PDM_BUILD_LOCKED_TRACE", trace_file.as_posix())
+    project_path = data_base_path.joinpath(test_project)
+    # pdm build cleans the destination directory
+    dest = temp_dir / "dist"
+    cmd = ["build", "--locked", "--no-isolation", "--project", project_path.as_posix(), "--dest", dest.as_posix()]
+    result = pdm(cmd)
+    assert result.exit_code == 0
+
+    events = json.loads(trace_file.read_text().rstrip().rstrip(",") + "]")
+    names = {event["name"] for event in events}
+    assert {"pdm build --locked", "update lockfile", "resolve locked packages", "build"} <= names
+    # emitted by the backend hook in the build subprocess
+    assert "update_metadata_with_locked" in names
+
+
+@pytest.mark.parametrize(
+    "pyproject,accepts",
+    [
+        ({"build-system": {"requires": ["pdm-backend"], "build-backend": "pdm.backend"}}, False),
+        (
+            {"build-system": {"requires": ["pdm-backend", "pdm_build_locked>=0.3"], "build-backend": "pdm.backend"}},
+            True,
+        ),
+        (
+            {
+                "build-system": {
+                    "requires": ["setuptools", "pdm-build-locked"],
+                    "build-backend": "setuptools.build_meta",
+                }
+            },
+            False,
+        ),
+        ({"build-system": {"requires": ["hatchling", "pdm-build-locked"], "build-backend": "hatchling.build"}}, False),
+        (
+            {
+                "project": {"dynamic": ["optional-dependencies"]},
+                "build-system": {"requires": ["hatchling", "pdm-build-locked"], "build-backend": "hatchling.build"},
+                "tool": {"hatch": {"metadata": {"hooks": {"build-locked": {}}}}},
+            },
+            True,
+        ),
+    ],
+)
+def test_backend_accepts_handover(pyproject: dict[str, Any], accepts: bool) -> None:
+    """the locked groups are only handed over if the build backend runs the pdm-build-locked hook
+
+    Args:
+        pyproject: pyproject.toml content
+        accepts: whether the handover is expected to be used
+    """
+    from pdm_build_locked.command import BuildCommand
+
+    project: Any = SimpleNamespace(pyproject=SimpleNamespace(_data=pyproject, metadata=pyproject.get("project", {})))
+    assert BuildCommand._backend_accepts_handover(project) is accepts
+
+
+def test_check_handover(temp_dir: Path) -> None:
+    """a wheel built by an outdated hook that ignored the handed over groups is detected
+
+    Args:
+        temp_dir: path to tests/_temp/... temporary directory
+    """
+    from pdm.exceptions import PdmException
+
+    from pdm_build_locked.command import BuildCommand
+
+    with zipfile.ZipFile(temp_dir / "test_pdm-0.1.0-py3-none-any.whl", "w") as zf:
+        zf.writestr("test_pdm-0.1.0.dist-info/METADATA", "Name: test-pdm\nProvides-Extra: locked\n")
+    project: Any = SimpleNamespace(name="test-pdm", root=temp_dir)
+    BuildCommand._check_handover(project, ".", {"locked": ["requests==2.31.0"]})
+    with pytest.raises(PdmException, match="extras-locked"):
+        BuildCommand._check_handover(project, ".", {"locked": [], "extras-locked": []})
+
+
+@pytest.mark.parametrize("test_project", ["lock-handover"])
+def test_build_locked_workspace(pdm: PDMCallable, data_base_path: Path, temp_dir: Path, test_project: str) -> None:
+    """several projects are built in parallel, each receiving its locked groups from the parent process
+
+    Args:
+        pdm: PDM runner fixture
+        data_base_path: path to tests/data
+        temp_dir: path to tests/_temp/... temporary directory
+        test_project: path to test project
+    """
+    workspace = temp_dir / "workspace"
+    workspace.mkdir()
+    workspace.joinpath("pyproject.toml").write_text('[project]\nname = "workspace"\nversion = "0.1.0"\n')
+    for member in ("one", "two"):
+        shutil.copytree(
+            data_base_path / test_project,
+            workspace / "packages" / member,
+            ignore=shutil.ignore_patterns("__pypackages__", ".pdm-python"),
+        )
+        pyproject = workspace / "packages" / member / "pyproject.toml"
+        pyproject.write_text(pyproject.read_text().replace('"test-pdm"', f'"test-pdm-{member}"'))
+
+    dest = temp_dir / "dist"
+    cmd = ["build", "--workspace", "packages/*", "--no-isolation", "--no-sdist", "-j", "2"]
+    result = pdm([*cmd, "--project", workspace.as_posix(), "--dest", dest.as_posix()])
+    assert result.exit_code == 0, result.stderr
+
+    wheels = sorted(dest.glob("*.whl"))
+    assert [wheel.name.split("-")[0] for wheel in wheels] == ["test_pdm_one", "test_pdm_two"]
+    for wheel in wheels:
+        assert count_group_dependencies(Wheel(str(wheel)), "locked") == 5
+
+    result = pdm(["build", "--workspace", "missing/*", "--project", workspace.as_posix()])
+    assert result.exit_code != 0
+    assert "No projects found" in result.stderr
+
+
+@pytest.mark.parametrize("test_project", ["lock-handover"])
+def test_build_locked_if_changed(pdm: PDMCallable, data_base_path: Path, temp_dir: Path, test_project: str) -> None:
+    """an unchanged project is not built again, a changed source file or interpreter triggers a rebuild
+
+    Args:
+        pdm: PDM runner fixture
+        data_base_path: path to tests/data
+        temp_dir: path to tests/_temp/... temporary directory
+        test_project: path to test project
+    """
+    project_path = temp_dir / "project"
+    shutil.copytree(
+        data_base_path / test_project, project_path, ignore=shutil.ignore_patterns("__pypackages__", ".pdm-python")
+    )
+    dest = temp_dir / "dist"
+    cmd = ["build", "--locked", "--if-changed", "--no-isolation", "--project", project_path.as_posix()]
+    cmd += ["--dest", dest.as_posix()]
+
+    result = pdm(cmd)
+    assert result.exit_code == 0, result.stderr
+    artifacts = {path.name: path.stat().st_mtime_ns for path in dest.iterdir()}
+    assert ".pdm-build-locked-test-pdm.json" in artifacts
+    assert sum(name.endswith((".whl", ".tar.gz")) for name in artifacts) == 2
+
+    result = pdm(cmd)
+    assert result.exit_code == 0, result.stderr
+    assert "unchanged, skip building" in result.stdout
+    assert {path.name: path.stat().st_mtime_ns for path in dest.iterdir()} == artifacts
+
+    project_path.joinpath("README.md").write_text("changed")
+    result = pdm(cmd)
+    assert result.exit_code == 0, result.stderr
+    assert "skip building" not in result.stdout
+    assert json.loads(dest.joinpath(".pdm-build-locked-test-pdm.json").read_text())["artifacts"] == sorted(
+        name for name in artifacts if not name.startswith(".")
+    )
+
+    # only the interpreter changes, e.g. artifacts with native extensions would have another ABI
+    venv = temp_dir / "venv"
+    subprocess.run([sys.executable, "-m", "venv", "--system-site-packages", "--without-pip", str(venv)], check=True)
+    python = venv / ("Scripts/python.exe" if sys.platform == "win32" else "bin/python")
+    result = pdm(["use", "-f", "--no-version-file", "--project", project_path.as_posix(), python.as_posix()])
+    assert result.exit_code == 0, result.stderr
+    result = pdm(cmd)
+    assert result.exit_code == 0, result.stderr
+    assert "skip building" not in result.stdout
+    result = pdm(cmd)
+    assert result.exit_code == 0, result.stderr
+    assert "unchanged, skip building" in result.stdout
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from pdm_build_locked import _cache, _lockfile, _utils
+
+
+def test_cache_disabled_by_default(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv(_cache.CACHE_ENV, raising=False)
+    assert _cache.get_cache_dir() is None
+
+
+def test_cache_key():
+    key = _cache.get_cache_key(b"lock", ["default"])
+    assert key == _cache.get_cache_key(b"lock", ["default"])
+    assert key != _cache.get_cache_key(b"lock", ["default", "dev"])
+    assert key != _cache.get_cache_key(b"other lock", ["default"])
+
+
+def test_cache_roundtrip(temp_dir: Path):
+    assert _cache.load(temp_dir, "missing") is None
+    _cache.store(temp_dir, "key", {"groups": {"default": ["foo==1.0"]}})
+    assert _cache.load(temp_dir, "key") == {"groups": {"default": ["foo==1.0"]}}
+    assert not list(temp_dir.glob("*.tmp"))
+
+
+def test_cache_corrupt_entry(temp_dir: Path):
+    temp_dir.joinpath("key.json").write_text("{not json")
+    assert _cache.load(temp_dir, "key") is None
+
+
+def test_cache_eviction(temp_dir: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(_cache, "CACHE_MAX_ENTRIES", 2)
+    for mtime, key in enumerate(["a", "b", "c"]):
+        _cache.store(temp_dir, key, {})
+        os.utime(temp_dir / f"{key}.json", ns=(mtime * 10**9, mtime * 10**9))
+    _cache._evict(temp_dir, _cache.CACHE_MAX_ENTRIES)
+    assert sorted(entry.stem for entry in temp_dir.glob("*.json")) == ["b", "c"]
+
+
+def test_update_metadata_with_locked_cached(
+    temp_dir: Path, data_base_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    project = temp_dir / "project"
+    shutil.copytree(data_base_path / "lock", project)
+    monkeypatch.setenv(_cache.CACHE_ENV, str(temp_dir / "cache"))
+
+    expected: dict[str, Any] = {}
+    _utils.update_metadata_with_locked(expected, project)
+    assert len(expected["optional-dependencies"]["locked"]) == 5
+
+    def fail_parse(*args: Any, **kwargs: Any) -> None:
+        raise AssertionError("lockfile should not be parsed on a cache hit")
+
+    monkeypatch.setattr(_lockfile.tomllib, "loads", fail_parse)
+    metadata: dict[str, Any] = {}
+    _utils.update_metadata_with_locked(metadata, project)
+    assert metadata == expected
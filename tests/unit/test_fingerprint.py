@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from pdm_build_locked import _fingerprint
+
+
+@pytest.mark.parametrize("use_git", [True, False])
+def test_compute_fingerprint(temp_dir: Path, monkeypatch: pytest.MonkeyPatch, use_git: bool):
+    if not use_git:
+        monkeypatch.setattr(_fingerprint, "_git_files", lambda root: None)
+    temp_dir.joinpath("src").mkdir()
+    temp_dir.joinpath("src", "foo.py").write_text("")
+
+    def fingerprint(version: str = "1.0") -> str:
+        return _fingerprint.compute_fingerprint(temp_dir, {"locked": [f"foo=={version}"]}, exclude=temp_dir / "dist")
+
+    before = fingerprint()
+    assert before == fingerprint()
+    assert before != fingerprint("2.0")
+
+    # pdm state, build outputs and installed packages are not part of the source tree
+    temp_dir.joinpath(".pdm-python").write_text("/usr/bin/python")
+    for directory in ("dist", "__pypackages__", "src/__pycache__"):
+        temp_dir.joinpath(directory).mkdir()
+        temp_dir.joinpath(directory, "artifact").write_text("")
+    assert list(_fingerprint.iter_source_files(temp_dir, exclude=temp_dir / "dist")) == ["src/foo.py"]
+    assert before == fingerprint()
+
+    temp_dir.joinpath("src", "foo.py").write_text("CHANGED = True\n")
+    assert before != fingerprint()
+
+
+def test_is_up_to_date(temp_dir: Path):
+    sidecar = _fingerprint.get_sidecar_path(temp_dir, "Foo_Bar")
+    assert sidecar.name == ".pdm-build-locked-foo-bar.json"
+    assert not _fingerprint.is_up_to_date(sidecar, "abc")
+
+    temp_dir.joinpath("foo_bar-1.0-py3-none-any.whl").write_text("")
+    _fingerprint.record(sidecar, "abc", ["foo_bar-1.0-py3-none-any.whl"])
+    assert _fingerprint.is_up_to_date(sidecar, "abc")
+    assert not _fingerprint.is_up_to_date(sidecar, "def")
+
+    # the artifacts were removed
+    temp_dir.joinpath("foo_bar-1.0-py3-none-any.whl").unlink()
+    assert not _fingerprint.is_up_to_date(sidecar, "abc")
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import copy
+from pathlib import Path
+
+import pytest
+
+from pdm_build_locked._lockfile import (
+    PACKAGE_KEYS,
+    _group_marker,
+    compact_packages,
+    consume_packages,
+    is_pylock,
+    load_locked_packages,
+    load_lockfile,
+    load_pylock,
+    tomllib,
+)
+
+
+@pytest.mark.parametrize("test_project", ["lock", "large", "large-selected", "empty"])
+def test_load_lockfile(data_base_path: Path, test_project: str):
+    content = data_base_path.joinpath(test_project, "pdm.lock").read_text()
+    expected = tomllib.loads(content)
+    for package in expected.get("package", []):
+        assert "files" in package
+        for key in set(package) - PACKAGE_KEYS:
+            del package[key]
+
+    assert load_lockfile(content) == expected
+
+
+def test_load_lockfile_skips_files(monkeypatch: pytest.MonkeyPatch):
+    content = """\
+[metadata]
+groups = ["default"]
+strategy = ["inherit_metadata"]
+
+[[package]]
+name = "foo"
+version = "1.0"
+groups = ["default"]
+summary = "foo = bar"
+files = [
+    {file = "foo-1.0.tar.gz", hash = "sha256:0123"},
+]
+"""
+    parsed: list[str] = []
+    loads = tomllib.loads
+
+    def recording_loads(text: str) -> dict:
+        parsed.append(text)
+        return loads(text)
+
+    monkeypatch.setattr(tomllib, "loads", recording_loads)
+    assert load_lockfile(content) == {
+        "metadata": {"groups": ["default"], "strategy": ["inherit_metadata"]},
+        "package": [{"name": "foo", "version": "1.0", "groups": ["default"]}],
+    }
+    assert len(parsed) == 1
+    assert "files" not in parsed[0]
+
+
+@pytest.mark.parametrize(
+    "package",
+    [
+        'name = "foo"\nsummary = """multi\nline"""\n',
+        'name = "foo"\nfiles = [{file = "foo-1.0.tar.gz"},\n    {file = "foo-1.0.whl"}]\n',
+        'name = "foo"\n\n[package.extra]\nkey = "value"\n',
+    ],
+)
+def test_load_lockfile_fallback(package: str):
+    assert load_lockfile(f"[[package]]\n{package}")["package"][0]["name"] == "foo"
+
+
+def test_load_lockfile_indented_array_end():
+    # the scanner must not search for the end of the array past an indented closing bracket
+    content = """\
+[metadata]
+groups = ["default"]
+
+[[package]]
+name = "a"
+groups = ["default"]
+files = [
+    {file = "a-1.0.tar.gz", hash = "sha256:0123"},
+  ]
+
+[[package]]
+name = "b"
+groups = ["default"]
+files = [
+    {file = "b-1.0.tar.gz", hash = "sha256:4567"},
+]
+
+[[package]]
+name = "c"
+groups = ["default"]
+"""
+    names = [package["name"] for package in tomllib.loads(content)["package"]]
+    assert names == ["a", "b", "c"]
+    assert [package["name"] for package in load_lockfile(content)["package"]] == names
+    assert [record.to_dict()["name"] for record in load_locked_packages(content)[1]] == names
+
+
+@pytest.mark.parametrize(
+    "name,expected", [("pylock.toml", True), ("pylock.dev.toml", True), ("pdm.lock", False), ("pylock.lock", False)]
+)
+def test_is_pylock(name: str, expected: bool):
+    assert is_pylock(Path(name)) is expected
+
+
+@pytest.mark.parametrize(
+    "marker,group,expected",
+    [
+        ('"dev" in dependency_groups', "dev", ""),
+        ('"dev" in dependency_groups', "default", None),
+        ('"socks" in extras', "socks", ""),
+        ('sys_platform == "win32" and "default" in dependency_groups', "default", 'sys_platform == "win32"'),
+        ('python_version < "3.11"', "default", 'python_version < "3.11"'),
+        ('"dev" in dependency_groups and "doc" in dependency_groups', "dev", None),
+        (
+            (
+                'os_name == "nt" and "dev" in dependency_groups or os_name == "nt" and "doc" in dependency_groups'
+                ' or sys_platform == "win32" and "dev" in dependency_groups'
+            ),
+            "dev",
+            'os_name == "nt" or sys_platform == "win32"',
+        ),
+        ('"dev" in dependency_groups or "doc" in dependency_groups and os_name == " or "', "doc", 'os_name == " or "'),
+        (
+            '(os_name == "nt" or os_name == "posix") and "dev" in dependency_groups',
+            "dev",
+            '(os_name == "nt" or os_name == "posix")',
+        ),
+    ],
+)
+def test_group_marker(marker: str, group: str, expected: str | None):
+    assert _group_marker(marker, group) == expected
+
+
+def test_group_marker_unsupported():
+    with pytest.raises(ValueError, match="Unsupported group marker"):
+        _group_marker('"dev" not in dependency_groups', "dev")
+
+
+def test_load_pylock(data_base_path: Path):
+    lockfile = load_pylock(data_base_path.joinpath("pylock", "pylock.toml").read_text())
+    assert lockfile["metadata"]["groups"] == ["default", "dev", "socks"]
+    packages = {package["name"]: package for package in lockfile["package"]}
+    assert packages["colorama"] == {
+        "name": "colorama",
+        "version": "0.4.6",
+        "groups": ["default"],
+        "marker": 'sys_platform == "win32"',
+    }
+    assert packages["iniconfig"]["groups"] == ["dev"]
+    assert packages["pysocks"]["groups"] == ["socks"]
+
+
+def test_load_pylock_sources(capsys: pytest.CaptureFixture[str]):
+    content = """\
+lock-version = "1.0"
+created-by = "pdm"
+
+[[packages]]
+name = "foo"
+vcs = {type = "git", url = "https://github.com/someone/foo.git", commit-id = "0123abc", subdirectory = "sub"}
+
+[[packages]]
+name = "bar"
+archive = {url = "https://packages.org/bar-1.0.tar.gz", hashes = {sha256 = "0123"}}
+
+[[packages]]
+name = "baz"
+directory = {path = "./baz", editable = true}
+
+[[packages]]
+name = "qux"
+version = "1.0"
+marker = '"dev" not in dependency_groups'
+"""
+    assert load_pylock(content)["package"] == [
+        {
+            "name": "foo",
+            "git": "https://github.com/someone/foo.git",
+            "revision": "0123abc",
+            "subdirectory": "sub",
+            "groups": ["default"],
+        },
+        {"name": "bar", "url": "https://packages.org/bar-1.0.tar.gz", "groups": ["default"]},
+        {"name": "baz", "editable": True, "path": "./baz", "groups": ["default"]},
+    ]
+    assert "Unsupported group marker" in capsys.readouterr().out
+
+
+def test_compact_packages():
+    packages = [
+        {"name": "foo", "version": "1.0", "groups": ["default", "dev"], "marker": "os_name == 'nt'"},
+        {"name": "bar", "version": "1.0", "groups": ["dev"]},
+        {"name": "baz", "version": "1.0", "groups": ["docs"]},
+    ]
+    expected = copy.deepcopy(packages)
+    records = compact_packages(packages, ["default", "dev"])
+    # the packages are left intact, packages of other groups are dropped
+    assert packages == expected
+    assert [record.groups for record in records] == [0b11, 0b10]
+    assert records[0].to_dict() == {"name": "foo", "version": "1.0", "marker": "os_name == 'nt'"}
+    assert records[1].to_dict() == {"name": "bar", "version": "1.0"}
+    # consuming the list converts the same packages, emptying it
+    consumed = compact_packages(consume_packages(packages), ["default", "dev"])
+    assert [(record.to_dict(), record.groups) for record in consumed] == [
+        (record.to_dict(), record.groups) for record in records
+    ]
+    assert packages == []
+    assert records[0].marker is compact_packages([{"groups": ["dev"], "marker": "os_name == 'nt'"}], ["dev"])[0].marker
+
+
+@pytest.mark.parametrize("test_project", ["large-selected", "lock"])
+@pytest.mark.parametrize("batch_size", [1, 7, 1000])
+def test_load_locked_packages(data_base_path: Path, test_project: str, batch_size: int):
+    content = data_base_path.joinpath(test_project, "pdm.lock").read_text()
+    expected = load_lockfile(content)
+    expected_packages = [
+        {key: value for key, value in package.items() if key != "groups"} for package in expected["package"]
+    ]
+    # tables after the packages can't be parsed in chunks, the complete document is parsed instead
+    for lockfile in (content, content + '\n[tool]\nfoo = "bar"\n'):
+        metadata, records = load_locked_packages(lockfile, batch_size)
+        assert metadata == expected["metadata"]
+        assert [record.to_dict() for record in records] == expected_packages
@@ -0,0 +1,20 @@
+"""test the plugin registration"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+
+
+def test_plugin_lazy_import() -> None:
+    """loading the plugin doesn't import the build machinery, only running `pdm build` does"""
+    code = (
+        "import sys\n"
+        "from pdm.core import Core\n"
+        "core = Core()\n"
+        "print('pdm_build_locked.plugin' in sys.modules, 'pdm_build_locked.command' in sys.modules)\n"
+        "core.parser.parse_args(['build', '--locked'])\n"
+        "print('pdm_build_locked.command' in sys.modules)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["True", "False", "False"]
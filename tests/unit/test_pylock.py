@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from pdm_build_locked import _lockfile, _pylock, _utils
+from tests.utils import with_static_urls
+
+
+def test_get_original_groups():
+    assert _pylock.get_original_groups(["locked", "cow-locked", "cow"]) == ["default", "cow"]
+
+
+@pytest.mark.parametrize("test_project", ["large-selected"])
+def test_dump_pylock_roundtrip(data_base_path: Path, test_project: str):
+    from packaging.pylock import Pylock
+
+    content = with_static_urls(data_base_path.joinpath(test_project, "pdm.lock").read_text())
+    groups = ["default", "cow", "extras"]
+    pylock = _pylock.dump_pylock(_lockfile.load_lockfile(content, _pylock.PYLOCK_PACKAGE_KEYS), groups, ">=3.9")
+
+    parsed = _lockfile.tomllib.loads(pylock)
+    # the sidecar is a valid PEP 751 lockfile
+    Pylock.from_dict(parsed)
+    assert parsed["lock-version"] == "1.0"
+    assert parsed["extras"] == ["cow", "extras"]
+    certifi = next(package for package in parsed["packages"] if package["name"] == "certifi")
+    assert certifi["sdist"]["name"].endswith(".tar.gz")
+    assert certifi["sdist"]["url"] == f"https://files.pythonhosted.org/packages/{certifi['sdist']['name']}"
+    assert all(len(wheel["hashes"]["sha256"]) == 64 for wheel in certifi["wheels"])
+    assert not any("dev" in package.get("marker", "") for package in parsed["packages"])
+
+    # the sidecar locks the same requirements as the metadata of the wheel, the default packages are always installed
+    expected = _utils.get_locked_requirements(_lockfile.load_lockfile(content)["package"], groups)
+    locked = _utils.get_locked_requirements(_lockfile.load_pylock(pylock)["package"], groups)
+    assert {group: set(requirements) for group, requirements in locked.items()} == {
+        group: set(requirements) | set(expected["default"]) for group, requirements in expected.items()
+    }
+
+
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_dump_pylock_without_urls(data_base_path: Path, test_project: str):
+    content = data_base_path.joinpath(test_project, "pdm.lock").read_text()
+    lockfile_content = _lockfile.load_lockfile(content, _pylock.PYLOCK_PACKAGE_KEYS)
+    with pytest.raises(_pylock.MissingFileURL, match="lock with `pdm lock --static-urls`"):
+        _pylock.dump_pylock(lockfile_content, ["default"])
+
+
+def test_dump_pylock_sources():
+    lockfile = {
+        "package": [
+            {
+                "name": "foo",
+                "version": "1.0",
+                "url": "https://example.com/foo-1.0.tar.gz",
+                "groups": ["test"],
+                "marker": "os_name == 'nt' or os_name == 'posix'",
+                "files": [{"url": "https://example.com/foo-1.0.tar.gz", "hash": "sha256:abc"}],
+            },
+            {"name": "bar", "version": "1.0", "git": "https://example.com/bar.git", "ref": "main", "revision": "0123"},
+            {"name": "baz", "version": "1.0", "path": "../baz", "groups": ["default"]},
+        ]
+    }
+    lockfile["package"][1]["groups"] = ["default"]
+    parsed = _lockfile.tomllib.loads(_pylock.dump_pylock(lockfile, ["default", "test"]))
+    assert parsed["packages"] == [
+        {
+            "name": "foo",
+            "marker": "(os_name == 'nt' or os_name == 'posix') and \"test\" in extras",
+            "archive": {"url": "https://example.com/foo-1.0.tar.gz", "hashes": {"sha256": "abc"}},
+        },
+        {
+            "name": "bar",
+            "vcs": {
+                "type": "git",
+                "url": "https://example.com/bar.git",
+                "requested-revision": "main",
+                "commit-id": "0123",
+            },
+        },
+    ]
+
+
+@pytest.mark.parametrize("test_project", ["pylock"])
+def test_filter_pylock(data_base_path: Path, test_project: str):
+    from packaging.pylock import Pylock
+
+    content = data_base_path.joinpath(test_project, "pylock.toml").read_text()
+    assert _pylock.filter_pylock(content, ["default", "dev", "socks"]) == content
+
+    parsed = _lockfile.tomllib.loads(_pylock.filter_pylock(content, ["default", "socks"]))
+    Pylock.from_dict(parsed)
+    assert parsed["extras"] == ["socks"]
+    assert parsed["dependency-groups"] == parsed["default-groups"] == ["default"]
+    names = [package["name"] for package in parsed["packages"]]
+    assert "pysocks" in names
+    assert "iniconfig" not in names
+    # the sub-tables stay with their package
+    assert all("tool" in package for package in parsed["packages"])
+    assert "tool" in parsed
+
+    parsed = _lockfile.tomllib.loads(_pylock.filter_pylock(content, ["default"]))
+    assert parsed["extras"] == []
+    assert not any(package["name"] in ("pysocks", "iniconfig") for package in parsed["packages"])
+
+
+def test_embed_pylock(temp_dir: Path):
+    wheel = temp_dir / "foo-1.0-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w") as zf:
+        zf.writestr("foo.py", "")
+        zf.writestr("foo-1.0.dist-info/RECORD", "foo.py,,\nfoo-1.0.dist-info/RECORD,,\n")
+
+    assert _pylock.embed_pylock(wheel, 'lock-version = "1.0"\n')
+    assert not _pylock.embed_pylock(wheel, 'lock-version = "1.0"\n')
+    with zipfile.ZipFile(wheel) as zf:
+        assert zf.namelist() == ["foo.py", "foo-1.0.dist-info/pylock.toml", "foo-1.0.dist-info/RECORD"]
+        data = zf.read("foo-1.0.dist-info/pylock.toml")
+        record = zf.read("foo-1.0.dist-info/RECORD").decode().splitlines()
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=").decode()
+    assert f"foo-1.0.dist-info/pylock.toml,sha256={digest},{len(data)}" in record
+    assert not list(temp_dir.glob("*.tmp*"))
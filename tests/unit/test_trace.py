@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from pdm_build_locked import _trace, _utils
+
+
+def read_trace(path: Path) -> list[dict[str, Any]]:
+    # the closing bracket is optional in the trace event format, but not in JSON
+    return json.loads(path.read_text().rstrip().rstrip(",") + "]")
+
+
+def test_trace_disabled(temp_dir: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv(_trace.TRACE_ENV, raising=False)
+    with _trace.span("phase") as args:
+        args["key"] = "value"
+    _trace.counter("counter", value=1)
+    assert not list(temp_dir.iterdir())
+
+
+def test_trace_events(temp_dir: Path, monkeypatch: pytest.MonkeyPatch):
+    trace_file = temp_dir / "trace.json"
+    monkeypatch.setenv(_trace.TRACE_ENV, str(trace_file))
+    monkeypatch.setenv(_trace.TRACE_MEMORY_ENV, "1")
+    with _trace.span("outer"), _trace.span("inner", key="value"):
+        data = [0] * 100_000
+    _trace.counter("counter", value=len(data))
+
+    inner, outer, counter = read_trace(trace_file)
+    assert (inner["name"], inner["ph"], inner["args"]["key"]) == ("inner", "X", "value")
+    assert outer["name"] == "outer"
+    assert outer["ts"] <= inner["ts"] and inner["dur"] <= outer["dur"]
+    # the peak of a nested span is included in the outer span
+    assert outer["args"]["peak_memory"] >= inner["args"]["peak_memory"] >= 800_000
+    assert (counter["ph"], counter["args"]) == ("C", {"value": 100_000})
+    # memory tracing ends with the outermost span
+    assert not tracemalloc.is_tracing()
+
+
+def test_trace_memory_started_elsewhere(temp_dir: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv(_trace.TRACE_ENV, str(temp_dir / "trace.json"))
+    monkeypatch.setenv(_trace.TRACE_MEMORY_ENV, "1")
+    tracemalloc.start()
+    try:
+        with _trace.span("phase"):
+            pass
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_trace_processes(temp_dir: Path):
+    """several processes appending to the same trace file write a single opening bracket"""
+    trace_file = temp_dir / "trace.json"
+    code = "from pdm_build_locked import _trace\nfor _ in range(50):\n    _trace.counter('counter', value=1)\n"
+    env = {**os.environ, _trace.TRACE_ENV: str(trace_file)}
+    processes = [subprocess.Popen([sys.executable, "-c", code], env=env) for _ in range(4)]
+    assert all(process.wait() == 0 for process in processes)
+    events = read_trace(trace_file)
+    assert len(events) == 200
+    assert len({event["pid"] for event in events}) == 4
+
+
+def test_trace_update_metadata_with_locked(
+    temp_dir: Path, data_base_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    trace_file = temp_dir / "trace.json"
+    monkeypatch.setenv(_trace.TRACE_ENV, str(trace_file))
+    _utils.update_metadata_with_locked({}, data_base_path / "lock")
+
+    events = {event["name"]: event for event in read_trace(trace_file)}
+    assert {"update_metadata_with_locked", "parse", "index and format", "write"} <= events.keys()
+    counters = events["locked requirements"]["args"]
+    assert counters["packages_scanned"] > 0
+    assert counters["groups_emitted"] == 1
+    assert counters["unsupported_skipped"] == 0
@@ -1,10 +1,44 @@
 from __future__ import annotations
 
+import re
+import shutil
+import warnings
+from pathlib import Path
+from types import SimpleNamespace
 from typing import Any
 
 import pytest
 
-from pdm_build_locked._utils import UnsupportedRequirement, get_locked_group_name, requirement_dict_to_string
+from pdm_build_locked import _lockfile
+from pdm_build_locked._lockfile import tomllib
+from pdm_build_locked._utils import (
+    LOCKED_GROUPS_ENV,
+    LockGraph,
+    MetadataBudgetExceeded,
+    StaleLockfile,
+    UnsupportedRequirement,
+    canonicalize_locked_groups,
+    check_lockfile_hash,
+    check_metadata_budget,
+    compact_locked_groups,
+    dump_handover_groups,
+    find_lockfile,
+    get_content_hash,
+    get_direct_requirements,
+    get_handover_groups,
+    get_locked_group_name,
+    get_locked_requirements,
+    get_lockfile_hash,
+    get_wheel_environments,
+    get_workspace_content_hash,
+    is_marker_excluded,
+    load_locked_groups,
+    prune_locked_groups,
+    requirement_dict_to_string,
+    simplify_marker,
+    simplify_requirement_marker,
+    update_metadata_with_locked,
+)
 
 
 @pytest.mark.parametrize("group,locked_group", [("default", "locked"), ("foo", "foo-locked")])
@@ -92,3 +126,506 @@ def test_requirement_dict_to_string(req: dict[str, Any], expected: str):
 def test_requirement_dict_to_string_illegal(req: dict[str, Any], error: str):
     with pytest.raises(UnsupportedRequirement, match=error):
         requirement_dict_to_string(req)
+
+
+def test_get_locked_requirements_single_pass(capsys: pytest.CaptureFixture[str]):
+    packages = [
+        {"name": "foo", "version": "1.0", "groups": ["default", "dev"]},
+        {"name": "bar", "version": "2.0", "groups": ["dev"]},
+        {"name": "baz", "path": "./baz", "groups": ["default"]},
+        {"name": "qux", "version": "3.0", "groups": ["docs"]},
+    ]
+    assert get_locked_requirements(packages, ["default", "dev"]) == {
+        "default": ["foo==1.0"],
+        "dev": ["foo==1.0", "bar==2.0"],
+    }
+    assert capsys.readouterr().out.count("Skipping unsupported requirement") == 1
+
+
+def test_locked_groups_memoized_across_hooks(
+    temp_dir: Path, data_base_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from pdm_build_locked.backend import BuildLockedHook
+    from pdm_build_locked.hatchling import BuildLockedMetadataHook
+
+    project = temp_dir / "project"
+    shutil.copytree(data_base_path / "lock", project)
+    parses = 0
+    load = _lockfile.load_locked_packages
+
+    def counting_load(*args: Any, **kwargs: Any) -> Any:
+        nonlocal parses
+        parses += 1
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(_lockfile, "load_locked_packages", counting_load)
+
+    # pdm-backend: sdist + wheel
+    for target in ("sdist", "wheel"):
+        context: Any = SimpleNamespace(
+            root=project, target=target, config=SimpleNamespace(metadata={}, build_config={}, data={})
+        )
+        BuildLockedHook().pdm_build_initialize(context)  # type: ignore[abstract]
+        assert len(context.config.metadata["optional-dependencies"]["locked"]) == 5
+    # hatchling: one metadata hook call per target
+    for _ in range(2):
+        metadata: dict[str, Any] = {}
+        BuildLockedMetadataHook(str(project), {}).update(metadata)
+        assert len(metadata["optional-dependencies"]["locked"]) == 5
+    assert parses == 1
+
+    # a modified lockfile is parsed again
+    lockfile = project / "pdm.lock"
+    lockfile.write_text(lockfile.read_text() + "\n")
+    BuildLockedMetadataHook(str(project), {}).update({})
+    assert parses == 2
+
+
+def test_update_metadata_with_handover(temp_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv(LOCKED_GROUPS_ENV, dump_handover_groups("Test_Pdm", {"locked": ["requests==2.31.0"]}))
+    metadata: dict[str, Any] = {"name": "test-pdm", "optional-dependencies": {"extras": ["idna"]}}
+    # no lockfile is needed
+    update_metadata_with_locked(metadata, temp_dir)
+    assert metadata["optional-dependencies"] == {"extras": ["idna"], "locked": ["requests==2.31.0"]}
+
+    # groups handed over for another project are ignored
+    assert get_handover_groups({"name": "other"}) is None
+
+
+@pytest.mark.parametrize(
+    "marker,requires_python,expected",
+    [
+        ('python_version >= "3.8"', ">=3.10", ""),
+        ('python_version >= "3.11"', ">=3.10", 'python_version >= "3.11"'),
+        ('python_full_version >= "3.10.1"', ">=3.10", 'python_full_version >= "3.10.1"'),
+        ('python_full_version > "3.9.2"', ">=3.10", ""),
+        ('python_version < "4.0"', ">=3.9,<4", ""),
+        ('python_version <= "3.12"', "~=3.10", 'python_version <= "3.12"'),
+        ('python_version < "3.12"', "==3.11.*", ""),
+        ("python_version>='3.8' and sys_platform=='win32'", ">=3.10", 'sys_platform == "win32"'),
+        (
+            'sys_platform == "win32" or sys_platform == "win32" and python_version >= "3.6"',
+            ">=3.9",
+            'sys_platform == "win32"',
+        ),
+        (
+            '(os_name == "nt" and sys_platform == "win32") or (sys_platform == "win32" and os_name == "nt")',
+            "",
+            'os_name == "nt" and sys_platform == "win32"',
+        ),
+        ('sys_platform == "linux" or python_version >= "3.9"', ">=3.9", ""),
+        (
+            '(sys_platform == "linux" or os_name == "nt") and python_version < "3.11"',
+            ">=3.9",
+            '(sys_platform == "linux" or os_name == "nt") and python_version < "3.11"',
+        ),
+        ("'win' in sys_platform and extra not in 'a b'", "", '"win" in sys_platform and extra not in "a b"'),
+        ('python_version >= "3.8"', "", 'python_version >= "3.8"'),
+        ('python_version >= "3.8" and', ">=3.10", 'python_version >= "3.8" and'),
+    ],
+)
+def test_simplify_marker(marker: str, requires_python: str, expected: str):
+    assert simplify_marker(marker, requires_python) == expected
+
+
+@pytest.mark.parametrize(
+    "requirement,expected",
+    [
+        ('foo==1.0; python_version >= "3.8"', "foo==1.0"),
+        ('foo==1.0 ; python_version >= "3.8" and os_name == "nt"', 'foo==1.0 ; os_name == "nt"'),
+        (
+            'foo @ https://example.com/foo.tar.gz;v=1 ; python_version >= "3.8"',
+            "foo @ https://example.com/foo.tar.gz;v=1",
+        ),
+        ("foo==1.0", "foo==1.0"),
+    ],
+)
+def test_simplify_requirement_marker(requirement: str, expected: str):
+    assert simplify_requirement_marker(requirement, ">=3.9") == expected
+
+
+def test_get_locked_requirements_simplify_markers():
+    packages = [
+        {"name": "foo", "version": "1.0", "groups": ["default"], "marker": 'python_version >= "3.8"'},
+        {"name": "bar", "version": "1.0", "groups": ["default"], "marker": "sys_platform=='win32'"},
+    ]
+    assert get_locked_requirements(packages, ["default"], ">=3.9") == {
+        "default": ["foo==1.0", 'bar==1.0 ; sys_platform == "win32"']
+    }
+    assert get_locked_requirements(packages, ["default"])["default"][0] == 'foo==1.0 ; python_version >= "3.8"'
+
+
+def test_update_metadata_with_locked_compact(temp_dir: Path) -> None:
+    lockfile = "\n".join(
+        [
+            "[metadata]",
+            'groups = ["default", "test", "docs"]',
+            'strategy = ["inherit_metadata"]',
+            *(
+                f'[[package]]\nname = "{name}"\nversion = "1.0"\ngroups = {groups}\n{marker}'
+                for name, groups, marker in [
+                    ("shared", '["default", "test", "docs"]', ""),
+                    ("win", '["default", "test"]', "marker = \"sys_platform == 'win32'\""),
+                    ("pytest", '["test"]', ""),
+                    ("sphinx", '["docs"]', ""),
+                ]
+            ),
+        ]
+    )
+    temp_dir.joinpath("pdm.lock").write_text(lockfile)
+    full: dict[str, Any] = {"name": "Our_Pkg", "optional-dependencies": {"test": ["pytest"], "docs": ["sphinx"]}}
+    compact: dict[str, Any] = {"name": "Our_Pkg", "optional-dependencies": {"test": ["pytest"], "docs": ["sphinx"]}}
+    update_metadata_with_locked(full, temp_dir)
+    update_metadata_with_locked(compact, temp_dir, compact=True)
+    assert compact["optional-dependencies"]["test-locked"] == ["pytest==1.0", "our-pkg[locked]"]
+
+    def expand(optional_dependencies: dict[str, list[str]], group: str) -> set[str]:
+        requirements = set()
+        for requirement in optional_dependencies[group]:
+            if requirement.startswith("our-pkg["):
+                requirements |= expand(optional_dependencies, requirement[len("our-pkg[") : -1])
+            else:
+                requirements.add(requirement)
+        return requirements
+
+    full_groups, compact_groups = full["optional-dependencies"], compact["optional-dependencies"]
+    assert compact_groups["locked"] == full_groups["locked"]
+    for group in ("test-locked", "docs-locked"):
+        # both forms install the same packages along with `locked`
+        assert expand(compact_groups, group) | expand(compact_groups, "locked") == (
+            expand(full_groups, group) | expand(full_groups, "locked")
+        )
+
+
+def test_compact_locked_groups() -> None:
+    optional_dependencies = {"locked": ["a==1"], "test-locked": ["a==1", "b==1"], "docs-locked": ["c==1"]}
+    assert compact_locked_groups("pkg", optional_dependencies) == {
+        "locked": ["a==1"],
+        "test-locked": ["b==1", "pkg[locked]"],
+        "docs-locked": ["c==1"],
+    }
+    # nothing to compact against
+    assert compact_locked_groups("pkg", {"test-locked": ["a==1"]}) == {"test-locked": ["a==1"]}
+
+
+@pytest.mark.parametrize("test_project", ["lock", "large-selected", "lock-hatchling", "pylock"])
+def test_get_content_hash(data_base_path: Path, test_project: str) -> None:
+    from pdm.core import Core
+
+    project = Core().create_project(data_base_path / test_project)
+    pyproject = tomllib.loads(project.root.joinpath("pyproject.toml").read_text())
+    assert get_content_hash(pyproject) == project.pyproject.content_hash()
+    assert get_lockfile_hash(find_lockfile(project.root)) == ("sha256", get_content_hash(pyproject))
+
+
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_find_lockfile(
+    temp_dir: Path, data_base_path: Path, monkeypatch: pytest.MonkeyPatch, test_project: str
+) -> None:
+    project = data_base_path / test_project
+    monkeypatch.delenv("PDM_LOCKFILE", raising=False)
+    assert find_lockfile(project) == project / "pdm.lock"
+    assert find_lockfile(data_base_path / "pylock") == data_base_path / "pylock" / "pylock.toml"
+
+    # a relative PDM_LOCKFILE is resolved against the project root, not the current directory
+    monkeypatch.chdir(temp_dir)
+    monkeypatch.setenv("PDM_LOCKFILE", "pdm.legacy.lock")
+    assert find_lockfile(project) == project / "pdm.legacy.lock"
+    monkeypatch.setenv("PDM_LOCKFILE", str(temp_dir / "pdm.lock"))
+    assert find_lockfile(project) == temp_dir / "pdm.lock"
+
+
+@pytest.mark.parametrize("test_project", ["lock", "pylock"])
+def test_check_lockfile_hash(temp_dir: Path, data_base_path: Path, test_project: str) -> None:
+    project = temp_dir / test_project
+    shutil.copytree(data_base_path / test_project, project, ignore=shutil.ignore_patterns("__pypackages__"))
+    lockfile = find_lockfile(project)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        check_lockfile_hash(project, lockfile, "fail")
+
+    pyproject = project / "pyproject.toml"
+    pyproject.write_text(pyproject.read_text().replace('requires-python = ">=3.9"', 'requires-python = ">=3.10"'))
+    with pytest.warns(UserWarning, match="doesn't match pyproject.toml"):
+        check_lockfile_hash(project, lockfile)
+    with pytest.raises(StaleLockfile, match="run `pdm lock`"):
+        check_lockfile_hash(project, lockfile, "fail")
+    check_lockfile_hash(project, lockfile, "ignore")
+    with pytest.raises(ValueError, match="Invalid value"):
+        check_lockfile_hash(project, lockfile, "error")
+
+
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_check_lockfile_hash_shared(temp_dir: Path, data_base_path: Path, test_project: str) -> None:
+    project = temp_dir / test_project
+    shutil.copytree(data_base_path / test_project, project, ignore=shutil.ignore_patterns("__pypackages__"))
+    pyproject = project / "pyproject.toml"
+    pyproject.write_text(pyproject.read_text().replace('requires-python = ">=3.9"', 'requires-python = ">=3.10"'))
+    # a lockfile shared by several projects, e.g. selected with PDM_LOCKFILE, wasn't locked for this project
+    shared = temp_dir / "shared"
+    shared.mkdir()
+    project.joinpath("pdm.lock").rename(shared / "pdm.lock")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        check_lockfile_hash(project, shared / "pdm.lock", "fail")
+
+
+@pytest.mark.parametrize("test_project", ["lock"])
+def test_check_lockfile_hash_workspace(temp_dir: Path, data_base_path: Path, test_project: str) -> None:
+    from pdm.core import Core
+
+    workspace = temp_dir / "workspace"
+    shutil.copytree(data_base_path / test_project, workspace, ignore=shutil.ignore_patterns("__pypackages__"))
+    pyproject = workspace / "pyproject.toml"
+    pyproject.write_text(f'{pyproject.read_text()}\n[tool.pdm.workspace]\nmembers = ["packages/*"]\n')
+    member = workspace / "packages" / "member"
+    member.mkdir(parents=True)
+    member.joinpath("pyproject.toml").write_text('[project]\nname = "member"\nversion = "0.1.0"\n')
+    # pdm hashes the workspace root along with its members
+    content_hash = Core().create_project(workspace).pyproject_content_hash()
+    assert get_workspace_content_hash(workspace) == content_hash
+    lockfile = workspace / "pdm.lock"
+    lockfile.write_text(
+        re.sub(r'content_hash = "sha256:\w+"', f'content_hash = "sha256:{content_hash}"', lockfile.read_text())
+    )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        check_lockfile_hash(workspace, lockfile, "fail")
+        # members are built with the lockfile of the workspace
+        check_lockfile_hash(member, lockfile, "fail")
+
+    member.joinpath("pyproject.toml").write_text(
+        '[project]\nname = "member"\nversion = "0.1.0"\ndependencies = ["idna"]\n'
+    )
+    with pytest.raises(StaleLockfile):
+        check_lockfile_hash(member, lockfile, "fail")
+
+
+def test_lock_graph() -> None:
+    packages: list[dict[str, Any]] = [
+        {"name": "a", "version": "1", "dependencies": ["b>=1", 'c; sys_platform == "win32"', "d[x]"]},
+        {"name": "b", "version": "1", "dependencies": ['c; os_name == "nt" or os_name == "posix"', "A"]},
+        {"name": "c", "version": "1"},
+        {"name": "d", "version": "1", "dependencies": ['e; python_version < "3.8"']},
+        {"name": "d", "version": "1", "extras": ["x"], "dependencies": ["d==1", "f"]},
+        {"name": "e", "version": "1"},
+        {"name": "f", "version": "1"},
+        {"name": "g", "version": "1"},
+    ]
+    graph = LockGraph(packages, ">=3.9")
+    resolved = graph.resolve(["a", 'b; python_version >= "3.10"'])
+    assert {packages[node]["name"]: marker for node, marker in resolved.items()} == {
+        "a": "",
+        "b": "",
+        "c": '(os_name == "nt" or os_name == "posix") or sys_platform == "win32"',
+        "d": "",
+        "f": "",
+    }
+    assert list(resolved) == sorted(resolved)
+    assert graph.resolve(['b; sys_platform == "linux"']) == {
+        0: 'sys_platform == "linux"',
+        1: 'sys_platform == "linux"',
+        # b -> a -> c can't be installed on linux
+        2: '(os_name == "nt" or os_name == "posix") and sys_platform == "linux"',
+        3: 'sys_platform == "linux"',
+        4: 'sys_platform == "linux"',
+        6: 'sys_platform == "linux"',
+    }
+    # without requires-python, the dependency on e is followed
+    assert 5 in LockGraph(packages).resolve(["a"])
+    assert LockGraph(packages).resolve(['d; python_version < "3.7"'])[5] == (
+        'python_version < "3.7" and python_version < "3.8"'
+    )
+    # d -> e only for python versions excluded by the marker of d
+    assert 5 not in LockGraph(packages).resolve(['d; python_version >= "3.10"'])
+
+
+@pytest.mark.parametrize(
+    "marker,requires_python,expected",
+    [
+        ('python_version < "3.8"', ">=3.9", True),
+        ('python_version < "3.8" or sys_platform == "win32"', ">=3.9", False),
+        ('sys_platform == "win32" and python_full_version < "3.9.0"', ">=3.9", True),
+        ('python_version >= "3.13"', ">=3.9,<3.13", True),
+        ('python_version < "3.10"', ">=3.9", False),
+        ('python_version < "3.8"', "", False),
+    ],
+)
+def test_is_marker_excluded(marker: str, requires_python: str, expected: bool) -> None:
+    assert is_marker_excluded(marker, requires_python) is expected
+
+
+@pytest.mark.parametrize(
+    "tag,variables",
+    [
+        ("py3-none-any", ()),
+        (
+            "cp311-cp311-manylinux_2_17_x86_64",
+            (
+                ("implementation_name", "cpython"),
+                ("os_name", "posix"),
+                ("platform_python_implementation", "CPython"),
+                ("platform_system", "Linux"),
+                ("sys_platform", "linux"),
+            ),
+        ),
+        (
+            "pp310-pypy310_pp73-macosx_10_9_universal2",
+            (
+                ("implementation_name", "pypy"),
+                ("os_name", "posix"),
+                ("platform_python_implementation", "PyPy"),
+                ("platform_system", "Darwin"),
+                ("sys_platform", "darwin"),
+            ),
+        ),
+        (
+            "py3-none-win32",
+            (("os_name", "nt"), ("platform_system", "Windows"), ("sys_platform", "win32")),
+        ),
+        (
+            "py3-none-macosx_11_0_arm64",
+            (
+                ("os_name", "posix"),
+                ("platform_machine", "arm64"),
+                ("platform_system", "Darwin"),
+                ("sys_platform", "darwin"),
+            ),
+        ),
+    ],
+)
+def test_get_wheel_environments(tag: str, variables: tuple[tuple[str, str], ...]) -> None:
+    assert [environment[0] for environment in get_wheel_environments(tag)] == [variables]
+
+
+def test_get_wheel_environments_python() -> None:
+    assert get_wheel_environments("cp311-cp311-linux_x86_64", ">=3.9")[0][1] == ((3, 11, 0), (3, 12, 0))
+    assert get_wheel_environments("cp39-abi3-linux_x86_64", ">=3.8")[0][1] == ((3, 9, 0), None)
+    assert get_wheel_environments("py3-none-any", ">=3.9,<4")[0][1] == ((3, 9, 0), (4, 0, 0))
+    # compressed tag sets
+    assert len(get_wheel_environments("cp311-cp311-manylinux_2_17_x86_64.manylinux2014_x86_64")) == 2
+    with pytest.raises(ValueError, match="Invalid wheel tag"):
+        get_wheel_environments("any")
+
+
+@pytest.mark.parametrize(
+    "marker,tag,kept",
+    [
+        ('sys_platform == "win32"', "cp311-cp311-manylinux_2_17_x86_64", False),
+        ('sys_platform == "win32"', "cp311-cp311-win_amd64", True),
+        ('sys_platform == "win32"', "py3-none-any", True),
+        ('platform_system != "Windows"', "cp311-cp311-win_amd64", False),
+        ('sys_platform in "linux darwin"', "cp311-cp311-macosx_11_0_arm64", True),
+        ('sys_platform not in "linux darwin"', "cp311-cp311-macosx_11_0_arm64", False),
+        ('platform_machine == "arm64"', "cp311-cp311-macosx_11_0_arm64", True),
+        ('platform_machine != "arm64"', "cp311-cp311-macosx_11_0_arm64", False),
+        ('platform_machine == "arm64"', "cp311-cp311-macosx_10_9_x86_64", True),
+        # the machine of the OS, which 32-bit pythons and userlands can run on
+        ('platform_machine == "AMD64"', "cp311-cp311-win32", True),
+        ('platform_machine == "ARM64"', "cp311-cp311-win_amd64", True),
+        ('platform_machine == "x86_64"', "cp311-cp311-manylinux_2_17_i686", True),
+        ('platform_machine == "aarch64"', "cp311-cp311-linux_armv7l", True),
+        ('platform_machine == "x86_64"', "cp311-cp311-manylinux_2_17_aarch64", True),
+        ('platform_machine == "arm64"', "cp311-cp311-macosx_10_9_universal2", True),
+        ('python_version < "3.10"', "cp311-cp311-win_amd64", False),
+        ('python_version < "3.10"', "cp39-abi3-win_amd64", True),
+        ('python_version == "3.10"', "cp311-cp311-win_amd64", False),
+        ('python_version != "3.11"', "cp311-cp311-win_amd64", False),
+        ('implementation_name == "pypy"', "cp311-cp311-win_amd64", False),
+        ('implementation_name == "pypy"', "py3-none-win_amd64", True),
+        ('sys_platform == "win32" and python_version < "3.10"', "cp39-cp39-win_amd64", True),
+        ('sys_platform == "win32" or python_version < "3.10"', "cp311-cp311-win_amd64", True),
+        ('sys_platform == "win32" or python_version < "3.10"', "cp311-cp311-linux_x86_64", False),
+        ('sys_platform == "win32" or platform_release > "5"', "cp311-cp311-linux_x86_64", True),
+        ('sys_platform == "win32"', "cp311-cp311-win_amd64.manylinux_2_17_x86_64", True),
+        ("invalid marker", "cp311-cp311-linux_x86_64", True),
+    ],
+)
+def test_prune_locked_groups(marker: str, tag: str, kept: bool) -> None:
+    optional_dependencies = {
+        "socks": ["pysocks"],
+        "locked": [f"foo==1.0 ; {marker}", "bar==1.0"],
+        "socks-locked": [f"foo @ https://example.com/foo.whl ; {marker}"],
+    }
+    pruned = prune_locked_groups(optional_dependencies, tag)
+    assert optional_dependencies["socks"] == ["pysocks"]
+    assert optional_dependencies["locked"] == ([f"foo==1.0 ; {marker}", "bar==1.0"] if kept else ["bar==1.0"])
+    assert len(optional_dependencies["socks-locked"]) == kept
+    assert len(pruned) == (0 if kept else 2)
+
+
+def test_get_direct_requirements() -> None:
+    metadata = {
+        "name": "Foo_Bar",
+        "dependencies": ["requests"],
+        "optional-dependencies": {"Cow": ["pycowsay"], "all": ["foo-bar[cow,all]", "rich"]},
+    }
+    assert get_direct_requirements(metadata, ["default", "all", "dev"]) == {
+        "default": ["requests"],
+        "all": ["pycowsay", "rich"],
+    }
+
+
+@pytest.mark.parametrize("test_project", ["large-selected"])
+def test_load_locked_groups_graph(temp_dir: Path, data_base_path: Path, test_project: str) -> None:
+    """the dependency graph gives the same groups as the inherit_metadata strategy"""
+    project = data_base_path / test_project
+    metadata = tomllib.loads(project.joinpath("pyproject.toml").read_text())["project"]
+    groups = ["default", "cow", "extras"]
+    lockfile = temp_dir / "pdm.lock"
+    lockfile.write_text(project.joinpath("pdm.lock").read_text().replace('"inherit_metadata"', ""))
+
+    expected = load_locked_groups(project / "pdm.lock", groups)
+    assert load_locked_groups(lockfile, groups) is None
+    resolved = load_locked_groups(lockfile, groups, None, get_direct_requirements(metadata, groups), ">=3.9")
+    assert resolved == expected
+
+
+def test_check_metadata_budget() -> None:
+    optional_dependencies = {
+        "cow": ["pycowsay"],
+        "locked": ["requests==2.31.0", 'colorama==0.4.6 ; sys_platform == "win32"'],
+        "cow-locked": ["pycowsay @ https://example.com/pycowsay-0.0.0.2.tar.gz"],
+    }
+    assert check_metadata_budget(optional_dependencies, None) is None
+
+    report = check_metadata_budget(optional_dependencies, {"lines": 5})
+    assert report is not None
+    assert report.splitlines() == [
+        "Locked metadata: 5 lines, 274 bytes (budget: 5 lines)",
+        "  locked: 3 lines, 154 bytes",
+        '    80 bytes (marker): colorama==0.4.6 ; sys_platform == "win32"',
+        "    51 bytes: requests==2.31.0",
+        "  cow-locked: 2 lines, 120 bytes",
+        "    93 bytes (URL): pycowsay @ https://example.com/pycowsay-0.0.0.2.tar.gz",
+    ]
+
+    with pytest.warns(UserWarning, match="exceed locked-metadata-budget: 274 bytes > 200"):
+        check_metadata_budget(optional_dependencies, 200)
+    with pytest.raises(MetadataBudgetExceeded, match="6 lines > 4"):
+        check_metadata_budget({**optional_dependencies, "x-locked": []}, {"lines": 4, "action": "fail"})
+    with pytest.raises(ValueError, match="Invalid action"):
+        check_metadata_budget(optional_dependencies, {"bytes": 200, "action": "ignore"})
+    with pytest.raises(ValueError, match="Invalid value"):
+        check_metadata_budget(optional_dependencies, True)
+
+
+def test_canonicalize_locked_groups() -> None:
+    locked_groups = {
+        "locked": [
+            "requests==2.31.0",
+            'PySocks==1.7.1; python_version >= "3.9"',
+            "Foo_Bar[Sec] @ https://example.com/foo;bar.tar.gz ;os_name == 'nt'",
+            "requests==2.31.0",
+        ],
+        "cow-locked": ["pycowsay==0.0.0.2"],
+    }
+    canonical = canonicalize_locked_groups(locked_groups)
+    assert list(canonical) == ["cow-locked", "locked"]
+    assert canonical["locked"] == [
+        "foo-bar[Sec] @ https://example.com/foo;bar.tar.gz ; os_name == 'nt'",
+        'pysocks==1.7.1 ; python_version >= "3.9"',
+        "requests==2.31.0",
+    ]
+    assert canonicalize_locked_groups(canonical) == canonical
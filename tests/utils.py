@@ -53,3 +53,17 @@ def get_pyproject_hash(project: Path) -> str:
     """
     with open(project.joinpath("pyproject.toml"), "rb") as file:
         return hashlib.sha256(file.read()).hexdigest()  # when >=3.11: use hashlib.file_digest instead
+
+
+def with_static_urls(content: str) -> str:
+    """
+    add the URLs of the locked files to a pdm.lock, like `pdm lock --static-urls`
+
+    Args:
+        content: text of the pdm.lock
+
+    Returns:
+        text of the pdm.lock, with a made-up PyPI URL for each file
+    """
+    content = content.replace('strategy = ["', 'strategy = ["static_urls", "', 1)
+    return re.sub(r'\{file = "([^"]+)"', r'{url = "https://files.pythonhosted.org/packages/\1"', content)